@@ -0,0 +1,115 @@
+from sqlalchemy import bindparam, delete, func, insert, literal_column, select, union_all, update
+from models import db, Client, Debt, Payment, PaymentAllocation
+
+# Spelled with a literal so SQLite can match the partial indexes.
+OPEN_DEBT = Debt.outstanding > literal_column("0")
+UNALLOCATED_PAYMENT = Payment.unallocated > literal_column("0")
+CLIENT_CHUNK = 500
+
+
+def _open_rows(client_ids):
+    """Open debts and payments with credit of the clients, oldest first."""
+    kind = literal_column("'debt'").label("kind")
+    debts = select(kind, Debt.client_id, Debt.date, Debt.id, Debt.outstanding)
+    payments = select(
+        literal_column("'payment'"),
+        Payment.client_id,
+        Payment.date,
+        Payment.id,
+        Payment.unallocated,
+    )
+    rows = db.session.execute(
+        union_all(
+            debts.where(Debt.client_id.in_(client_ids), OPEN_DEBT),
+            payments.where(Payment.client_id.in_(client_ids), UNALLOCATED_PAYMENT),
+        ).order_by("kind", "client_id", "date", "id")
+    )
+    grouped = {"debt": {}, "payment": {}}
+    for kind, client_id, _, row_id, remaining in rows:
+        grouped[kind].setdefault(client_id, []).append([row_id, remaining])
+    return grouped["debt"], grouped["payment"]
+
+
+def _settle(client_ids) -> int:
+    debts, payments = _open_rows(client_ids)
+    allocations, debt_updates, payment_updates = [], {}, {}
+    for client_id in debts.keys() & payments.keys():
+        open_debts, credits = debts[client_id], payments[client_id]
+        i = j = 0
+        while i < len(open_debts) and j < len(credits):
+            debt, payment = open_debts[i], credits[j]
+            applied = min(debt[1], payment[1])
+            allocations.append({"payment_id": payment[0], "debt_id": debt[0], "amount": applied})
+            debt[1] -= applied
+            payment[1] -= applied
+            debt_updates[debt[0]] = debt[1]
+            payment_updates[payment[0]] = payment[1]
+            if debt[1] == 0:
+                i += 1
+            if payment[1] == 0:
+                j += 1
+    if not allocations:
+        return 0
+    db.session.execute(insert(PaymentAllocation), allocations)
+    for table, column, values in (
+        (Debt.__table__, "outstanding", debt_updates),
+        (Payment.__table__, "unallocated", payment_updates),
+    ):
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({table.c[column]: bindparam("b_remaining", type_=table.c[column].type)}),
+            [{"b_id": row_id, "b_remaining": remaining} for row_id, remaining in values.items()],
+        )
+    return len(allocations)
+
+
+def allocate(client_ids) -> int:
+    """Apply the unallocated payments of these clients to their open debts, FIFO.
+
+    Call it after inserting debts or payments and updating the client's
+    ledger row, inside the same transaction: that row update is what keeps
+    two writers from allocating the same client at once. Only open debts and
+    payments with credit are read, so the cost does not grow with the
+    client's history. Returns the number of allocations made.
+    """
+    client_ids = sorted(set(client_ids))
+    made = 0
+    for start in range(0, len(client_ids), CLIENT_CHUNK):
+        made += _settle(client_ids[start:start + CLIENT_CHUNK])
+    return made
+
+
+def rebuild_allocations() -> int:
+    """Replay every client from scratch; for repairs after editing rows by hand."""
+    db.session.execute(delete(PaymentAllocation))
+    db.session.execute(update(Debt).values(outstanding=Debt.amount))
+    db.session.execute(update(Payment).values(unallocated=Payment.amount))
+    client_ids = db.session.execute(select(Client.id).order_by(Client.id)).scalars().all()
+    made = allocate(client_ids)
+    db.session.commit()
+    return made
+
+
+def find_allocation_drift() -> list:
+    """Clients whose balance differs from open debts minus unallocated credit."""
+    open_total = (
+        select(func.coalesce(func.sum(Debt.outstanding), 0))
+        .where(Debt.client_id == Client.id, OPEN_DEBT)
+        .scalar_subquery()
+    )
+    credit = (
+        select(func.coalesce(func.sum(Payment.unallocated), 0))
+        .where(Payment.client_id == Client.id, UNALLOCATED_PAYMENT)
+        .scalar_subquery()
+    )
+    expected = open_total - credit
+    rows = db.session.execute(
+        select(Client.id, Client.name, Client.balance, expected.label("expected"))
+        .where(Client.balance != expected)
+        .order_by(Client.id)
+    )
+    return [
+        {"client_id": r.id, "name": r.name, "balance": r.balance, "expected": r.expected}
+        for r in rows
+    ]
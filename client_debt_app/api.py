@@ -0,0 +1,388 @@
+import json
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import wraps
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from sqlalchemy import select
+from werkzeug.exceptions import HTTPException
+from auth import current_user
+from cache import conditional
+from changes import (
+    FeedError,
+    changes_after,
+    checkpoint,
+    feed_batch_size,
+    last_sequence,
+    save_checkpoint,
+)
+from models import db, CashSnapshot, Client, Debt, Movement, Payment
+from pagination import decode_cursor, encode_cursor, keyset_page, page_size
+from serving import stopping
+from settings import apply_defaults
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+DEFAULTS = {
+    # ``updated_since`` also returns rows stamped this long before it: a row's
+    # updated_at is set when it is written, so a transaction that commits late
+    # can land behind the instant a sync already stored
+    "SYNC_OVERLAP_SECONDS": 60,
+}
+
+STREAM_BATCH = 100
+KEEPALIVE_SECONDS = 15
+
+# ``fields`` maps the public name to its column; ``default`` is what a
+# request without ``fields=`` gets. ``key`` is the unique sort column and
+# ``updated`` the one ``updated_since`` filters and sorts on.
+Resource = namedtuple("Resource", "fields default key updated filters")
+
+_CLIENT_FIELDS = {
+    "id": Client.id,
+    "name": Client.name,
+    "document": Client.document,
+    "address": Client.address,
+    "phone": Client.phone,
+    "balance": Client.balance,
+    "debt_count": Client.debt_count,
+    "payment_count": Client.payment_count,
+    "last_activity": Client.last_activity,
+    "updated_at": Client.updated_at,
+}
+
+RESOURCES = {
+    "clients": Resource(_CLIENT_FIELDS, tuple(_CLIENT_FIELDS), "id", "updated_at", {}),
+    # the stored ledger columns only, for terminals that just show balances
+    "balances": Resource(
+        _CLIENT_FIELDS,
+        ("id", "balance", "debt_count", "payment_count", "last_activity", "updated_at"),
+        "id",
+        "updated_at",
+        {},
+    ),
+    "debts": Resource(
+        {
+            "id": Debt.id,
+            "client_id": Debt.client_id,
+            "date": Debt.date,
+            "amount": Debt.amount,
+            "description": Debt.description,
+            "outstanding": Debt.outstanding,
+            "updated_at": Debt.updated_at,
+        },
+        ("id", "client_id", "date", "amount", "description", "outstanding", "updated_at"),
+        "id",
+        "updated_at",
+        {"client_id": Debt.client_id},
+    ),
+    "payments": Resource(
+        {
+            "id": Payment.id,
+            "client_id": Payment.client_id,
+            "date": Payment.date,
+            "amount": Payment.amount,
+            "method": Payment.method,
+            "unallocated": Payment.unallocated,
+            "updated_at": Payment.updated_at,
+        },
+        ("id", "client_id", "date", "amount", "method", "unallocated", "updated_at"),
+        "id",
+        "updated_at",
+        {"client_id": Payment.client_id},
+    ),
+    # movements never change, so their timestamp serves as updated_at;
+    # months moved to archive files are not served here
+    "movements": Resource(
+        {
+            "id": Movement.id,
+            "client_id": Movement.client_id,
+            "user_id": Movement.user_id,
+            "action": Movement.action,
+            "amount": Movement.amount,
+            "description": Movement.description,
+            "timestamp": Movement.timestamp,
+        },
+        ("id", "client_id", "user_id", "action", "amount", "description", "timestamp"),
+        "id",
+        "timestamp",
+        {"client_id": Movement.client_id},
+    ),
+    "cash": Resource(
+        {
+            "day": CashSnapshot.day,
+            "cash": CashSnapshot.cash,
+            "transfer": CashSnapshot.transfer,
+            "other": CashSnapshot.other,
+            "cash_income": CashSnapshot.cash_income,
+            "cash_withdrawal": CashSnapshot.cash_withdrawal,
+            "opening": CashSnapshot.opening,
+            "closing": CashSnapshot.closing,
+            "closed_at": CashSnapshot.closed_at,
+            "updated_at": CashSnapshot.updated_at,
+        },
+        (
+            "day",
+            "cash",
+            "transfer",
+            "other",
+            "cash_income",
+            "cash_withdrawal",
+            "opening",
+            "closing",
+            "closed_at",
+            "updated_at",
+        ),
+        "day",
+        "updated_at",
+        {},
+    ),
+}
+
+
+def init_api(app) -> None:
+    apply_defaults(app, DEFAULTS)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+def dumps(payload) -> str:
+    """Compact JSON: no spaces, UTF-8 as is, money as decimal strings."""
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_response(payload, status: int = 200) -> Response:
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+def change_lines(rows):
+    for row in rows:
+        yield dumps(row) + "\n"
+
+
+@api.errorhandler(HTTPException)
+def _http_error(exc):
+    return json_response({"error": exc.description}, exc.code)
+
+
+def api_login_required(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if current_user() is None:
+            abort(401, "Inicie sesión en /login")
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _selected_fields(resource) -> list:
+    raw = request.args.get("fields")
+    if not raw:
+        return list(resource.default)
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        abort(400, f"Campos desconocidos: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def _updated_since():
+    raw = request.args.get("updated_since")
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        abort(400, "updated_since debe ser una fecha ISO 8601 en UTC")
+
+
+def _int_arg(name: str):
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        abort(400, f"{name} debe ser un número")
+
+
+def list_page(resource) -> dict:
+    """One page of a resource as ``{"data": [...], "next_cursor": ...}``.
+
+    Without ``updated_since`` rows come by key; with it, by ``(updated, key)``
+    from SYNC_OVERLAP_SECONDS before that instant on, so a sync can resume
+    from the last ``updated_at`` it stored without missing rows committed
+    late; the rows in the overlap come again.
+    """
+    fields = _selected_fields(resource)
+    since = _updated_since()
+    sort = [resource.updated, resource.key] if since is not None else [resource.key]
+    columns = [resource.fields[name].label(name) for name in dict.fromkeys(fields + sort)]
+    query = db.session.query(*columns)
+    for name, column in resource.filters.items():
+        value = _int_arg(name)
+        if value is not None:
+            query = query.filter(column == value)
+    if since is not None:
+        overlap = timedelta(seconds=current_app.config["SYNC_OVERLAP_SECONDS"])
+        query = query.filter(resource.fields[resource.updated] >= since - overlap)
+    rows, last = keyset_page(
+        query,
+        [resource.fields[name] for name in sort],
+        decode_cursor(request.args.get("cursor")),
+        page_size(request.args.get("limit")),
+    )
+    return {
+        "data": [{name: getattr(row, name) for name in fields} for row in rows],
+        "next_cursor": encode_cursor([getattr(last, name) for name in sort]) if last else None,
+    }
+
+
+@api.route("/clients")
+@api_login_required
+@conditional
+def clients():
+    return json_response(list_page(RESOURCES["clients"]))
+
+
+@api.route("/balances")
+@api_login_required
+@conditional
+def balances():
+    return json_response(list_page(RESOURCES["balances"]))
+
+
+@api.route("/debts")
+@api_login_required
+@conditional
+def debts():
+    return json_response(list_page(RESOURCES["debts"]))
+
+
+@api.route("/payments")
+@api_login_required
+@conditional
+def payments():
+    return json_response(list_page(RESOURCES["payments"]))
+
+
+@api.route("/movements")
+@api_login_required
+@conditional
+def movements():
+    return json_response(list_page(RESOURCES["movements"]))
+
+
+@api.route("/cash")
+@api_login_required
+@conditional
+def cash():
+    return json_response(list_page(RESOURCES["cash"]))
+
+
+@api.route("/clients/<int:client_id>")
+@api_login_required
+@conditional
+def client_detail(client_id: int):
+    resource = RESOURCES["clients"]
+    fields = _selected_fields(resource)
+    row = db.session.execute(
+        select(*[resource.fields[name].label(name) for name in fields]).where(
+            Client.id == client_id
+        )
+    ).first()
+    if row is None:
+        abort(404, "Cliente inexistente")
+    return json_response({"data": dict(row._mapping)})
+
+
+@api.route("/changes")
+@api_login_required
+def changes():
+    """NDJSON of the movements after ``after``, or after the consumer's checkpoint.
+
+    ``Feed-Next-After`` carries the value for the next pull and
+    ``Feed-More: 1`` says another batch is already waiting.
+    """
+    after = _int_arg("after")
+    consumer = request.args.get("consumer")
+    if after is None:
+        try:
+            after = checkpoint(consumer) if consumer is not None else 0
+        except FeedError as exc:
+            abort(400, str(exc))
+    limit = feed_batch_size(request.args.get("limit"))
+    rows = changes_after(after, limit + 1)
+    response = Response("".join(change_lines(rows[:limit])), mimetype="application/x-ndjson")
+    response.headers["Feed-Next-After"] = str(rows[:limit][-1]["seq"] if rows else after)
+    response.headers["Feed-More"] = "1" if len(rows) > limit else "0"
+    return response
+
+
+@api.route("/changes/checkpoint", methods=["POST"])
+@api_login_required
+def change_checkpoint():
+    """Store ``{"consumer", "seq"}`` once a consumer has processed up to ``seq``."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400, "Se espera un objeto JSON con consumer y seq")
+    try:
+        seq = int(payload.get("seq"))
+    except (TypeError, ValueError):
+        abort(400, "seq debe ser un número")
+    try:
+        consumer = str(payload.get("consumer") or "").strip()
+        stored = save_checkpoint(consumer, seq)
+    except FeedError as exc:
+        abort(400, str(exc))
+    return json_response({"consumer": consumer, "seq": stored})
+
+
+@api.route("/changes/stream")
+@api_login_required
+def change_stream():
+    """Server-sent events: one ``movement`` event per change, ``id`` being its sequence.
+
+    Without ``Last-Event-ID`` or ``?after=`` the stream starts at the
+    current end of the feed. It closes after EVENT_STREAM_SECONDS, or when
+    the worker shuts down, and the browser reconnects from the last id it saw.
+    """
+    raw = request.headers.get("Last-Event-ID") or request.args.get("after")
+    try:
+        after = int(raw) if raw else last_sequence()
+    except ValueError:
+        abort(400, "after debe ser un número")
+    poll = current_app.config["EVENT_POLL_SECONDS"]
+    deadline = time.monotonic() + current_app.config["EVENT_STREAM_SECONDS"]
+
+    def events(after):
+        yield "retry: 3000\n\n"
+        quiet_since = time.monotonic()
+        while True:
+            rows = changes_after(after, STREAM_BATCH)
+            # give the connection back to the pool while waiting
+            db.session.rollback()
+            for row in rows:
+                after = row["seq"]
+                yield f"id: {after}\nevent: movement\ndata: {dumps(row)}\n\n"
+            now = time.monotonic()
+            if rows:
+                quiet_since = now
+            elif now - quiet_since >= KEEPALIVE_SECONDS:
+                # comment line, keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                quiet_since = now
+            # a stopping worker wakes the wait so its streams end right away
+            if now >= deadline or stopping.wait(poll):
+                return
+
+    response = Response(stream_with_context(events(after)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -1,12 +1,122 @@
 import os
-from datetime import date, datetime
+import uuid
+import click
+from datetime import date, datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    abort,
+    render_template,
+    request,
+    redirect,
+    url_for,
+    session,
+    flash,
+    jsonify,
+    send_file,
+    stream_with_context,
+)
 from flask_wtf import CSRFProtect
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_migrate import Migrate
-from sqlalchemy import inspect, text
-from models import db, Client, Debt, Payment, User, Movement
+from flask_migrate import Migrate, upgrade
+from sqlalchemy.orm import joinedload, selectinload
+from allocation import allocate, find_allocation_drift, rebuild_allocations
+from archive import ArchiveError, archive_closed_months, archive_month, init_archive
+from auth import current_user, hash_password, init_auth, login_user, logout_user, verify_password
+from database import engine_options, install_pragmas, load_config
+from models import db, Client, Debt, Payment, User, Movement, Job, METHOD_LABELS
+from ledger import (
+    record_debt,
+    record_payment,
+    find_balance_drift,
+    rebuild_balances,
+    statement_page,
+)
+from reconcile import fix_drift, reconcile
+from pagination import decode_cursor, encode_cursor, keyset_page, page_size
+from search import (
+    MAX_TOKEN_LENGTH,
+    SUGGEST_LIMIT,
+    index_client,
+    normalize,
+    reindex_clients,
+    search_condition,
+    suggest_clients,
+)
+from reports import (
+    FilterError,
+    parse_filters,
+    report_totals,
+    iter_movements,
+    movement_page,
+    csv_lines,
+    ndjson_lines,
+)
+from cache import cache_stats, cached, conditional, data_version, init_cache
+from charts import (
+    AGING_BUCKETS,
+    BUCKETS,
+    DEFAULT_SPAN,
+    MAX_TOP,
+    aging_by_client,
+    aging_distribution,
+    time_series,
+    top_debtors,
+)
+from debt_listing import debt_summary, parse_debt_filters
+from queryplan import check_query_plans
+from metrics import init_metrics, prometheus_text, slowest_queries
+from bench import (
+    BASELINE_PATH,
+    compare,
+    load_baseline,
+    run_benchmark,
+    run_load_test,
+    write_result,
+)
+from synthetic import SCALES, generate
+from importer import COLUMNS, KINDS, Importer, ImportFormatError, read_rows
+from posting import (
+    MAX_KEY_LENGTH,
+    BatchError,
+    IdempotencyConflict,
+    post_batch,
+    purge_idempotency_keys,
+)
+from jobs import (
+    ADMIN_KINDS,
+    KIND_LABELS,
+    STATUS_LABELS,
+    init_jobs,
+    job_path,
+    job_status,
+    purge_jobs,
+    run_queued,
+    save_upload,
+    submit,
+)
+from cash_register import (
+    CashClosedError,
+    close_cash,
+    record_cash,
+    day_cash_movements,
+    day_snapshot,
+    find_cash_drift,
+    rebuild_cash_snapshots,
+    snapshot_range,
+    sum_rows,
+)
+from api import api, change_lines, init_api
+from changes import (
+    FeedError,
+    changes_after,
+    checkpoint,
+    feed_batch_size,
+    init_changes,
+    save_checkpoint,
+)
+from serving import init_serving
 from forms import (
     LoginForm,
     ClientForm,
@@ -17,88 +127,50 @@ from forms import (
     IncomeForm,
 )
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SECRET_KEY", "dev")
-csrf = CSRFProtect(app)
-
+csrf = CSRFProtect()
+migrate = Migrate()
+bp = Blueprint("main", __name__, cli_group=None)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(app.root_path, "clients.db")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["WTF_CSRF_ENABLED"] = False
-db.init_app(app)
-migrate = Migrate(app, db)
-
-with app.app_context():
-    db.create_all()
-
-    inspector = inspect(db.engine)
-    if "client" in inspector.get_table_names():
-        columns = [col["name"] for col in inspector.get_columns("client")]
-        if "address" not in columns:
-            db.session.execute(
-                text("ALTER TABLE client ADD COLUMN address VARCHAR(200)")
-            )
-            db.session.commit()
-        if "phone" not in columns:
-            db.session.execute(
-                text("ALTER TABLE client ADD COLUMN phone VARCHAR(20)")
-            )
-            db.session.commit()
-        indexes = [idx["name"] for idx in inspector.get_indexes("client")]
-        if "ix_client_document" not in indexes:
-            # remove duplicate documents before creating the unique index
-            duplicate_ids = db.session.execute(
-                text(
-                    """
-                    SELECT id FROM client
-                    WHERE id NOT IN (
-                        SELECT MIN(id) FROM client GROUP BY document
-                    )
-                    """
-                )
-            ).scalars()
-            for dup_id in duplicate_ids:
-                db.session.execute(text("DELETE FROM client WHERE id = :id"), {"id": dup_id})
-            db.session.commit()
 
-            db.session.execute(
-                text("CREATE UNIQUE INDEX ix_client_document ON client (document)")
-            )
-            db.session.commit()
-    if "payment" in inspector.get_table_names():
-        columns = [col["name"] for col in inspector.get_columns("payment")]
-        if "method" not in columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE payment ADD COLUMN method VARCHAR(20) NOT NULL DEFAULT 'cash'"
-                )
-            )
-            db.session.commit()
+def create_app(test_config=None):
+    """Build the application. No database work happens here; run ``flask bootstrap``."""
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SECRET_KEY", "dev")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["WTF_CSRF_ENABLED"] = False
+    if test_config:
+        app.config.update(test_config)
+    load_config(app)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app))
+    init_cache(app)
+    init_auth(app)
+    init_archive(app)
+    init_metrics(app)
+    init_jobs(app)
+    init_changes(app)
+    init_serving(app)
+    init_api(app)
 
-    if "user" in inspector.get_table_names():
-        columns = [col["name"] for col in inspector.get_columns("user")]
-        if "role" not in columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE user ADD COLUMN role VARCHAR(20) NOT NULL DEFAULT 'user'"
-                )
-            )
-            db.session.commit()
+    csrf.init_app(app)
+    db.init_app(app)
+    with app.app_context():
+        install_pragmas(app, db.engine)
+    migrate.init_app(
+        app,
+        db,
+        directory=os.path.join(app.root_path, "migrations"),
+        render_as_batch=True,
+    )
+    app.register_blueprint(bp)
+    app.register_blueprint(api)
+    return app
 
-    if "movement" in inspector.get_table_names():
-        columns = [col["name"] for col in inspector.get_columns("movement")]
-        if "user_id" not in columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE movement ADD COLUMN user_id INTEGER REFERENCES user(id)"
-                )
-            )
-            db.session.commit()
 
+def ensure_admin():
     if not User.query.first():
         admin = User(
             username="admin",
-            password_hash=generate_password_hash("admin"),
+            password_hash=hash_password("admin"),
             role="admin",
         )
         db.session.add(admin)
@@ -108,8 +180,8 @@ with app.app_context():
 def login_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        if "user_id" not in session:
-            return redirect(url_for("login"))
+        if current_user() is None:
+            return redirect(url_for("main.login"))
         return fn(*args, **kwargs)
     return wrapper
 
@@ -117,10 +189,9 @@ def login_required(fn):
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = session.get("user_id")
-        user = User.query.get(user_id)
+        user = current_user()
         if not user or user.role != "admin":
-            return redirect(url_for("index"))
+            return redirect(url_for("main.index"))
         return fn(*args, **kwargs)
     return wrapper
 
@@ -132,19 +203,83 @@ def flash_form_errors(form):
             flash(f"{label}: {error}", "error")
 
 
-@app.route("/")
-@login_required
+def day_arg(name: str, default=None):
+    """``?name=YYYY-MM-DD`` as a date; a malformed value is flashed and gives ``default``."""
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        flash(f"Fecha inválida: {value}", "error")
+        return default
+
+
+def lazy_page(query, columns, limit, descending=False):
+    """Return a loader for one keyset page, so fragment cache hits skip the query."""
+
+    def load():
+        rows, last = keyset_page(
+            query, columns, decode_cursor(request.args.get("after")), limit, descending
+        )
+        next_cursor = None
+        if last is not None:
+            next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    return load
+
+
+CLIENT_SORT_KEYS = {
+    "name": Client.search_name,
+    "document": Client.document,
+    "balance": Client.balance,
+}
 
+
+@bp.route("/")
+@login_required
+@conditional
 def index():
-    q = request.args.get("q", "")
+    q = request.args.get("q", "").strip()
+    sort = request.args.get("sort", "name")
+    if sort not in CLIENT_SORT_KEYS:
+        sort = "name"
+    descending = request.args.get("dir") == "desc"
+    limit = page_size(request.args.get("limit"))
+
+    query = Client.query
     if q:
-        clients = Client.query.filter(Client.name.ilike(f"%{q}%")).all()
-    else:
-        clients = Client.query.all()
-    return render_template("clients.html", clients=clients, q=q)
+        condition = search_condition(q)
+        if condition is not None:
+            query = query.filter(condition)
+    return render_template(
+        "clients.html",
+        load_page=lazy_page(query, [CLIENT_SORT_KEYS[sort], Client.id], limit, descending),
+        q=q,
+        sort=sort,
+        direction="desc" if descending else "asc",
+        limit=limit,
+        is_first_page=not request.args.get("after"),
+    )
 
 
-@app.route("/client/new", methods=["GET", "POST"])
+@bp.route("/clientes/buscar")
+@login_required
+@conditional
+def client_suggest():
+    """Typeahead for the client pickers: ``[{id, name, document}]``."""
+    q = normalize(request.args.get("q", ""))[:MAX_TOKEN_LENGTH]
+    try:
+        limit = int(request.args.get("limit", SUGGEST_LIMIT))
+    except ValueError:
+        limit = SUGGEST_LIMIT
+    if not q:
+        return jsonify([])
+    return jsonify(cached("client_suggest", (q, limit), lambda: suggest_clients(q, limit)))
+
+
+@bp.route("/client/new", methods=["GET", "POST"])
 @login_required
 @admin_required
 def new_client():
@@ -157,7 +292,8 @@ def new_client():
             phone=form.phone.data,
         )
         db.session.add(client)
-        db.session.commit()
+        db.session.flush()
+        index_client(client)
         movement = Movement(
             user_id=session.get("user_id"),
             client=client,
@@ -167,25 +303,54 @@ def new_client():
         db.session.add(movement)
         db.session.commit()
 
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     if request.method == "POST":
         flash_form_errors(form)
     return render_template("new_client.html", form=form)
 
 
-@app.route("/client/<int:client_id>")
+RECENT_MOVEMENTS = 20
+
+
+def render_client_detail(client, debt_form, payment_form):
+    # a malformed date means no cutoff
+    until = day_arg("hasta")
+    entries, next_cursor = statement_page(
+        client,
+        decode_cursor(request.args.get("after")),
+        page_size(request.args.get("limit")),
+        until=until,
+    )
+    movements = (
+        Movement.query.filter(Movement.client_id == client.id)
+        .order_by(Movement.timestamp.desc())
+        .limit(RECENT_MOVEMENTS)
+        .all()
+    )
+    return render_template(
+        "client_detail.html",
+        client=client,
+        debt_form=debt_form,
+        payment_form=payment_form,
+        entries=entries,
+        next_cursor=encode_cursor(next_cursor) if next_cursor else None,
+        is_first_page=not (request.args.get("after") or until),
+        until=until.strftime("%Y-%m-%d") if until else None,
+        movements=movements,
+    )
+
+
+@bp.route("/client/<int:client_id>")
 @login_required
 
 def client_detail(client_id: int):
     client = Client.query.get_or_404(client_id)
     debt_form = DebtForm()
     payment_form = PaymentForm()
-    return render_template(
-        "client_detail.html", client=client, debt_form=debt_form, payment_form=payment_form
-    )
+    return render_client_detail(client, debt_form, payment_form)
 
 
-@app.route("/client/<int:client_id>/debts", methods=["POST"])
+@bp.route("/client/<int:client_id>/debts", methods=["POST"])
 @login_required
 @admin_required
 def add_debt(client_id: int):
@@ -199,6 +364,8 @@ def add_debt(client_id: int):
             date=form.date.data or date.today(),
         )
         db.session.add(debt)
+        record_debt(client.id, debt.amount, debt.date)
+        allocate([client.id])
         movement = Movement(
             user_id=session.get("user_id"),
             client=client,
@@ -208,16 +375,14 @@ def add_debt(client_id: int):
         )
         db.session.add(movement)
         db.session.commit()
-        return redirect(url_for("client_detail", client_id=client.id))
+        return redirect(url_for("main.client_detail", client_id=client.id))
     if request.method == "POST":
         flash_form_errors(form)
     payment_form = PaymentForm()
-    return render_template(
-        "client_detail.html", client=client, debt_form=form, payment_form=payment_form
-    )
+    return render_client_detail(client, form, payment_form)
 
 
-@app.route("/client/<int:client_id>/payments", methods=["POST"])
+@bp.route("/client/<int:client_id>/payments", methods=["POST"])
 @login_required
 @admin_required
 def add_payment(client_id: int):
@@ -231,6 +396,8 @@ def add_payment(client_id: int):
             method=form.method.data,
         )
         db.session.add(payment)
+        record_payment(client.id, payment.amount, payment.date)
+        allocate([client.id])
         movement = Movement(
             user_id=session.get("user_id"),
             client=client,
@@ -238,71 +405,88 @@ def add_payment(client_id: int):
             amount=form.amount.data,
         )
         db.session.add(movement)
-        db.session.commit()
-        return redirect(url_for("client_detail", client_id=client.id))
+        try:
+            record_cash({payment.date: {payment.method: payment.amount}})
+        except CashClosedError as exc:
+            db.session.rollback()
+            flash(str(exc), "error")
+        else:
+            db.session.commit()
+        return redirect(url_for("main.client_detail", client_id=client.id))
     if request.method == "POST":
         flash_form_errors(form)
     debt_form = DebtForm()
-    return render_template(
-        "client_detail.html", client=client, debt_form=debt_form, payment_form=form
-    )
+    return render_client_detail(client, debt_form, form)
 
 
-@app.route("/cash", methods=["GET", "POST"])
+MAX_CASH_CLOSE_DAYS = 366
+
+
+@bp.route("/cash", methods=["GET", "POST"])
 @login_required
+@conditional
 def cash():
-    user = User.query.get(session.get("user_id"))
+    user = current_user()
     withdraw_form = WithdrawalForm(prefix="withdraw")
     income_form = IncomeForm(prefix="income")
+    action = None
     if withdraw_form.submit.data:
         if withdraw_form.validate_on_submit():
-            movement = Movement(
-                user_id=user.id,
-                action="cash_withdrawal",
-                amount=withdraw_form.amount.data,
-                description=withdraw_form.description.data,
-            )
-            db.session.add(movement)
-            db.session.commit()
-            return redirect(url_for("cash"))
-        flash_form_errors(withdraw_form)
+            action, form = "cash_withdrawal", withdraw_form
+        else:
+            flash_form_errors(withdraw_form)
     elif income_form.submit.data:
         if income_form.validate_on_submit():
             if user.role != "admin":
-                return redirect(url_for("cash"))
-            movement = Movement(
+                return redirect(url_for("main.cash"))
+            action, form = "cash_income", income_form
+        else:
+            flash_form_errors(income_form)
+    if action:
+        now = datetime.utcnow()
+        db.session.add(
+            Movement(
                 user_id=user.id,
-                action="cash_income",
-                amount=income_form.amount.data,
-                description=income_form.description.data,
+                action=action,
+                amount=form.amount.data,
+                description=form.description.data,
+                timestamp=now,
             )
-            db.session.add(movement)
+        )
+        try:
+            record_cash({now.date(): {action: form.amount.data}})
+        except CashClosedError as exc:
+            db.session.rollback()
+            flash(str(exc), "error")
+        else:
             db.session.commit()
-            return redirect(url_for("cash"))
-        flash_form_errors(income_form)
+        return redirect(url_for("main.cash"))
 
-    date_str = request.args.get("date")
-    if date_str:
-        selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    else:
-        selected_date = date.today()
+    selected_date = day_arg("date", date.today())
 
-    payments = Payment.query.filter(Payment.date == selected_date).all()
-    withdrawals_all = Movement.query.filter_by(action="cash_withdrawal").all()
-    withdrawals = [w for w in withdrawals_all if w.timestamp.date() == selected_date]
-    incomes_all = Movement.query.filter_by(action="cash_income").all()
-    incomes = [i for i in incomes_all if i.timestamp.date() == selected_date]
+    def load_day():
+        payments = (
+            Payment.query.options(joinedload(Payment.client))
+            .filter(Payment.date == selected_date)
+            .order_by(Payment.id)
+            .all()
+        )
+        cash_movements = day_cash_movements(selected_date)
+        return {
+            "payments": payments,
+            "withdrawals": [m for m in cash_movements if m.action == "cash_withdrawal"],
+            "incomes": [m for m in cash_movements if m.action == "cash_income"],
+        }
 
-    total_payments = sum(p.amount for p in payments if p.method == "cash")
-    total_incomes = sum(i.amount for i in incomes)
-    total_withdrawals = sum(w.amount for w in withdrawals)
-    cash_total = total_payments + total_incomes - total_withdrawals
+    totals = cached("cash_snapshot", selected_date, lambda: day_snapshot(selected_date))
+    total_payments = totals["cash"]
+    total_incomes = totals["cash_income"]
+    total_withdrawals = totals["cash_withdrawal"]
+    cash_total = totals["cash_total"]
 
     return render_template(
         "cash.html",
-        payments=payments,
-        withdrawals=withdrawals,
-        incomes=incomes,
+        load_day=load_day,
         withdraw_form=withdraw_form,
         income_form=income_form,
         date=selected_date,
@@ -310,54 +494,136 @@ def cash():
         total_withdrawals=total_withdrawals,
         total_incomes=total_incomes,
         cash_total=cash_total,
+        totals=totals,
         is_admin=user.role == "admin",
     )
 
 
-@app.route("/report")
+@bp.route("/cash/cierre")
+@login_required
+@conditional
+def cash_close():
+    end_day = day_arg("end", date.today())
+    start_day = day_arg("start", end_day - timedelta(days=6))
+    if start_day > end_day:
+        start_day, end_day = end_day, start_day
+    if (end_day - start_day).days > MAX_CASH_CLOSE_DAYS:
+        start_day = end_day - timedelta(days=MAX_CASH_CLOSE_DAYS)
+        flash(f"El rango se limitó a {MAX_CASH_CLOSE_DAYS} días", "error")
+    rows = cached(
+        "cash_snapshots", (start_day, end_day), lambda: snapshot_range(start_day, end_day)
+    )
+    return render_template(
+        "cash_close.html",
+        rows=rows,
+        summary=sum_rows(rows),
+        start=start_day,
+        end=end_day,
+    )
+
+
+@bp.route("/cash/cerrar", methods=["POST"])
 @login_required
+@admin_required
+def close_cash_day():
+    try:
+        day = datetime.strptime(request.form.get("date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        abort(400)
+    try:
+        count = close_cash(day, user_id=session.get("user_id"))
+    except CashClosedError as exc:
+        flash(str(exc), "error")
+    else:
+        flash(f"Caja cerrada al {day.strftime('%d/%m/%Y')} ({count} días)")
+    return redirect(url_for("main.cash", date=day.strftime("%Y-%m-%d")))
+
+
+@bp.route("/report")
+@login_required
+@conditional
 def report():
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
     client_id = request.args.get("client_id")
-
-    query = Movement.query
-    start_date = None
-    end_date = None
-    if start_date_str:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        query = query.filter(Movement.timestamp >= start_date)
-    if end_date_str:
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-        query = query.filter(Movement.timestamp <= end_date)
+    selected_client = None
     if client_id:
-        query = query.filter(Movement.client_id == int(client_id))
+        # the picker sends an id; one lookup validates it and gives its name
+        selected_client = db.session.get(Client, int(client_id)) if client_id.isdigit() else None
+        if selected_client is None:
+            flash("Cliente inexistente", "error")
+            client_id = None
+    try:
+        filters, conditions = parse_filters(start_date_str, end_date_str, client_id)
+    except FilterError as exc:
+        # only the dates can be wrong here; show the report without them
+        flash(str(exc), "error")
+        start_date_str = end_date_str = None
+        filters, conditions = parse_filters(None, None, client_id)
+
+    limit = page_size(request.args.get("limit"))
+    totals = cached(
+        "report_totals",
+        (start_date_str, end_date_str, client_id),
+        lambda: report_totals(filters, conditions),
+    )
 
-    movements = query.order_by(Movement.timestamp.desc()).all()
-    total_debt = sum(m.amount or 0 for m in movements if m.action == "add_debt")
-    total_payment = sum(m.amount or 0 for m in movements if m.action == "add_payment")
+    def load_page():
+        rows, last = movement_page(
+            filters, conditions, decode_cursor(request.args.get("after")), limit
+        )
+        next_cursor = encode_cursor([last.timestamp, last.id]) if last is not None else None
+        return {"rows": rows, "next_cursor": next_cursor}
 
-    clients = Client.query.all()
     return render_template(
         "report.html",
-        movements=movements,
-        clients=clients,
+        load_page=load_page,
+        selected_client=selected_client,
         start_date=start_date_str,
         end_date=end_date_str,
         client_id=client_id,
-    total_debt=total_debt,
-    total_payment=total_payment,
+        total_debt=totals["add_debt"],
+        total_payment=totals["add_payment"],
+        limit=limit,
+        is_first_page=not request.args.get("after"),
+    )
+
+
+@bp.route("/report/export")
+@login_required
+def report_export():
+    try:
+        filters, conditions = parse_filters(
+            request.args.get("start_date"),
+            request.args.get("end_date"),
+            request.args.get("client_id"),
+        )
+    except FilterError as exc:
+        abort(400, str(exc))
+    export_format = request.args.get("format", "csv")
+    rows = iter_movements(filters, conditions)
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    if export_format == "ndjson":
+        body, mimetype = ndjson_lines(rows), "application/x-ndjson"
+    else:
+        export_format = "csv"
+        body, mimetype = csv_lines(rows), "text/csv"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=movimientos_{stamp}.{export_format}"
+        },
     )
 
 
-@app.route("/deudas/nueva", methods=["GET", "POST"])
+@bp.route("/deudas/nueva", methods=["GET", "POST"])
 @login_required
 @admin_required
 def new_debt():
     form = DebtClientForm()
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.all()]
     if form.validate_on_submit():
-        client = Client.query.get_or_404(form.client_id.data)
+        client = form.client
         debt = Debt(
             client=client,
             amount=form.amount.data,
@@ -365,6 +631,8 @@ def new_debt():
             date=form.date.data or date.today(),
         )
         db.session.add(debt)
+        record_debt(client.id, debt.amount, debt.date)
+        allocate([client.id])
         movement = Movement(
             user_id=session.get("user_id"),
             client=client,
@@ -374,43 +642,334 @@ def new_debt():
         )
         db.session.add(movement)
         db.session.commit()
-        return redirect(url_for("debts"))
+        return redirect(url_for("main.debts"))
     if request.method == "POST":
         flash_form_errors(form)
     return render_template("new_debt.html", form=form)
 
 
-@app.route("/deudas")
+BATCH_ROWS = 10
+MAX_BATCH_ROWS = 50
+BATCH_FIELDS = ("type", "client_id", "date", "amount", "method", "description")
+
+
+def _batch_form_rows(form) -> list:
+    """Every row of the /lote form as a dict of its raw values."""
+    rows = []
+    while len(rows) < MAX_BATCH_ROWS and f"rows-{len(rows)}-type" in form:
+        index = len(rows)
+        rows.append({field: form.get(f"rows-{index}-{field}", "").strip() for field in BATCH_FIELDS})
+    return rows
+
+
+def _batch_json():
+    payload = request.get_json(silent=True)
+    entries = payload.get("entries") if isinstance(payload, dict) else None
+    key = request.headers.get("Idempotency-Key", "").strip() or None
+    if key and len(key) > MAX_KEY_LENGTH:
+        return jsonify(error=f"Idempotency-Key supera {MAX_KEY_LENGTH} caracteres"), 400
+    try:
+        result, replayed = post_batch(entries, session.get("user_id"), key)
+    except BatchError as exc:
+        db.session.rollback()
+        return jsonify(errors=[{"index": i, "message": m} for i, m in exc.errors]), 422
+    except (IdempotencyConflict, CashClosedError) as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc)), 409
+    response = jsonify(result)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+        return response, 200
+    return response, 201
+
+
+@bp.route("/lote", methods=["GET", "POST"])
+@login_required
+@admin_required
+def batch():
+    """Post many debts and payments at once; JSON bodies get JSON answers."""
+    if request.method == "POST" and request.is_json:
+        return _batch_json()
+    key = uuid.uuid4().hex
+    try:
+        count = min(max(int(request.args.get("filas", BATCH_ROWS)), 1), MAX_BATCH_ROWS)
+    except ValueError:
+        count = BATCH_ROWS
+    rows = [dict.fromkeys(BATCH_FIELDS, "") for _ in range(count)]
+    if request.method == "POST":
+        rows = _batch_form_rows(request.form) or rows
+        key = request.form.get("idempotency_key", "")[:MAX_KEY_LENGTH] or key
+        filled = [
+            (number, row) for number, row in enumerate(rows, 1) if row["client_id"] or row["amount"]
+        ]
+        try:
+            result, replayed = post_batch([row for _, row in filled], session.get("user_id"), key)
+        except BatchError as exc:
+            db.session.rollback()
+            for index, message in exc.errors:
+                flash(f"Fila {filled[index][0]}: {message}" if index is not None else message, "error")
+        except (IdempotencyConflict, CashClosedError) as exc:
+            db.session.rollback()
+            flash(str(exc), "error")
+        else:
+            if replayed:
+                flash("El lote ya estaba registrado")
+            else:
+                flash(f"{result['debts']} deudas y {result['payments']} pagos registrados")
+            return redirect(url_for("main.batch"))
+    ids = {int(row["client_id"]) for row in rows if row["client_id"].isdigit()}
+    names = (
+        dict(Client.query.with_entities(Client.id, Client.name).filter(Client.id.in_(ids)))
+        if ids
+        else {}
+    )
+    return render_template(
+        "batch.html",
+        rows=rows,
+        names=names,
+        key=key,
+        today=date.today().isoformat(),
+        methods=METHOD_LABELS,
+    )
+
+
+@bp.route("/importar", methods=["GET", "POST"])
+@login_required
+@admin_required
+def import_data():
+    kind = request.form.get("kind", "clients")
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if kind not in KINDS or not upload or not upload.filename:
+            flash("Seleccione el tipo de datos y un archivo", "error")
+        else:
+            try:
+                name = save_upload(upload)
+            except ImportFormatError as exc:
+                flash(str(exc), "error")
+            else:
+                job = submit(
+                    "import",
+                    {"upload": name, "kind": kind, "filename": upload.filename},
+                    user_id=session.get("user_id"),
+                )
+                return redirect(url_for("main.job_detail", job_id=job.id))
+    return render_template("import.html", kinds=KINDS, columns=COLUMNS, kind=kind)
+
+
+@bp.route("/deudas")
 @login_required
+@conditional
 def debts():
-    debts = Debt.query.order_by(Debt.date.desc()).all()
-    return render_template("debts.html", debts=debts)
+    filters, conditions = parse_debt_filters(request.args)
+    limit = page_size(request.args.get("limit"))
+    query = Debt.query.options(selectinload(Debt.client)).filter(*conditions)
+    summary = cached(
+        "debt_summary",
+        tuple(sorted((k, str(v)) for k, v in filters.items())),
+        lambda: debt_summary(conditions),
+    )
+    selected_client = db.session.get(Client, filters["client_id"]) if filters["client_id"] else None
+    args = {k: v for k, v in request.args.items() if k != "after" and v}
+    return render_template(
+        "debts.html",
+        load_page=lazy_page(query, [Debt.date, Debt.id], limit, descending=True),
+        filters=filters,
+        summary=summary,
+        selected_client=selected_client,
+        args=args,
+        is_first_page=not request.args.get("after"),
+    )
+
+
+@bp.route("/deudas/antiguedad")
+@login_required
+@conditional
+def aging():
+    today = date.today()
+    query, columns = aging_by_client(today)
+    args = {k: v for k, v in request.args.items() if k != "after" and v}
+    return render_template(
+        "aging.html",
+        buckets=AGING_BUCKETS,
+        summary=cached("aging", today, lambda: aging_distribution(today)),
+        load_page=lazy_page(query, columns, page_size(request.args.get("limit")), descending=True),
+        today=today,
+        args=args,
+        is_first_page=not request.args.get("after"),
+    )
 
 
-@app.route("/graficos")
+@bp.route("/graficos")
 @login_required
+@conditional
 def charts():
-    clients = Client.query.all()
-    labels = [c.name for c in clients]
-    debts_data = [c.total_debt for c in clients]
-    return render_template("charts.html", labels=labels, debts=debts_data)
+    return render_template("charts.html")
+
+
+@bp.route("/graficos/datos")
+@login_required
+@conditional
+def charts_data():
+    try:
+        top = max(1, min(int(request.args.get("top", 10)), MAX_TOP))
+    except ValueError:
+        top = 10
+    bucket = request.args.get("bucket", "week")
+    if bucket not in BUCKETS:
+        bucket = "week"
+    today = date.today()
+    start = today - timedelta(days=DEFAULT_SPAN[bucket])
+    return jsonify(
+        version=data_version(),
+        top_debtors=cached("top_debtors", top, lambda: top_debtors(top)),
+        series=cached(
+            "time_series", (bucket, start, today), lambda: time_series(bucket, start, today)
+        ),
+        aging=cached("aging", today, lambda: aging_distribution(today)),
+    )
+
+
+@bp.route("/admin/cache")
+@login_required
+@admin_required
+def cache_status():
+    return jsonify(version=data_version(), stats=cache_stats())
+
+
+@bp.route("/admin/metrics")
+@login_required
+@admin_required
+def metrics():
+    return Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/admin/consultas-lentas")
+@login_required
+@admin_required
+def slow_queries():
+    return jsonify(
+        {
+            endpoint: {"ms": round(seconds * 1000, 2), "sql": " ".join(statement.split())}
+            for endpoint, (seconds, statement) in slowest_queries().items()
+        }
+    )
+
+
+def _visible_job(job_id: int) -> Job:
+    """The job if the signed-in user started it or is an admin; 404 otherwise."""
+    job = db.session.get(Job, job_id)
+    user = current_user()
+    if job is None or (user.role != "admin" and job.user_id != user.id):
+        abort(404)
+    return job
+
+
+def _wants_json() -> bool:
+    return request.accept_mimetypes.best == "application/json"
+
+
+@bp.route("/trabajos", methods=["GET", "POST"])
+@login_required
+def jobs():
+    user = current_user()
+    if request.method == "POST":
+        kind = request.form.get("kind", "")
+        # imports need an upload and go through /importar
+        if kind not in KIND_LABELS or kind == "import":
+            abort(400)
+        if kind in ADMIN_KINDS and user.role != "admin":
+            abort(403)
+        params = {}
+        if kind == "report_export":
+            params = {
+                key: request.form.get(key) or None
+                for key in ("start_date", "end_date", "client_id", "format")
+            }
+            try:
+                parse_filters(params["start_date"], params["end_date"], params["client_id"])
+            except FilterError as exc:
+                if _wants_json():
+                    return jsonify(error=str(exc)), 400
+                flash(str(exc), "error")
+                return redirect(url_for("main.report"))
+        job = submit(kind, params, user_id=user.id)
+        if _wants_json():
+            return (
+                jsonify(
+                    id=job.id,
+                    status_url=url_for("main.job_status_json", job_id=job.id),
+                ),
+                202,
+            )
+        return redirect(url_for("main.job_detail", job_id=job.id))
+
+    query = Job.query.order_by(Job.id.desc())
+    if user.role != "admin":
+        query = query.filter(Job.user_id == user.id)
+    return render_template(
+        "jobs.html",
+        jobs=query.limit(50).all(),
+        kind_labels=KIND_LABELS,
+        status_labels=STATUS_LABELS,
+        is_admin=user.role == "admin",
+    )
+
+
+@bp.route("/trabajos/<int:job_id>")
+@login_required
+def job_detail(job_id: int):
+    job = _visible_job(job_id)
+    return render_template(
+        "job.html",
+        job=job,
+        status=job_status(job),
+        kind_labels=KIND_LABELS,
+        status_labels=STATUS_LABELS,
+    )
+
+
+@bp.route("/trabajos/<int:job_id>/estado")
+@login_required
+def job_status_json(job_id: int):
+    status = job_status(_visible_job(job_id))
+    if status["download"]:
+        status["download_url"] = url_for("main.job_download", job_id=job_id)
+    return jsonify(status)
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/trabajos/<int:job_id>/descarga")
+@login_required
+def job_download(job_id: int):
+    job = _visible_job(job_id)
+    if job.status != "done" or not job.filename:
+        abort(404)
+    stamp = job.finished_at.strftime("%Y%m%d%H%M%S")
+    extension = os.path.splitext(job.filename)[1]
+    return send_file(
+        job_path(job),
+        mimetype="application/x-ndjson" if extension == ".ndjson" else "text/csv",
+        as_attachment=True,
+        download_name=f"movimientos_{stamp}{extension}",
+    )
+
+
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and check_password_hash(user.password_hash, form.password.data):
-            session["user_id"] = user.id
-            return redirect(url_for("index"))
+        if user and verify_password(user, form.password.data):
+            db.session.commit()
+            login_user(user)
+            return redirect(url_for("main.index"))
         flash("Credenciales inválidas", "error")
     elif request.method == "POST":
         flash_form_errors(form)
     return render_template("login.html", form=form)
 
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         username = request.form["username"]
@@ -418,19 +977,353 @@ def register():
         if User.query.filter_by(username=username).first():
             flash("Usuario ya existe", "error")
         else:
-            pw_hash = generate_password_hash(password)
+            pw_hash = hash_password(password)
             user = User(username=username, password_hash=pw_hash, role="user")
             db.session.add(user)
             db.session.commit()
-            return redirect(url_for("login"))
+            return redirect(url_for("main.login"))
     return render_template("register.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
-    session.pop("user_id", None)
-    return redirect(url_for("login"))
+    logout_user()
+    return redirect(url_for("main.login"))
+
+
+@bp.cli.command("rebuild-balances")
+@click.option("--check", is_flag=True, help="Solo verificar, sin corregir.")
+def rebuild_balances_command(check):
+    """Recalcula los saldos de clientes desde deudas y pagos."""
+    drift = find_balance_drift()
+    for item in drift:
+        click.echo(
+            f"Cliente {item['client_id']} ({item['name']}): "
+            f"saldo {item['balance']} != {item['expected_balance']}, "
+            f"deudas {item['debt_count']} != {item['expected_debt_count']}, "
+            f"pagos {item['payment_count']} != {item['expected_payment_count']}"
+        )
+    if check:
+        click.echo(f"{len(drift)} clientes con diferencias")
+        if drift:
+            raise SystemExit(1)
+        return
+    updated = rebuild_balances()
+    click.echo(f"{len(drift)} clientes con diferencias, {updated} saldos recalculados")
+
+
+@bp.cli.command("rebuild-allocations")
+@click.option("--check", is_flag=True, help="Solo verificar, sin corregir.")
+def rebuild_allocations_command(check):
+    """Verifica o rehace la imputación de pagos a deudas (FIFO)."""
+    drift = find_allocation_drift()
+    for item in drift:
+        click.echo(
+            f"Cliente {item['client_id']} ({item['name']}): saldo {item['balance']} != "
+            f"deudas abiertas menos crédito {item['expected']}"
+        )
+    if check:
+        click.echo(f"{len(drift)} clientes con diferencias")
+        if drift:
+            raise SystemExit(1)
+        return
+    made = rebuild_allocations()
+    click.echo(f"{len(drift)} clientes con diferencias, {made} imputaciones registradas")
+
+
+@bp.cli.command("rebuild-cash-snapshots")
+@click.option("--check", is_flag=True, help="Solo verificar, sin corregir.")
+def rebuild_cash_snapshots_command(check):
+    """Verifica o rehace los resúmenes diarios de caja desde pagos y movimientos."""
+    drift = find_cash_drift()
+    for day, key, stored, expected in drift:
+        click.echo(f"{day} {key}: {stored} != {expected}")
+    if check:
+        click.echo(f"{len(drift)} diferencias")
+        if drift:
+            raise SystemExit(1)
+        return
+    days = rebuild_cash_snapshots()
+    click.echo(f"{len(drift)} diferencias, {days} días recalculados")
+
+
+@bp.cli.command("close-cash")
+@click.option("--day", default=None, help="Último día a cerrar (AAAA-MM-DD), por defecto ayer.")
+def close_cash_command(day):
+    """Cierra la caja hasta un día; esos días ya no aceptan pagos ni movimientos."""
+    if day:
+        try:
+            day = datetime.strptime(day, "%Y-%m-%d").date()
+        except ValueError:
+            raise click.BadParameter("use AAAA-MM-DD", param_hint="--day")
+    else:
+        day = date.today() - timedelta(days=1)
+    try:
+        count = close_cash(day)
+    except CashClosedError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f"{count} días cerrados")
+
+
+@bp.cli.command("reconcile")
+@click.option("--fix", is_flag=True, help="Corregir los saldos con diferencias.")
+def reconcile_command(fix):
+    """Recalcula saldos y cajas diarias y los compara con lo guardado."""
+    result = reconcile()
+    for item in result["drift"]:
+        click.echo(
+            f"Cliente {item['client_id']}: saldo {item['balance']} != {item['expected_balance']}, "
+            f"deudas {item['debt_count']} != {item['expected_debt_count']}, "
+            f"pagos {item['payment_count']} != {item['expected_payment_count']}"
+        )
+    for day, key, computed, stored in result["cash_mismatch"]:
+        click.echo(f"Caja {day}: {key} {computed} != {stored}")
+    click.echo(
+        f"{result['clients']} clientes, {result['rows']} filas, {result['days']} días "
+        f"en {result['seconds']:.2f}s: {len(result['drift'])} saldos y "
+        f"{len(result['cash_mismatch'])} totales de caja con diferencias"
+    )
+    if fix:
+        click.echo(f"{fix_drift(result['drift'])} saldos corregidos")
+    elif result["drift"] or result["cash_mismatch"]:
+        raise SystemExit(1)
+
+
+@bp.cli.command("set-role")
+@click.argument("username")
+@click.argument("role", type=click.Choice(("user", "admin")))
+def set_role_command(username, role):
+    """Cambia el rol de un usuario y cierra sus sesiones abiertas."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"Usuario inexistente: {username}")
+    user.role = role
+    db.session.commit()
+    click.echo(f"{username} ahora es {role}")
+
+
+@bp.cli.command("archive-movements")
+@click.option("--month", help="Mes a archivar (AAAA-MM); por defecto todos los meses cerrados.")
+def archive_movements_command(month):
+    """Mueve los movimientos de meses cerrados a archivos SQLite de solo lectura."""
+    try:
+        if month:
+            try:
+                day = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise click.BadParameter(f"Mes inválido: {month}")
+            done = [(day, archive_month(day))]
+        else:
+            done = archive_closed_months()
+    except ArchiveError as exc:
+        raise click.ClickException(str(exc))
+    for day, count in done:
+        click.echo(f"{day:%Y-%m}: {count} movimientos archivados")
+    click.echo(f"{len(done)} meses procesados")
+
+
+@bp.cli.command("reindex-clients")
+def reindex_clients_command():
+    """Reconstruye el índice de búsqueda de clientes."""
+    count = reindex_clients()
+    click.echo(f"{count} clientes indexados")
+
+
+@bp.cli.command("import-data")
+@click.argument("kind", type=click.Choice(KINDS))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=1000, show_default=True, help="Filas por transacción.")
+def import_data_command(kind, path, chunk_size):
+    """Importa clientes, deudas o pagos desde un archivo CSV o XLSX."""
+    with open(path, "rb") as stream:
+        result = Importer(kind, chunk_size=chunk_size).run(
+            read_rows(stream, path),
+            progress=lambda inserted, errors: click.echo(
+                f"{inserted} filas importadas, {errors} con errores", err=True
+            ),
+        )
+    for line, message in result["errors"]:
+        click.echo(f"Línea {line}: {message}")
+    click.echo(f"{result['inserted']} filas importadas, {result['error_count']} con errores")
+
+
+@bp.cli.command("run-jobs")
+@click.option("--limit", type=int, default=None, help="Máximo de trabajos a ejecutar.")
+def run_jobs_command(limit):
+    """Ejecuta los trabajos que quedaron en cola (por ejemplo tras un reinicio)."""
+    click.echo(f"{run_queued(limit)} trabajos ejecutados")
+
+
+@bp.cli.command("purge-jobs")
+def purge_jobs_command():
+    """Borra los trabajos terminados más viejos que JOB_RETENTION_HOURS y sus archivos."""
+    click.echo(f"{purge_jobs()} trabajos borrados")
+
+
+@bp.cli.command("purge-idempotency-keys")
+@click.option("--hours", type=int, default=24, show_default=True, help="Antigüedad mínima.")
+def purge_idempotency_keys_command(hours):
+    """Borra las claves de idempotencia de /lote más viejas que --hours."""
+    click.echo(f"{purge_idempotency_keys(hours)} claves borradas")
+
+
+@bp.cli.command("feed")
+@click.option("--after", type=int, default=None, help="Secuencia desde la que leer (exclusiva).")
+@click.option("--consumer", default=None, help="Retomar desde el punto de control de este consumidor.")
+@click.option("--limit", type=int, default=None, help="Movimientos por lote (FEED_BATCH_SIZE).")
+@click.option("--ack", is_flag=True, help="Guardar el punto de control tras escribir cada lote.")
+def feed_command(after, consumer, limit, ack):
+    """Escribe en NDJSON los movimientos posteriores a una secuencia, por lotes."""
+    if ack and not consumer:
+        raise click.UsageError("--ack requiere --consumer")
+    try:
+        if after is None:
+            after = checkpoint(consumer) if consumer else 0
+        size = feed_batch_size(limit)
+        while True:
+            rows = changes_after(after, size)
+            for line in change_lines(rows):
+                click.echo(line, nl=False)
+            if not rows:
+                break
+            after = rows[-1]["seq"]
+            if ack:
+                save_checkpoint(consumer, after)
+            if len(rows) < size:
+                break
+    except FeedError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f"Última secuencia: {after}", err=True)
+
+
+@bp.cli.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Mostrar el plan de cada consulta.")
+def check_query_plans_command(verbose):
+    """Falla si alguna consulta de las rutas principales recorre una tabla completa."""
+    def show(method, url, statement, details):
+        click.echo(f"{method} {url}\n  {' '.join(statement.split())}")
+        for detail in details:
+            click.echo(f"    {detail}")
+
+    problems = check_query_plans(create_app, verbose=show if verbose else None)
+    for method, url, statement, detail in problems:
+        click.echo(f"{method} {url}: {detail}\n  {' '.join(statement.split())}")
+    if problems:
+        raise SystemExit(1)
+    click.echo("Sin recorridos completos de tablas")
+
+
+def _scale_debts(scale, debts):
+    return debts if debts is not None else SCALES[scale]
+
+
+@bp.cli.command("seed-synthetic")
+@click.option("--scale", type=click.Choice(tuple(SCALES)), default="1k", show_default=True)
+@click.option("--debts", type=int, help="Cantidad de deudas; reemplaza a --scale.")
+@click.option("--seed", default=0, show_default=True, help="Semilla del generador.")
+@click.option("--days", default=365, show_default=True, help="Días de historia.")
+def seed_synthetic_command(scale, debts, seed, days):
+    """Carga clientes, deudas, pagos y movimientos sintéticos reproducibles."""
+    started = datetime.now()
+    counts = generate(_scale_debts(scale, debts), seed=seed, days=days)
+    for table, count in sorted(counts.items()):
+        click.echo(f"{table}: {count} filas")
+    click.echo(f"Datos generados en {(datetime.now() - started).total_seconds():.1f}s")
+
+
+@bp.cli.command("bench")
+@click.option("--scale", type=click.Choice(tuple(SCALES)), default="1k", show_default=True)
+@click.option("--debts", type=int, help="Cantidad de deudas; reemplaza a --scale.")
+@click.option("--seed", default=0, show_default=True, help="Semilla del generador.")
+@click.option("--repeat", default=30, show_default=True, help="Pedidos medidos por ruta.")
+@click.option("--cache", is_flag=True, help="Medir con la caché en memoria activa.")
+@click.option("--baseline", default=BASELINE_PATH, show_default=True, help="Archivo de referencia.")
+@click.option("--save-baseline", is_flag=True, help="Guardar esta corrida como referencia.")
+@click.option("--tolerance", default=0.25, show_default=True, help="Aumento de p95 tolerado.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Guardar los resultados en JSON.")
+def bench_command(scale, debts, seed, repeat, cache, baseline, save_baseline, tolerance, output):
+    """Mide latencia (p50/p95/p99) y consultas por ruta sobre datos sintéticos."""
+    result = run_benchmark(
+        create_app,
+        _scale_debts(scale, debts),
+        seed=seed,
+        repeat=repeat,
+        cache=cache,
+        progress=lambda message: click.echo(message, err=True),
+    )
+    click.echo(f"{'ruta':<18} {'p50':>9} {'p95':>9} {'p99':>9} {'consultas':>10}")
+    for name, row in result["routes"].items():
+        click.echo(
+            f"{name:<18} {row['p50']:>9.2f} {row['p95']:>9.2f} {row['p99']:>9.2f} "
+            f"{row['queries']:>10}"
+        )
+    if output:
+        write_result(result, output)
+    if save_baseline:
+        write_result(result, baseline)
+        click.echo(f"Referencia guardada en {baseline}")
+        return
+    reference = load_baseline(baseline)
+    if reference is None:
+        click.echo("Sin referencia para comparar; use --save-baseline")
+        return
+    if reference["meta"]["debts"] != result["meta"]["debts"] or reference["meta"]["cache"] != cache:
+        click.echo("La referencia se midió con otra escala o caché; se compara igual", err=True)
+    regressions = compare(result, reference, tolerance)
+    for name, metric, before, now in regressions:
+        click.echo(f"Regresión en {name}: {metric} {before} -> {now}")
+    if regressions:
+        raise SystemExit(1)
+    click.echo("Sin regresiones respecto de la referencia")
+
+
+@bp.cli.command("load-test")
+@click.option("--scale", type=click.Choice(tuple(SCALES)), default="1k", show_default=True)
+@click.option("--debts", type=int, help="Cantidad de deudas; reemplaza a --scale.")
+@click.option("--processes", default="1,2,4", show_default=True, help="Procesos a probar.")
+@click.option("--threads", default=4, show_default=True, help="Hilos por proceso.")
+@click.option("--duration", default=10.0, show_default=True, help="Segundos por corrida.")
+@click.option("--seed", default=0, show_default=True, help="Semilla del generador.")
+@click.option("--cache", is_flag=True, help="Medir con la caché en memoria activa.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Guardar los resultados en JSON.")
+def load_test_command(scale, debts, processes, threads, duration, seed, cache, output):
+    """Mide pedidos por segundo de las rutas GET con varios procesos e hilos."""
+    try:
+        counts = [int(value) for value in processes.split(",") if value.strip()]
+    except ValueError:
+        raise click.BadParameter("use números separados por comas", param_hint="--processes")
+    if not counts or min(counts) < 1 or threads < 1:
+        raise click.BadParameter("procesos e hilos deben ser al menos 1")
+    result = run_load_test(
+        create_app,
+        _scale_debts(scale, debts),
+        processes=counts,
+        threads=threads,
+        duration=duration,
+        seed=seed,
+        cache=cache,
+        progress=lambda message: click.echo(message, err=True),
+    )
+    click.echo(f"{result['meta']['cpus']} núcleos, {threads} hilos por proceso")
+    click.echo(f"{'procesos':>8} {'pedidos/s':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for row in result["runs"].values():
+        click.echo(
+            f"{row['processes']:>8} {row['rps']:>10.1f} {row['p50']:>9.2f} "
+            f"{row['p95']:>9.2f} {row['p99']:>9.2f}"
+        )
+    if output:
+        write_result(result, output)
+
+
+@bp.cli.command("bootstrap")
+def bootstrap_command():
+    """Aplica las migraciones pendientes y crea el usuario admin inicial."""
+    upgrade()
+    ensure_admin()
+    click.echo("Base de datos actualizada")
+
 
+app = create_app()
 
 
 if __name__ == "__main__":
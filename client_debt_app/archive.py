@@ -0,0 +1,364 @@
+import os
+import sqlite3
+import stat
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import Integer, delete, func, select, type_coerce
+from cache import cached
+from models import db, Client, Movement, MovementArchive, from_cents
+from settings import apply_defaults
+
+DEFAULTS = {
+    # empty means <app root>/archive
+    "ARCHIVE_DIR": "",
+    # months that stay in the movement table, counting the current one
+    "ARCHIVE_KEEP_MONTHS": 2,
+}
+
+# Same fields as the report export rows, so callers can mix both sources.
+MovementRow = namedtuple(
+    "MovementRow", "id timestamp client_id client action amount description user_id"
+)
+_STORED_COLUMNS = ("id", "timestamp", "client_id", "action", "amount", "description", "user_id")
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+_FETCH_SIZE = 500
+# user_version 1: amounts stored as integer cents (0 was floating point)
+# user_version 2: adds the change-feed ``seq`` (older files: seq is the id)
+_FORMAT_VERSION = 2
+
+_SCHEMA = (
+    """
+    CREATE TABLE movement (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        client_id INTEGER,
+        action TEXT NOT NULL,
+        amount INTEGER,
+        description TEXT,
+        user_id INTEGER,
+        seq INTEGER
+    )
+    """,
+    "CREATE UNIQUE INDEX ix_movement_seq ON movement (seq)",
+    "CREATE INDEX ix_movement_timestamp ON movement (timestamp, id)",
+    "CREATE INDEX ix_movement_client_timestamp ON movement (client_id, timestamp, id)",
+    "CREATE INDEX ix_movement_action_timestamp ON movement (action, timestamp)",
+)
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+def init_archive(app) -> None:
+    apply_defaults(app, DEFAULTS)
+
+
+def archive_dir() -> str:
+    return current_app.config["ARCHIVE_DIR"] or os.path.join(current_app.root_path, "archive")
+
+
+def month_start(day) -> date:
+    return date(day.year, day.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def first_open_month(today: date = None) -> date:
+    """Oldest month that still lives in the movement table."""
+    keep = max(1, current_app.config["ARCHIVE_KEEP_MONTHS"])
+    return _add_months(month_start(today or date.today()), 1 - keep)
+
+
+def _format(value: datetime) -> str:
+    return value.strftime(_TIMESTAMP_FORMAT)
+
+
+def _as_month(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def archived_months() -> list:
+    """``(month, filename)`` of every archive, newest first."""
+    return cached(
+        "movement_archives",
+        None,
+        lambda: [
+            (_as_month(month), filename)
+            for month, filename in db.session.execute(
+                select(MovementArchive.month, MovementArchive.filename).order_by(
+                    MovementArchive.month.desc()
+                )
+            )
+        ],
+    )
+
+
+def _partitions(start: datetime = None, end: datetime = None) -> list:
+    """Archive files that can hold movements in ``[start, end)``."""
+    return [
+        os.path.join(archive_dir(), filename)
+        for month, filename in archived_months()
+        if (end is None or datetime.combine(month, datetime.min.time()) < end)
+        and (start is None or datetime.combine(next_month(month), datetime.min.time()) > start)
+    ]
+
+
+def _connect(path: str):
+    return sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True)
+
+
+def _amount_reader(connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version >= 1:
+        return lambda value: None if value is None else from_cents(value)
+    return lambda value: None if value is None else Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def _where(start, end, client_id, actions, before=None):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_format(start))
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(_format(end))
+    if client_id is not None:
+        clauses.append("client_id = ?")
+        params.append(client_id)
+    if actions:
+        clauses.append(f"action IN ({', '.join('?' for _ in actions)})")
+        params.extend(actions)
+    if before is not None:
+        clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+        params.extend([_format(before[0]), _format(before[0]), before[1]])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _with_client_names(batch, amount) -> list:
+    ids = {row[2] for row in batch if row[2] is not None}
+    names = {}
+    if ids:
+        names = dict(
+            db.session.execute(select(Client.id, Client.name).where(Client.id.in_(ids))).all()
+        )
+    return [
+        MovementRow(
+            id=row[0],
+            timestamp=datetime.strptime(row[1], _TIMESTAMP_FORMAT),
+            client_id=row[2],
+            client=names.get(row[2]),
+            action=row[3],
+            amount=amount(row[4]),
+            description=row[5],
+            user_id=row[6],
+        )
+        for row in batch
+    ]
+
+
+def archived_rows(start=None, end=None, client_id=None, actions=None, before=None):
+    """Yield archived movements newest first, opening only the months in range.
+
+    ``before`` is an optional ``(timestamp, id)`` keyset bound.
+    """
+    where, params = _where(start, end, client_id, actions, before)
+    sql = (
+        f"SELECT {', '.join(_STORED_COLUMNS)} FROM movement{where} "
+        "ORDER BY timestamp DESC, id DESC"
+    )
+    prune_end = end
+    if before is not None:
+        # rows sharing the bound's timestamp may still have smaller ids
+        bound = before[0] + timedelta(microseconds=1)
+        prune_end = bound if end is None else min(end, bound)
+    for path in _partitions(start, prune_end):
+        connection = _connect(path)
+        try:
+            amount = _amount_reader(connection)
+            cursor = connection.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(_FETCH_SIZE)
+                if not batch:
+                    break
+                yield from _with_client_names(batch, amount)
+        finally:
+            connection.close()
+
+
+def archived_totals(start=None, end=None, client_id=None, actions=None, by_day=False) -> list:
+    """Sum of archived amounts grouped by action, and by day when ``by_day``.
+
+    Returns ``(day, action, total)`` rows; ``day`` is None unless ``by_day``.
+    """
+    where, params = _where(start, end, client_id, actions)
+    day = "substr(timestamp, 1, 10)" if by_day else "NULL"
+    sql = f"SELECT {day}, action, SUM(amount) FROM movement{where} GROUP BY 1, 2"
+    rows = []
+    for path in _partitions(start, end):
+        connection = _connect(path)
+        try:
+            amount = _amount_reader(connection)
+            for key, action, total in connection.execute(sql, params):
+                rows.append((date.fromisoformat(key) if key else None, action, amount(total or 0)))
+        finally:
+            connection.close()
+    return rows
+
+
+def archived_changes(after: int, limit: int) -> list:
+    """Archived movements with a sequence above ``after``, in sequence order, as dicts.
+
+    Same keys as changes.changes_after(). Only files whose last_seq is above
+    ``after`` are opened, so consumers that keep up never touch them.
+    """
+    files = db.session.execute(
+        select(MovementArchive.filename).where(MovementArchive.last_seq > after)
+    ).scalars().all()
+    rows = []
+    for filename in files:
+        connection = _connect(os.path.join(archive_dir(), filename))
+        try:
+            amount = _amount_reader(connection)
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            seq = "seq" if version >= 2 else "id"
+            for row in connection.execute(
+                f"SELECT {seq}, id, timestamp, client_id, user_id, action, amount, description "
+                f"FROM movement WHERE {seq} > ? ORDER BY {seq} LIMIT ?",
+                (after, limit),
+            ):
+                rows.append(
+                    {
+                        "seq": row[0],
+                        "id": row[1],
+                        "timestamp": datetime.strptime(row[2], _TIMESTAMP_FORMAT),
+                        "client_id": row[3],
+                        "user_id": row[4],
+                        "action": row[5],
+                        "amount": amount(row[6]),
+                        "description": row[7],
+                    }
+                )
+        finally:
+            connection.close()
+    rows.sort(key=lambda row: row["seq"])
+    return rows[:limit]
+
+
+def _write_archive(path: str, rows) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(f"PRAGMA user_version = {_FORMAT_VERSION}")
+        connection.execute(_SCHEMA[0])
+        count = 0
+        batch = []
+        columns = _STORED_COLUMNS + ("seq",)
+        insert = "INSERT INTO movement ({}) VALUES ({})".format(
+            ", ".join(columns), ", ".join("?" for _ in columns)
+        )
+        for row in rows:
+            batch.append((row.id, _format(row.timestamp), *row[2:]))
+            if len(batch) >= _FETCH_SIZE:
+                connection.executemany(insert, batch)
+                count += len(batch)
+                batch.clear()
+        if batch:
+            connection.executemany(insert, batch)
+            count += len(batch)
+        # indexes are cheaper to build once the rows are in
+        for statement in _SCHEMA[1:]:
+            connection.execute(statement)
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return count
+
+
+def archive_month(month: date) -> int:
+    """Move one closed month of movements into a read-only SQLite file.
+
+    The file is written and verified first; the registry row and the delete
+    from the movement table then commit together.
+    """
+    month = month_start(month)
+    if month >= first_open_month():
+        raise ArchiveError(f"El mes {month:%Y-%m} todavía está abierto")
+    if db.session.execute(select(MovementArchive.id).where(MovementArchive.month == month)).first():
+        raise ArchiveError(f"El mes {month:%Y-%m} ya está archivado")
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(next_month(month), datetime.min.time())
+    in_month = (Movement.timestamp >= start, Movement.timestamp < end)
+    expected, last_seq = db.session.execute(
+        select(func.count(Movement.id), func.max(Movement.seq)).where(*in_month)
+    ).one()
+    if not expected:
+        return 0
+
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = f"movements_{month:%Y_%m}.db"
+    path = os.path.join(directory, filename)
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    rows = db.session.execute(
+        select(
+            Movement.id,
+            Movement.timestamp,
+            Movement.client_id,
+            Movement.action,
+            type_coerce(Movement.amount, Integer),
+            Movement.description,
+            Movement.user_id,
+            Movement.seq,
+        )
+        .where(*in_month)
+        .order_by(Movement.timestamp, Movement.id)
+        .execution_options(yield_per=_FETCH_SIZE)
+    )
+    written = _write_archive(partial, rows)
+    if written != expected:
+        os.remove(partial)
+        raise ArchiveError(f"Se copiaron {written} de {expected} movimientos de {month:%Y-%m}")
+    os.chmod(partial, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(partial, path)
+    try:
+        db.session.add(
+            MovementArchive(
+                month=month, filename=filename, row_count=written, last_seq=last_seq or 0
+            )
+        )
+        db.session.execute(delete(Movement).where(*in_month).execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    return written
+
+
+def archive_closed_months() -> list:
+    """Archive every month before :func:`first_open_month`; returns ``(month, rows)``."""
+    oldest = db.session.execute(select(func.min(Movement.timestamp))).scalar()
+    done = []
+    if oldest is None:
+        return done
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+    archived = {month for month, _ in archived_months()}
+    month, limit = month_start(oldest), first_open_month()
+    while month < limit:
+        if month not in archived:
+            done.append((month, archive_month(month)))
+        month = next_month(month)
+    return done
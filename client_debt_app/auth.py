@@ -0,0 +1,104 @@
+import threading
+from collections import namedtuple
+from flask import current_app, g, session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from werkzeug.security import check_password_hash, generate_password_hash
+from cache import data_version
+from models import db, User
+from settings import apply_defaults
+
+DEFAULTS = {
+    # any method accepted by werkzeug, e.g. "pbkdf2:sha256:600000"
+    "PASSWORD_HASH_METHOD": "scrypt:32768:8:1",
+}
+
+AuthUser = namedtuple("AuthUser", "id username role auth_version")
+
+_lock = threading.Lock()
+# user id -> (data version it was read at, AuthUser)
+_users = {}
+_method_prefixes = {}
+
+
+def init_auth(app) -> None:
+    apply_defaults(app, DEFAULTS)
+
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, method=current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def _method_prefix(method: str) -> str:
+    # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"),
+    # so hash once to learn the exact prefix it writes
+    if method not in _method_prefixes:
+        _method_prefixes[method] = generate_password_hash("", method=method).split("$", 1)[0]
+    return _method_prefixes[method]
+
+
+def verify_password(user, password: str) -> bool:
+    """Check the password and rehash it when the configured method changed.
+
+    The new hash is left in the session; the caller commits it.
+    """
+    if not check_password_hash(user.password_hash, password):
+        return False
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    if user.password_hash.split("$", 1)[0] != _method_prefix(method):
+        user.password_hash = hash_password(password)
+    return True
+
+
+def login_user(user) -> None:
+    session.clear()
+    session["user_id"] = user.id
+    session["auth_version"] = user.auth_version
+
+
+def logout_user() -> None:
+    for key in ("user_id", "auth_version"):
+        session.pop(key, None)
+
+
+def _load_user(user_id: int):
+    # every committed write bumps the shared data version, role changes and
+    # deletions included, so an entry read at the current version is fresh
+    # in every worker
+    version = data_version()
+    entry = _users.get(user_id)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    row = db.session.execute(
+        select(User.id, User.username, User.role, User.auth_version).where(User.id == user_id)
+    ).first()
+    user = AuthUser(*row) if row is not None else None
+    with _lock:
+        _users[user_id] = (version, user)
+    return user
+
+
+def current_user():
+    """The signed-in user, cached per process for as long as the data version holds.
+
+    Returns None, and clears the session, when the user was deleted or its
+    role changed after the session was issued.
+    """
+    if "auth_user" in g:
+        return g.auth_user
+    user = None
+    user_id = session.get("user_id")
+    if user_id is not None:
+        user = _load_user(user_id)
+        if user is None or user.auth_version != session.get("auth_version"):
+            logout_user()
+            user = None
+    g.auth_user = user
+    return user
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_on_role_change(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User) and inspect(obj).attrs.role.history.has_changes():
+            obj.auth_version = (obj.auth_version or 0) + 1
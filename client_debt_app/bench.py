@@ -0,0 +1,354 @@
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from flask_migrate import upgrade
+from sqlalchemy import event, select
+from database import check_scratch
+from models import db, Client, User
+from serving import warm_up
+from synthetic import generate
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+# a route regresses when its p95 grows by more than this fraction and by at
+# least LATENCY_FLOOR_MS, or when it runs more queries than the baseline
+LATENCY_TOLERANCE = 0.25
+LATENCY_FLOOR_MS = 2.0
+# seconds a load test process may take to build its app and warm up
+STARTUP_TIMEOUT = 120
+
+
+def bench_requests(today: date = None) -> list:
+    """``(name, method, url, form)`` of the benchmarked routes.
+
+    ``{client}`` in the url or form values is replaced by a client id drawn
+    for every repetition.
+    """
+    today = today or date.today()
+    month_ago = today - timedelta(days=30)
+    return [
+        ("index", "GET", "/", None),
+        ("index_search", "GET", "/?q=perez", None),
+        ("index_by_balance", "GET", "/?sort=balance&dir=desc", None),
+        ("client_detail", "GET", "/client/{client}", None),
+        ("cash", "GET", f"/cash?date={today}", None),
+        ("cash_close", "GET", f"/cash/cierre?start={month_ago}&end={today}", None),
+        ("report", "GET", "/report", None),
+        ("report_range", "GET", f"/report?start_date={month_ago}&end_date={today}", None),
+        ("report_client", "GET", "/report?client_id={client}", None),
+        ("debts", "GET", "/deudas", None),
+        ("charts", "GET", "/graficos", None),
+        ("charts_data", "GET", "/graficos/datos?bucket=month", None),
+        ("new_debt_form", "GET", "/deudas/nueva", None),
+        ("api_debts", "GET", "/api/v1/debts?client_id={client}", None),
+        ("api_clients_delta", "GET", f"/api/v1/clients?updated_since={today}", None),
+        ("client_suggest", "GET", "/clientes/buscar?q=mar", None),
+        (
+            "add_debt",
+            "POST",
+            "/client/{client}/debts",
+            {"date": str(today), "amount": "12.34", "description": "bench"},
+        ),
+        (
+            "add_payment",
+            "POST",
+            "/client/{client}/payments",
+            {"date": str(today), "amount": "1.50", "method": "cash"},
+        ),
+        (
+            "batch",
+            "POST",
+            "/lote",
+            {
+                f"rows-{row}-{field}": value
+                for row, kind in enumerate(("debt", "debt", "payment", "payment"))
+                for field, value in (
+                    ("type", kind),
+                    ("client_id", "{client}"),
+                    ("date", str(today)),
+                    ("amount", "2.25"),
+                    ("method", "cash"),
+                    ("description", "bench"),
+                )
+            },
+        ),
+        (
+            "cash_withdrawal",
+            "POST",
+            "/cash",
+            {"withdraw-amount": "1", "withdraw-description": "bench", "withdraw-submit": "Retirar"},
+        ),
+    ]
+
+
+def _percentiles(samples: list) -> dict:
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def _fill(value, client_id):
+    return value.replace("{client}", str(client_id)) if isinstance(value, str) else value
+
+
+def _scratch_config(path: str, cache: bool) -> dict:
+    # with caching on, repeated requests would only measure the cache
+    return {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path,
+        "TESTING": True,
+        "CACHE_BACKEND": "memory" if cache else "none",
+    }
+
+
+def _fill_scratch(app, path: str, debts: int, seed: int):
+    """Migrate the scratch database and generate data; ``(user_id, client_ids, counts, seconds)``."""
+    with app.app_context():
+        # generate() writes up to a million rows
+        check_scratch(db.engine, path)
+        upgrade()
+        user = User(username="bench", password_hash="-", role="admin")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        started = time.perf_counter()
+        counts = generate(debts, seed=seed, user_id=user_id)
+        generated = time.perf_counter() - started
+        client_ids = db.session.execute(select(Client.id).order_by(Client.id)).scalars().all()
+        # workers forked later must not share these connections
+        db.engine.dispose()
+    return user_id, client_ids, counts, generated
+
+
+def _remove_scratch(path: str) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _signed_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+        session["auth_version"] = 0
+    return client
+
+
+def _meta(**values) -> dict:
+    return {**values, "python": platform.python_version(), "machine": platform.machine()}
+
+
+def run_benchmark(
+    create_app, debts: int, seed: int = 0, repeat: int = 30, cache: bool = False, progress=None
+) -> dict:
+    """Generate ``debts`` synthetic debts in a scratch SQLite database and time every route.
+
+    Each route is requested once to warm up and then ``repeat`` times through
+    the Flask test client. Returns the run settings under ``meta`` and, per
+    route, latency percentiles in milliseconds and the queries per request.
+    """
+    repeat = max(2, repeat)
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = create_app(_scratch_config(path, cache))
+    results = {}
+    try:
+        user_id, client_ids, counts, generated = _fill_scratch(app, path, debts, seed)
+        with app.app_context():
+            engine = db.engine
+        if progress is not None:
+            progress(f"{sum(counts.values())} filas generadas en {generated:.1f}s")
+
+        client = _signed_in(app, user_id)
+        rng = random.Random(seed)
+        queries = [0]
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            queries[0] += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            for name, method, url, form in bench_requests():
+                samples, per_request = [], []
+                for attempt in range(repeat + 1):
+                    client_id = rng.choice(client_ids)
+                    data = {k: _fill(v, client_id) for k, v in form.items()} if form else None
+                    queries[0] = 0
+                    started = time.perf_counter()
+                    response = client.open(_fill(url, client_id), method=method, data=data)
+                    response.get_data()
+                    elapsed = time.perf_counter() - started
+                    if response.status_code >= 400:
+                        raise RuntimeError(f"{method} {url} respondió {response.status_code}")
+                    if attempt:  # the first request only warms up
+                        samples.append(elapsed * 1000)
+                        per_request.append(queries[0])
+                results[name] = {
+                    "method": method,
+                    "url": url,
+                    **{key: round(value, 2) for key, value in _percentiles(samples).items()},
+                    "queries": max(per_request),
+                }
+                if progress is not None:
+                    progress(f"{name}: p50 {results[name]['p50']} ms")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        _remove_scratch(path)
+    return {
+        "meta": _meta(debts=debts, seed=seed, repeat=repeat, cache=cache, rows=counts),
+        "routes": results,
+    }
+
+
+def _load_worker(create_app, config, user_id, client_ids, threads, duration, seed, ready, out):
+    """One process of run_load_test(): ``threads`` clients looping over the GET routes."""
+    app = create_app(config)
+    warm_up(app)
+    urls = [url for name, method, url, form in bench_requests() if method == "GET"]
+    samples, failures = [], []
+    ready.wait()
+    deadline = time.perf_counter() + duration
+
+    def loop(number):
+        client = _signed_in(app, user_id)
+        rng = random.Random(seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            url = _fill(rng.choice(urls), rng.choice(client_ids))
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            # list.append is atomic, no lock needed
+            if response.status_code >= 400:
+                failures.append(f"{url} respondió {response.status_code}")
+            else:
+                samples.append(elapsed * 1000)
+
+    running = [threading.Thread(target=loop, args=(number,)) for number in range(threads)]
+    for thread in running:
+        thread.start()
+    for thread in running:
+        thread.join()
+    with app.app_context():
+        db.engine.dispose()
+    out.put((samples, failures[:5]))
+
+
+def run_load_test(
+    create_app,
+    debts: int,
+    processes=(1, 2, 4),
+    threads: int = 4,
+    duration: float = 10.0,
+    seed: int = 0,
+    cache: bool = False,
+    progress=None,
+) -> dict:
+    """Requests per second of the GET routes with several processes of ``threads`` threads.
+
+    Mirrors the gunicorn gthread model without the HTTP layer: each process
+    builds its own app on one scratch SQLite database, runs warm_up() and
+    then every thread requests random routes for ``duration`` seconds.
+    Returns, per process count, throughput and latency percentiles in ms.
+    """
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    config = _scratch_config(path, cache)
+    results = {}
+    try:
+        app = create_app(config)
+        user_id, client_ids, counts, generated = _fill_scratch(app, path, debts, seed)
+        if progress is not None:
+            progress(f"{sum(counts.values())} filas generadas en {generated:.1f}s")
+        context = multiprocessing.get_context()
+        for count in processes:
+            ready = context.Barrier(count + 1)
+            out = context.Queue()
+            workers = [
+                context.Process(
+                    target=_load_worker,
+                    args=(create_app, config, user_id, client_ids, threads, duration,
+                          seed + n, ready, out),
+                )
+                for n in range(count)
+            ]
+            for worker in workers:
+                worker.start()
+            samples, failures = [], []
+            try:
+                # measure once every process has warmed up
+                ready.wait(STARTUP_TIMEOUT)
+                for _ in workers:
+                    done, failed = out.get(timeout=duration + STARTUP_TIMEOUT)
+                    samples += done
+                    failures += failed
+            except (threading.BrokenBarrierError, queue.Empty):
+                raise RuntimeError("Un proceso de la prueba de carga terminó antes de tiempo")
+            finally:
+                for worker in workers:
+                    worker.join(STARTUP_TIMEOUT)
+                    if worker.is_alive():
+                        worker.terminate()
+            if failures:
+                raise RuntimeError(failures[0])
+            results[str(count)] = {
+                "processes": count,
+                "threads": threads,
+                "requests": len(samples),
+                "rps": round(len(samples) / duration, 1),
+                **{key: round(value, 2) for key, value in _percentiles(samples).items()},
+            }
+            if progress is not None:
+                progress(f"{count} procesos: {results[str(count)]['rps']} pedidos/s")
+    finally:
+        _remove_scratch(path)
+    return {
+        "meta": _meta(
+            debts=debts,
+            seed=seed,
+            threads=threads,
+            duration=duration,
+            cache=cache,
+            cpus=os.cpu_count(),
+        ),
+        "runs": results,
+    }
+
+
+def load_baseline(path: str = BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def write_result(result: dict, path: str = BASELINE_PATH) -> None:
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def compare(result: dict, baseline: dict, tolerance: float = LATENCY_TOLERANCE) -> list:
+    """``(route, metric, baseline, current)`` for every regression against ``baseline``.
+
+    Only routes present in both runs are compared; latency is compared on p95.
+    """
+    regressions = []
+    for name, current in result["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if base is None:
+            continue
+        if current["queries"] > base["queries"]:
+            regressions.append((name, "queries", base["queries"], current["queries"]))
+        limit = max(base["p95"] * (1 + tolerance), base["p95"] + LATENCY_FLOOR_MS)
+        if current["p95"] > limit:
+            regressions.append((name, "p95", base["p95"], current["p95"]))
+    return regressions
@@ -0,0 +1,279 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from datetime import datetime
+from flask import g, has_app_context, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from models import db, DataVersion
+from settings import apply_defaults
+
+DEFAULTS = {
+    "CACHE_BACKEND": "memory",
+    "CACHE_MAX_ENTRIES": 2048,
+    "CACHE_TTL": 300,
+    "CACHE_REDIS_URL": "redis://localhost:6379/0",
+}
+
+
+class MemoryBackend:
+    """Per-process LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Cache shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url: str, ttl: float = 300, prefix: str = "client_debt:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("Para CACHE_BACKEND=redis instale el paquete redis") from exc
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def _key(self, key) -> str:
+        return self.prefix + hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+
+    def set(self, key, value) -> None:
+        self.client.set(self._key(key), pickle.dumps(value), ex=self.ttl)
+
+    def clear(self) -> None:
+        # entries of older versions are never read again and expire by TTL
+        pass
+
+
+class NullBackend:
+    """Caching disabled: every lookup misses."""
+
+    def get(self, key):
+        return False, None
+
+    def set(self, key, value) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+_backend = MemoryBackend()
+_stats_lock = threading.Lock()
+_stats = {}
+# newest data version this process has seen; older cache entries are dropped
+_seen_version = 0
+
+
+def init_cache(app) -> None:
+    """Pick the cache backend from the config and register the ``{% cache %}`` tag."""
+    global _backend
+    apply_defaults(app, DEFAULTS)
+    config = app.config
+    if config["CACHE_BACKEND"] == "redis":
+        _backend = RedisBackend(config["CACHE_REDIS_URL"], config["CACHE_TTL"])
+    elif config["CACHE_BACKEND"] == "none":
+        _backend = NullBackend()
+    else:
+        _backend = MemoryBackend(config["CACHE_MAX_ENTRIES"], config["CACHE_TTL"])
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+def _count(namespace: str, hit: bool) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+
+
+def cache_stats() -> dict:
+    """Hit and miss counters per namespace since the process started."""
+    with _stats_lock:
+        return {namespace: dict(counters) for namespace, counters in _stats.items()}
+
+
+def _current_version():
+    """``(value, changed_at)`` of the data_version row, read once per request.
+
+    The row lives in the database, so every worker and ``flask`` command
+    sees the same version and it does not restart at 0 with the process.
+    """
+    global _seen_version
+    if has_app_context() and "data_version" in g:
+        return g.data_version
+    row = db.session.execute(
+        select(DataVersion.value, DataVersion.changed_at).where(DataVersion.id == 1)
+    ).first()
+    current = (row.value, row.changed_at) if row is not None else (0, None)
+    if current[0] > _seen_version:
+        _seen_version = current[0]
+        _backend.clear()
+    if has_app_context():
+        g.data_version = current
+    return current
+
+
+def data_version() -> int:
+    return _current_version()[0]
+
+
+def bump_version(session=None) -> None:
+    """Move to a new data version inside the current write transaction.
+
+    Called before commit, so the new version becomes visible together with
+    the data it describes.
+    """
+    connection = (session or db.session).connection()
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    moved = connection.execute(
+        update(table).where(table.c.id == 1).values(value=table.c.value + 1, changed_at=now)
+    ).rowcount
+    if not moved:
+        connection.execute(insert(table).values(id=1, value=1, changed_at=now))
+
+
+def cached(namespace: str, key, compute):
+    """Return the cached value for ``(namespace, key)`` or compute and store it.
+
+    Entries are tied to the data version read at the start of the request,
+    so any committed write makes them stale. The computation reads the same
+    or newer data, never older, so storing it under that version is safe.
+    """
+    full_key = (namespace, data_version(), key)
+    found, value = _backend.get(full_key)
+    _count(namespace, found)
+    if found:
+        return value
+    value = compute()
+    _backend.set(full_key, value)
+    return value
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache "name", key... %}...{% endcache %}`` stores the rendered block."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        return cached("fragment:" + str(key[0]), tuple(key[1:]), caller)
+
+
+def conditional(fn):
+    """Answer GET requests with 304 when nothing was written since the client's copy.
+
+    The ETag covers the shared data version, the user and the full URL;
+    pages with pending flash messages are always rendered.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET" or session.get("_flashes"):
+            return fn(*args, **kwargs)
+        version, changed_at = _current_version()
+        # the date is part of the key because several pages default to today;
+        # changed_at tells apart versions of a database restored from a backup
+        key = (
+            version,
+            changed_at,
+            session.get("user_id"),
+            session.get("csrf_token"),
+            request.full_path,
+            time.strftime("%Y-%m-%d"),
+        )
+        tag = hashlib.sha1(repr(key).encode()).hexdigest()
+        if tag in request.if_none_match:
+            _count("http", True)
+            return "", 304, {"ETag": f'"{tag}"', "Cache-Control": "private, no-cache"}
+        _count("http", False)
+        response = fn(*args, **kwargs)
+        response = make_response(response)
+        if response.status_code == 200 and not session.get("_flashes"):
+            response.set_etag(tag)
+            if changed_at is not None:
+                response.last_modified = changed_at
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add("Cookie")
+        return response
+
+    return wrapper
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["cache_dirty"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info["cache_dirty"] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_on_commit(session):
+    # commit() flushes after this hook; flush now so pending writes count
+    session.flush()
+    if session.info.pop("cache_dirty", False):
+        bump_version(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_version(session):
+    # other before_commit hooks may have marked the session again
+    session.info.pop("cache_dirty", None)
+    if has_app_context():
+        g.pop("data_version", None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("cache_dirty", None)
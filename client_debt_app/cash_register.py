@@ -0,0 +1,318 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import delete, func, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from archive import archived_rows, archived_totals
+from models import db, CashSnapshot, Payment, Movement
+
+CASH_ACTIONS = ("cash_income", "cash_withdrawal")
+PAYMENT_METHODS = ("cash", "transfer", "other")
+SNAPSHOT_COLUMNS = PAYMENT_METHODS + CASH_ACTIONS
+
+
+class CashClosedError(ValueError):
+    pass
+
+
+def day_bounds(day: date):
+    """Half-open ``[day, day + 1)`` timestamp range for index range scans."""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _empty_totals() -> dict:
+    totals = {method: 0 for method in PAYMENT_METHODS}
+    totals.update({"cash_income": 0, "cash_withdrawal": 0})
+    return totals
+
+
+def _with_cash_total(totals: dict) -> dict:
+    totals["cash_total"] = totals["cash"] + totals["cash_income"] - totals["cash_withdrawal"]
+    return totals
+
+
+def day_cash_movements(day: date) -> list:
+    """Incomes and withdrawals of one day in time order, archived or not."""
+    start, end = day_bounds(day)
+    movements = (
+        Movement.query.filter(
+            Movement.action.in_(CASH_ACTIONS),
+            Movement.timestamp >= start,
+            Movement.timestamp < end,
+        )
+        .order_by(Movement.timestamp)
+        .all()
+    )
+    archived = list(archived_rows(start, end, actions=CASH_ACTIONS))
+    return archived[::-1] + movements
+
+
+def range_totals(start_day: date = None, end_day: date = None) -> list:
+    """Per-day cash totals for ``[start_day, end_day]`` (both inclusive), from the raw rows.
+
+    Without bounds it covers every day with payments or cash movements.
+    """
+    payment_where, movement_where = [], [Movement.action.in_(CASH_ACTIONS)]
+    start = end = None
+    if start_day is not None:
+        start, _ = day_bounds(start_day)
+        payment_where.append(Payment.date >= start_day)
+        movement_where.append(Movement.timestamp >= start)
+    if end_day is not None:
+        _, end = day_bounds(end_day)
+        payment_where.append(Payment.date <= end_day)
+        movement_where.append(Movement.timestamp < end)
+    payments = (
+        select(
+            Payment.date.label("day"),
+            Payment.method.label("key"),
+            func.sum(Payment.amount).label("total"),
+        )
+        .where(*payment_where)
+        .group_by(Payment.date, Payment.method)
+    )
+    movement_day = func.date(Movement.timestamp)
+    movements = (
+        select(
+            movement_day.label("day"),
+            Movement.action.label("key"),
+            func.sum(Movement.amount).label("total"),
+        )
+        .where(*movement_where)
+        .group_by(movement_day, Movement.action)
+    )
+    days = {}
+    rows = list(db.session.execute(union_all(payments, movements)))
+    rows += archived_totals(start, end, actions=CASH_ACTIONS, by_day=True)
+    for day, key, total in rows:
+        totals = days.setdefault(_as_date(day), _empty_totals())
+        totals[key] = totals.get(key, 0) + (total or 0)
+    return [
+        dict(_with_cash_total(days[day]), day=day)
+        for day in sorted(days)
+    ]
+
+
+def sum_rows(rows: list) -> dict:
+    totals = _empty_totals()
+    for row in rows:
+        for key in totals:
+            totals[key] += row.get(key, 0)
+    return _with_cash_total(totals)
+
+
+# Daily snapshots. Writes add their amounts to the day's row in the same
+# transaction and move the opening and closing balance of the later days.
+# Closing a day freezes it and every earlier day, so only the open days at
+# the end of the table ever change.
+
+
+def _cash_change(values: dict):
+    return values.get("cash", 0) + values.get("cash_income", 0) - values.get("cash_withdrawal", 0)
+
+
+def last_closed_day():
+    return db.session.execute(
+        select(func.max(CashSnapshot.day)).where(CashSnapshot.closed_at.is_not(None))
+    ).scalar()
+
+
+def _closing_before(day: date):
+    return (
+        db.session.execute(
+            select(CashSnapshot.closing)
+            .where(CashSnapshot.day < day)
+            .order_by(CashSnapshot.day.desc())
+            .limit(1)
+        ).scalar()
+        or 0
+    )
+
+
+def _closed_error(day: date) -> CashClosedError:
+    return CashClosedError(f"La caja del {day.strftime('%d/%m/%Y')} ya está cerrada")
+
+
+def _add_to_day(day: date, deltas: dict, change) -> bool:
+    table = CashSnapshot.__table__
+    values = {table.c[key]: table.c[key] + amount for key, amount in deltas.items()}
+    values[table.c.closing] = table.c.closing + change
+    result = db.session.execute(
+        update(table).where(table.c.day == day, table.c.closed_at.is_(None)).values(values)
+    )
+    return result.rowcount == 1
+
+
+def record_cash(per_day: dict) -> None:
+    """Add payments and cash movements to the daily snapshots in the current transaction.
+
+    ``per_day`` maps a day to ``{column: amount}`` with keys from
+    SNAPSHOT_COLUMNS. Raises CashClosedError if a day is already closed.
+    """
+    table = CashSnapshot.__table__
+    for day in sorted(per_day):
+        deltas = {key: amount for key, amount in per_day[day].items() if amount}
+        if not deltas:
+            continue
+        change = _cash_change(deltas)
+        if not _add_to_day(day, deltas, change):
+            closed = last_closed_day()
+            if closed is not None and day <= closed:
+                raise _closed_error(day)
+            opening = _closing_before(day)
+            try:
+                # another writer may create the same day first
+                with db.session.begin_nested():
+                    db.session.execute(
+                        insert(table).values(
+                            day=day, opening=opening, closing=opening + change, **deltas
+                        )
+                    )
+            except IntegrityError:
+                _add_to_day(day, deltas, change)
+        if change:
+            db.session.execute(
+                update(table)
+                .where(table.c.day > day)
+                .values(opening=table.c.opening + change, closing=table.c.closing + change)
+            )
+
+
+def _snapshot_dict(row, closed: bool) -> dict:
+    totals = {key: getattr(row, key) for key in SNAPSHOT_COLUMNS}
+    return dict(
+        _with_cash_total(totals),
+        day=row.day,
+        opening=row.opening,
+        closing=row.closing,
+        closed=closed,
+    )
+
+
+def day_snapshot(day: date) -> dict:
+    """Totals and opening/closing balance of one day, read from its snapshot."""
+    row = db.session.get(CashSnapshot, day)
+    if row is not None:
+        return _snapshot_dict(row, row.closed_at is not None)
+    opening = _closing_before(day)
+    closed = last_closed_day()
+    return dict(
+        _with_cash_total(_empty_totals()),
+        day=day,
+        opening=opening,
+        closing=opening,
+        closed=closed is not None and day <= closed,
+    )
+
+
+def snapshot_range(start_day: date, end_day: date) -> list:
+    """Snapshot rows of ``[start_day, end_day]``, oldest first; days without activity are skipped."""
+    rows = CashSnapshot.query.filter(
+        CashSnapshot.day >= start_day, CashSnapshot.day <= end_day
+    ).order_by(CashSnapshot.day)
+    return [_snapshot_dict(row, row.closed_at is not None) for row in rows]
+
+
+def _chain(days: dict, opening) -> list:
+    """Snapshot values for ``{day: totals}`` in day order, starting from ``opening``."""
+    values = []
+    for day in sorted(days):
+        totals = days[day]
+        row = {key: totals.get(key, 0) for key in SNAPSHOT_COLUMNS}
+        row.update(day=day, opening=opening, closing=opening + _cash_change(row))
+        opening = row["closing"]
+        values.append(row)
+    return values
+
+
+def close_cash(day: date, user_id=None) -> int:
+    """Freeze ``day`` and every open day before it; returns how many days were closed.
+
+    The open days are recomputed from the raw rows first, so a close always
+    stores exact figures even if a snapshot drifted.
+    """
+    closed = last_closed_day()
+    if closed is not None and day <= closed:
+        raise _closed_error(day)
+    start = closed + timedelta(days=1) if closed is not None else None
+    opening = _closing_before(start) if start is not None else 0
+    days = {row["day"]: row for row in range_totals(start, day)}
+    days.setdefault(day, _empty_totals())
+    table = CashSnapshot.__table__
+    open_days = table.c.day <= day
+    if start is not None:
+        open_days = open_days & (table.c.day >= start)
+    db.session.execute(delete(table).where(open_days))
+    now = datetime.utcnow()
+    values = _chain(days, opening)
+    db.session.execute(
+        insert(table), [dict(row, closed_at=now, closed_by=user_id) for row in values]
+    )
+    _rechain_after(day, values[-1]["closing"])
+    db.session.add(
+        Movement(
+            user_id=user_id,
+            action="close_cash",
+            description=f"Caja cerrada al {day.strftime('%d/%m/%Y')}",
+        )
+    )
+    db.session.commit()
+    return len(values)
+
+
+def _rechain_after(day: date, opening) -> None:
+    for row in CashSnapshot.query.filter(CashSnapshot.day > day).order_by(CashSnapshot.day):
+        row.opening = opening
+        row.closing = opening + _cash_change({key: getattr(row, key) for key in SNAPSHOT_COLUMNS})
+        opening = row.closing
+
+
+def _expected_snapshots() -> list:
+    stored = {
+        row.day: row
+        for row in CashSnapshot.query.with_entities(
+            CashSnapshot.day, CashSnapshot.closed_at, CashSnapshot.closed_by
+        )
+    }
+    days = {row["day"]: row for row in range_totals()}
+    for day in stored:
+        days.setdefault(day, _empty_totals())
+    values = _chain(days, 0)
+    for row in values:
+        closed = stored.get(row["day"])
+        row["closed_at"] = closed.closed_at if closed else None
+        row["closed_by"] = closed.closed_by if closed else None
+    return values
+
+
+def find_cash_drift() -> list:
+    """Snapshot values that differ from the payment and movement rows, archives included.
+
+    Returns ``(day, column, stored, expected)`` tuples.
+    """
+    stored = {row.day: row for row in CashSnapshot.query}
+    drift = []
+    for expected in _expected_snapshots():
+        row = stored.get(expected["day"])
+        for key in SNAPSHOT_COLUMNS + ("opening", "closing"):
+            value = getattr(row, key) if row is not None else None
+            if value != expected[key]:
+                drift.append((expected["day"], key, value, expected[key]))
+    return drift
+
+
+def rebuild_cash_snapshots() -> int:
+    """Rewrite every snapshot from the raw rows, keeping which days were closed."""
+    values = _expected_snapshots()
+    db.session.execute(delete(CashSnapshot))
+    if values:
+        db.session.execute(insert(CashSnapshot), values)
+    db.session.commit()
+    return len(values)
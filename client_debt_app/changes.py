@@ -0,0 +1,199 @@
+from flask import current_app
+from sqlalchemy import bindparam, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from archive import archived_changes
+from cache import cached
+from models import db, ChangeCounter, FeedCheckpoint, Movement
+from settings import apply_defaults
+
+DEFAULTS = {
+    # movements per pull from /api/v1/changes and flask feed
+    "FEED_BATCH_SIZE": 500,
+    # how often an open event stream looks for new movements
+    "EVENT_POLL_SECONDS": 1.0,
+    # streams end after this long; browsers reconnect with Last-Event-ID
+    "EVENT_STREAM_SECONDS": 300,
+    # how often /cash and /graficos ask /api/v1/changes for new movements
+    "LIVE_POLL_SECONDS": 5.0,
+}
+
+MAX_FEED_BATCH_SIZE = 5000
+MAX_CONSUMER_LENGTH = 100
+
+
+class FeedError(ValueError):
+    pass
+
+
+def init_changes(app) -> None:
+    apply_defaults(app, DEFAULTS)
+    app.jinja_env.globals["feed_position"] = feed_position
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_movements(session, flush_context):
+    ids = [obj.id for obj in session.new if isinstance(obj, Movement)]
+    if ids:
+        session.info.setdefault("movement_ids", set()).update(ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_inserted_movements(orm_execute_state):
+    # ORM statements carry an annotated copy of the table, so compare names
+    if (
+        orm_execute_state.is_insert
+        and orm_execute_state.statement.table.name == Movement.__tablename__
+    ):
+        orm_execute_state.session.info["movements_bulk"] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _sequence_on_commit(session):
+    # commit() flushes after this hook; flush now so new movements are seen
+    session.flush()
+    ids = session.info.pop("movement_ids", None)
+    if session.info.pop("movements_bulk", False):
+        assign_sequence(session)
+    elif ids:
+        assign_sequence(session, sorted(ids))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_movements(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("movement_ids", None)
+        session.info.pop("movements_bulk", None)
+
+
+def assign_sequence(session, ids=None) -> int:
+    """Number the movements this transaction wrote, after every committed one.
+
+    Runs right before COMMIT. The counter row update is the last write, so
+    on PostgreSQL its row lock orders concurrent writers and sequence order
+    matches commit order; SQLite has a single writer anyway. ``ids`` are the
+    movements the ORM flushed; without them (bulk inserts) the unnumbered
+    rows are looked up. Returns how many sequence numbers were used.
+    """
+    pending = Movement.seq.is_(None)
+    if ids is None:
+        count, low, high = session.execute(
+            select(func.count(), func.min(Movement.id), func.max(Movement.id)).where(pending)
+        ).one()
+    else:
+        count, low, high = len(ids), ids[0], ids[-1]
+    if not count:
+        return 0
+    last = session.execute(
+        update(ChangeCounter)
+        .where(ChangeCounter.id == 1)
+        .values(value=ChangeCounter.value + count)
+        .returning(ChangeCounter.value)
+    ).scalar_one()
+    first = last - count + 1
+    table = Movement.__table__
+    if high - low + 1 == count:
+        # the usual case: this transaction's ids are consecutive
+        session.execute(
+            update(table)
+            .where(table.c.id.between(low, high), table.c.seq.is_(None))
+            .values(seq=table.c.id + (first - low))
+        )
+    else:
+        if ids is None:
+            ids = session.execute(
+                select(Movement.id).where(pending).order_by(Movement.id)
+            ).scalars()
+        session.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(seq=bindparam("b_seq")),
+            [{"b_id": row_id, "b_seq": first + n} for n, row_id in enumerate(ids)],
+        )
+    return count
+
+
+def last_sequence() -> int:
+    return db.session.execute(select(ChangeCounter.value).where(ChangeCounter.id == 1)).scalar() or 0
+
+
+def feed_position() -> int:
+    """Current end of the feed, where a page that was just rendered starts polling."""
+    return cached("feed_position", None, last_sequence)
+
+
+def changes_after(after: int, limit: int) -> list:
+    """Movements with a sequence above ``after``, in sequence order, as dicts.
+
+    Includes archived months, so archiving never skips a consumer's rows.
+    """
+    rows = db.session.execute(
+        select(
+            Movement.seq,
+            Movement.id,
+            Movement.timestamp,
+            Movement.client_id,
+            Movement.user_id,
+            Movement.action,
+            Movement.amount,
+            Movement.description,
+        )
+        .where(Movement.seq > after)
+        .order_by(Movement.seq)
+        .limit(limit)
+    )
+    rows = [dict(row._mapping) for row in rows]
+    # consumers behind an archived month read it from its file
+    archived = archived_changes(after, limit)
+    if archived:
+        rows = sorted(archived + rows, key=lambda row: row["seq"])[:limit]
+    return rows
+
+
+def feed_batch_size(value=None) -> int:
+    try:
+        size = int(value) if value is not None else None
+    except (TypeError, ValueError):
+        size = None
+    if size is None:
+        size = current_app.config["FEED_BATCH_SIZE"]
+    return max(1, min(size, MAX_FEED_BATCH_SIZE))
+
+
+def _check_consumer(consumer: str) -> str:
+    consumer = str(consumer or "").strip()
+    if not consumer or len(consumer) > MAX_CONSUMER_LENGTH:
+        raise FeedError(f"El consumidor debe tener entre 1 y {MAX_CONSUMER_LENGTH} caracteres")
+    return consumer
+
+
+def checkpoint(consumer: str) -> int:
+    """Last sequence ``consumer`` confirmed; 0 for a new consumer."""
+    consumer = _check_consumer(consumer)
+    return db.session.execute(
+        select(FeedCheckpoint.seq).where(FeedCheckpoint.consumer == consumer)
+    ).scalar() or 0
+
+
+def save_checkpoint(consumer: str, seq: int) -> int:
+    """Move the consumer's checkpoint forward to ``seq``; it never moves back.
+
+    Written through its own connection, so frequent acks do not bump the
+    data version that the page caches depend on. Returns the stored value.
+    """
+    consumer = _check_consumer(consumer)
+    if seq < 0 or seq > last_sequence():
+        raise FeedError(f"Secuencia fuera de rango: {seq}")
+    table = FeedCheckpoint.__table__
+    with db.engine.begin() as connection:
+        moved = connection.execute(
+            update(table).where(table.c.consumer == consumer, table.c.seq < seq).values(seq=seq)
+        ).rowcount
+        if not moved:
+            try:
+                # another request may register the same consumer first
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(consumer=consumer, seq=seq))
+            except IntegrityError:
+                pass
+        return connection.execute(
+            select(table.c.seq).where(table.c.consumer == consumer)
+        ).scalar()
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+from sqlalchemy import case, func, literal_column, select, union_all
+from allocation import OPEN_DEBT
+from models import db, Client, Debt, Payment
+
+BUCKETS = ("day", "week", "month")
+DEFAULT_SPAN = {"day": 90, "week": 26 * 7, "month": 365}
+MAX_TOP = 50
+AGING_BUCKETS = (("0-30", 0, 30), ("31-60", 31, 60), ("61-90", 61, 90), ("90+", 91, None))
+
+
+def top_debtors(limit: int) -> list:
+    rows = db.session.execute(
+        select(Client.id, Client.name, Client.balance)
+        .where(Client.balance > 0)
+        .order_by(Client.balance.desc(), Client.id.desc())
+        .limit(limit)
+    )
+    return [{"id": r.id, "name": r.name, "balance": float(r.balance)} for r in rows]
+
+
+def _bucket_expression(column, bucket: str):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        if bucket == "day":
+            return column
+        return func.date_trunc(bucket, column).cast(db.Date)
+    if bucket == "week":
+        # SQLite: Monday of the week that contains the date.
+        return func.date(column, "-6 days", "weekday 1")
+    if bucket == "month":
+        return func.strftime("%Y-%m-01", column)
+    return column
+
+
+def time_series(bucket: str, start: date, end: date) -> dict:
+    """Debts and payments per bucket between ``start`` and ``end`` inclusive."""
+    debt_bucket = _bucket_expression(Debt.date, bucket)
+    payment_bucket = _bucket_expression(Payment.date, bucket)
+    debts = (
+        select(
+            debt_bucket.label("bucket"),
+            literal_column("'debt'").label("kind"),
+            func.sum(Debt.amount).label("total"),
+        )
+        .where(Debt.date >= start, Debt.date <= end)
+        .group_by(debt_bucket)
+    )
+    payments = (
+        select(
+            payment_bucket.label("bucket"),
+            literal_column("'payment'").label("kind"),
+            func.sum(Payment.amount).label("total"),
+        )
+        .where(Payment.date >= start, Payment.date <= end)
+        .group_by(payment_bucket)
+    )
+    series = {}
+    for bucket_value, kind, total in db.session.execute(union_all(debts, payments)):
+        label = str(bucket_value)[:10]
+        point = series.setdefault(label, {"debt": 0.0, "payment": 0.0})
+        point[kind] += float(total or 0)
+    labels = sorted(series)
+    return {
+        "bucket": bucket,
+        "labels": labels,
+        "debts": [series[label]["debt"] for label in labels],
+        "payments": [series[label]["payment"] for label in labels],
+    }
+
+
+def _age_bucket(today: date):
+    """Aging bucket of an open debt, compared on the date so the index is used."""
+    whens = [
+        (Debt.date >= today - timedelta(days=high), label)
+        for label, _, high in AGING_BUCKETS
+        if high is not None
+    ]
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+
+def aging_distribution(today: date) -> list:
+    """Outstanding amounts grouped by the age of the open debts they belong to."""
+    bucket = _age_bucket(today)
+    rows = db.session.execute(
+        select(
+            bucket.label("bucket"),
+            func.count(func.distinct(Debt.client_id)),
+            func.sum(Debt.outstanding),
+        )
+        .where(OPEN_DEBT)
+        .group_by(bucket)
+    )
+    found = {label: (count, total) for label, count, total in rows}
+    return [
+        {
+            "bucket": label,
+            "clients": found.get(label, (0, 0))[0],
+            "balance": float(found.get(label, (0, 0))[1] or 0),
+        }
+        for label, _, _ in AGING_BUCKETS
+    ]
+
+
+def aging_by_client(today: date):
+    """Query with the open amount per aging bucket of every client that owes.
+
+    Returns ``(query, columns)`` ready for keyset pagination by total owed;
+    bucket amounts are in the ``age_0`` .. ``age_3`` columns.
+    """
+    bucket = _age_bucket(today)
+    per_bucket = [
+        func.sum(case((bucket == label, Debt.outstanding), else_=0)).label(f"age_{index}")
+        for index, (label, _, _) in enumerate(AGING_BUCKETS)
+    ]
+    grouped = (
+        select(
+            Debt.client_id.label("client_id"),
+            *per_bucket,
+            func.sum(Debt.outstanding).label("total"),
+            func.min(Debt.date).label("oldest"),
+        )
+        .where(OPEN_DEBT)
+        .group_by(Debt.client_id)
+        .subquery()
+    )
+    query = db.session.query(grouped, Client.name).join(Client, Client.id == grouped.c.client_id)
+    return query, [grouped.c.total, grouped.c.client_id]
@@ -0,0 +1,104 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from settings import apply_defaults
+
+DEFAULTS = {
+    "DB_POOL_SIZE": 5,
+    "DB_MAX_OVERFLOW": 10,
+    "DB_POOL_TIMEOUT": 30,
+    "DB_POOL_RECYCLE": 1800,
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_CACHE_SIZE_KB": 20000,
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+}
+
+
+def normalize_url(url: str) -> str:
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4.
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def load_config(app) -> None:
+    """Fill database settings from the environment, keeping explicit config.
+
+    DATABASE_URL only applies when create_app() got no SQLALCHEMY_DATABASE_URI,
+    so scratch databases of tests and checks never turn into the real one.
+    """
+    apply_defaults(app, DEFAULTS)
+    default = "sqlite:///" + os.path.join(app.root_path, "clients.db")
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", os.environ.get("DATABASE_URL") or default)
+    app.config["SQLALCHEMY_DATABASE_URI"] = normalize_url(app.config["SQLALCHEMY_DATABASE_URI"])
+
+
+def check_scratch(engine, path: str) -> None:
+    """Stop unless ``engine`` opens the SQLite file ``path``.
+
+    Called before migrating or filling a temporary database, so a config
+    mistake can never seed or close cash days in a real one.
+    """
+    url = engine.url
+    if url.get_backend_name() != "sqlite" or url.database != path:
+        raise RuntimeError(f"Se esperaba la base temporal {path} y la app usa {url!r}")
+
+
+def is_sqlite(app) -> bool:
+    return make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "sqlite"
+
+
+def engine_options(app) -> dict:
+    config = app.config
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        options = {
+            "connect_args": {
+                "timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000,
+                "check_same_thread": False,
+            }
+        }
+        if url.database not in (None, "", ":memory:"):
+            options.update(
+                pool_size=config["DB_POOL_SIZE"],
+                max_overflow=config["DB_MAX_OVERFLOW"],
+                pool_timeout=config["DB_POOL_TIMEOUT"],
+            )
+        return options
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+
+def sqlite_pragmas(config) -> list:
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA foreign_keys=ON",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def install_pragmas(app, engine) -> None:
+    """Apply the SQLite pragmas to every new pooled connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
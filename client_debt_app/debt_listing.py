@@ -0,0 +1,67 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, select
+from allocation import OPEN_DEBT
+from models import db, Client, Debt
+from search import search_condition
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+
+def _amount(value):
+    try:
+        amount = Decimal(value) if value not in (None, "") else None
+    except InvalidOperation:
+        return None
+    return amount if amount is None or amount.is_finite() else None
+
+
+def parse_debt_filters(args):
+    """Read the /deudas filters from the query string.
+
+    Returns ``(filters, conditions)``: the cleaned values to echo back in the
+    form and the SQL conditions on Debt.
+    """
+    filters = {
+        "client_id": args.get("client_id", type=int),
+        "cliente": (args.get("cliente") or "").strip(),
+        "desde": _date(args.get("desde")),
+        "hasta": _date(args.get("hasta")),
+        "monto_min": _amount(args.get("monto_min")),
+        "monto_max": _amount(args.get("monto_max")),
+        "pendientes": args.get("pendientes") == "1",
+    }
+    conditions = []
+    if filters["client_id"]:
+        conditions.append(Debt.client_id == filters["client_id"])
+    if filters["cliente"]:
+        matching = search_condition(filters["cliente"])
+        if matching is not None:
+            conditions.append(Debt.client_id.in_(select(Client.id).where(matching)))
+    if filters["desde"]:
+        conditions.append(Debt.date >= filters["desde"])
+    if filters["hasta"]:
+        conditions.append(Debt.date <= filters["hasta"])
+    if filters["monto_min"] is not None:
+        conditions.append(Debt.amount >= filters["monto_min"])
+    if filters["monto_max"] is not None:
+        conditions.append(Debt.amount <= filters["monto_max"])
+    if filters["pendientes"]:
+        conditions.append(OPEN_DEBT)
+    return filters, conditions
+
+
+def debt_summary(conditions) -> dict:
+    count, total, outstanding = db.session.execute(
+        select(
+            func.count(Debt.id),
+            func.coalesce(func.sum(Debt.amount), 0),
+            func.coalesce(func.sum(Debt.outstanding), 0),
+        ).where(*conditions)
+    ).one()
+    return {"count": count, "total": total, "outstanding": outstanding}
@@ -2,13 +2,15 @@ from flask_wtf import FlaskForm
 from wtforms import (
     StringField,
     PasswordField,
-    FloatField,
+    DecimalField,
     DateField,
     SubmitField,
     SelectField,
+    IntegerField,
 )
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Length, NumberRange, ValidationError
-from models import Client
+from models import db, Client
 
 
 class LoginForm(FlaskForm):
@@ -31,22 +33,32 @@ class ClientForm(FlaskForm):
 
 class DebtForm(FlaskForm):
     date = DateField("Fecha", validators=[DataRequired()], format="%Y-%m-%d")
-    amount = FloatField("Monto", validators=[DataRequired(), NumberRange(min=0)])
+    amount = DecimalField("Monto", places=2, validators=[DataRequired(), NumberRange(min=0)])
     description = StringField("Descripción", validators=[DataRequired(), Length(max=200)])
     submit = SubmitField("Agregar deuda")
 
 
 class DebtClientForm(FlaskForm):
-    client_id = SelectField("Cliente", coerce=int, validators=[DataRequired()])
+    # filled in by the client picker; checked with one primary key lookup
+    client_id = IntegerField(
+        "Cliente", widget=HiddenInput(), validators=[DataRequired("Seleccione un cliente")]
+    )
     date = DateField("Fecha", validators=[DataRequired()], format="%Y-%m-%d")
-    amount = FloatField("Monto", validators=[DataRequired(), NumberRange(min=0)])
+    amount = DecimalField("Monto", places=2, validators=[DataRequired(), NumberRange(min=0)])
     description = StringField("Descripción", validators=[DataRequired(), Length(max=200)])
     submit = SubmitField("Agregar deuda")
 
+    client = None
+
+    def validate_client_id(self, field):
+        self.client = db.session.get(Client, field.data)
+        if self.client is None:
+            raise ValidationError("Cliente inexistente")
+
 
 class PaymentForm(FlaskForm):
     date = DateField("Fecha", validators=[DataRequired()], format="%Y-%m-%d")
-    amount = FloatField("Monto", validators=[DataRequired(), NumberRange(min=0)])
+    amount = DecimalField("Monto", places=2, validators=[DataRequired(), NumberRange(min=0)])
     method = SelectField(
         "Método",
         choices=[
@@ -60,12 +72,12 @@ class PaymentForm(FlaskForm):
 
 
 class WithdrawalForm(FlaskForm):
-    amount = FloatField("Monto", validators=[DataRequired(), NumberRange(min=0)])
+    amount = DecimalField("Monto", places=2, validators=[DataRequired(), NumberRange(min=0)])
     description = StringField("Descripción", validators=[Length(max=200)])
     submit = SubmitField("Retirar")
 
 
 class IncomeForm(FlaskForm):
-    amount = FloatField("Monto", validators=[DataRequired(), NumberRange(min=0)])
+    amount = DecimalField("Monto", places=2, validators=[DataRequired(), NumberRange(min=0)])
     description = StringField("Descripción", validators=[Length(max=200)])
     submit = SubmitField("Ingresar")
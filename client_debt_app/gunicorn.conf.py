@@ -0,0 +1,88 @@
+import glob
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+# Every value can be overridden with the environment variable next to it.
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+# processes; one per core lets requests run in parallel despite the GIL
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# threads per process; they overlap requests waiting on the database and
+# keep event streams (/api/v1/changes/stream) from holding a whole process
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 4))
+# a worker silent for this long is restarted; open streams do not count
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+# on SIGTERM a worker stops accepting and gets this long to finish requests
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+# restart workers after this many requests (0 never) to bound memory growth
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("WEB_ACCESS_LOG") or None
+# each worker builds its own app, engine pool, job threads and caches
+preload_app = False
+
+# Every request thread and every job thread may hold a connection at once.
+# The whole deployment opens up to
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections to the server.
+os.environ.setdefault("DB_POOL_SIZE", str(threads + int(os.environ.get("JOB_WORKERS", 2))))
+
+# Each worker keeps its own request metrics; they meet in METRICS_DIR so
+# /admin/metrics shows the whole server whichever worker answers.
+if workers > 1:
+    os.environ.setdefault(
+        "METRICS_DIR",
+        os.path.join(tempfile.gettempdir(), "client_debt_metrics_" + bind.rsplit(":", 1)[-1]),
+    )
+
+
+def on_starting(server):
+    # counters start over with the server
+    directory = os.environ.get("METRICS_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "metrics_*.json")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    directory = os.environ.get("METRICS_DIR")
+    if directory:
+        from metrics import retire_worker
+
+        retire_worker(directory, worker.pid)
+
+
+def post_worker_init(worker):
+    # gunicorn's SIGTERM handler only stops the accept loop; end the event
+    # streams too, or they would run until graceful_timeout kills them
+    from serving import begin_shutdown
+
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def stop(signum, frame):
+        begin_shutdown()
+        previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, stop)
+
+
+def worker_int(worker):
+    from serving import begin_shutdown
+
+    begin_shutdown()
+
+
+def worker_exit(server, worker):
+    # running jobs finish; queued ones stay for flask run-jobs
+    module = sys.modules.get("wsgi")
+    if module is None:  # the worker failed before loading the app
+        return
+    from serving import shutdown
+
+    shutdown(module.app, wait=True)
@@ -0,0 +1,228 @@
+import csv
+import io
+import os
+from itertools import islice
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from models import db, Client, ClientToken, Movement
+from cash_register import PAYMENT_METHODS, CashClosedError, last_closed_day
+from posting import RowError, parse_amount, parse_date, parse_text, write_entries
+from search import client_tokens, normalize
+
+KINDS = ("clients", "debts", "payments")
+COLUMNS = {
+    "clients": ("name", "document", "address", "phone"),
+    "debts": ("document", "date", "amount", "description"),
+    "payments": ("document", "date", "amount", "method"),
+}
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _csv_rows(stream):
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8-sig")
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+
+
+def _xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ImportFormatError("Para importar XLSX instale openpyxl") from exc
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [str(h or "").strip().lower() for h in next(rows, [])]
+    for values in rows:
+        if values is None or all(v is None for v in values):
+            continue
+        yield {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in zip(header, values)
+        }
+    workbook.close()
+
+
+def file_extension(filename: str) -> str:
+    """Lowercase extension of ``filename``; ImportFormatError if it cannot be read."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in (".xlsx", ".csv", ".txt", ""):
+        raise ImportFormatError(f"Formato no soportado: {extension}")
+    return extension
+
+
+def read_rows(stream, filename: str):
+    """Yield one dict per data row of a CSV or XLSX file, lazily."""
+    if file_extension(filename) == ".xlsx":
+        return _xlsx_rows(stream)
+    return _csv_rows(stream)
+
+
+def _document_ids() -> dict:
+    return dict(db.session.execute(select(Client.document, Client.id)).all())
+
+
+class Importer:
+    """Validate rows against preloaded documents and insert them in chunks.
+
+    Each chunk is written with executemany inserts and committed on its own,
+    so a bad row is reported without aborting the rest of the file.
+    """
+
+    def __init__(self, kind: str, user_id=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if kind not in KINDS:
+            raise ImportFormatError(f"Tipo desconocido: {kind}")
+        self.kind = kind
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.documents = _document_ids()
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def run(self, rows, progress=None) -> dict:
+        numbered = enumerate(rows, start=2)  # line 1 is the header
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            try:
+                inserted = self._commit(chunk)
+            except IntegrityError:
+                # a row clashed with one written meanwhile: retry them one by
+                # one so only the conflicting rows are rejected
+                inserted = 0
+                for item in chunk:
+                    try:
+                        inserted += self._commit([item])
+                    except IntegrityError as exc:
+                        self._error(item[0], f"rechazada por la base de datos: {exc.orig}")
+                    except CashClosedError as exc:
+                        self._error(item[0], f"rechazada: {exc}")
+            except CashClosedError as exc:
+                # the day was closed while the chunk was being written
+                for line, _ in chunk:
+                    self._error(line, f"lote rechazado: {exc}")
+                continue
+            self.inserted += inserted
+            if progress is not None:
+                progress(self.inserted, self.error_count)
+        return {"inserted": self.inserted, "errors": self.errors, "error_count": self.error_count}
+
+    def _commit(self, chunk) -> int:
+        """Import and commit ``chunk``; if the database rejects it, nothing of it is kept."""
+        error_count, reported = self.error_count, len(self.errors)
+        try:
+            inserted = getattr(self, f"_import_{self.kind}")(chunk)
+            db.session.commit()
+        except (IntegrityError, CashClosedError):
+            db.session.rollback()
+            self.documents = _document_ids()
+            # the rows are checked again, or reported as rejected
+            self.error_count = error_count
+            del self.errors[reported:]
+            raise
+        return inserted
+
+    def _import_clients(self, chunk) -> int:
+        valid = []
+        for line, row in chunk:
+            try:
+                name = parse_text(row, "name", 120)
+                document = parse_text(row, "document", 50)
+                address = parse_text(row, "address", 200, required=False) or None
+                phone = parse_text(row, "phone", 20, required=False) or None
+            except RowError as exc:
+                self._error(line, str(exc))
+                continue
+            if document in self.documents:
+                self._error(line, f"documento ya registrado: {document}")
+                continue
+            self.documents[document] = None
+            valid.append(
+                {
+                    "name": name,
+                    "document": document,
+                    "address": address,
+                    "phone": phone,
+                    "search_name": normalize(name),
+                }
+            )
+        if not valid:
+            return 0
+        created = db.session.execute(
+            insert(Client).returning(Client.id, Client.document, sort_by_parameter_order=True),
+            valid,
+        ).all()
+        tokens = []
+        movements = []
+        for (client_id, document), data in zip(created, valid):
+            self.documents[document] = client_id
+            tokens.extend(
+                {"client_id": client_id, "token": token}
+                for token in client_tokens(data["name"], document, data["phone"])
+            )
+            movements.append(
+                {
+                    "user_id": self.user_id,
+                    "client_id": client_id,
+                    "action": "create_client",
+                    "description": f"Cliente {data['name']} creado",
+                }
+            )
+        if tokens:
+            db.session.execute(insert(ClientToken), tokens)
+        db.session.execute(insert(Movement), movements)
+        return len(valid)
+
+    def _entries(self, chunk, extra):
+        valid = []
+        for line, row in chunk:
+            try:
+                document = parse_text(row, "document", 50)
+                client_id = self.documents.get(document)
+                if client_id is None:
+                    raise RowError(f"documento inexistente: {document}")
+                entry = {
+                    "client_id": client_id,
+                    "date": parse_date(row),
+                    "amount": parse_amount(row),
+                }
+                entry.update(extra(row))
+            except RowError as exc:
+                self._error(line, str(exc))
+                continue
+            valid.append(entry)
+        return valid
+
+    def _import_debts(self, chunk) -> int:
+        valid = self._entries(
+            chunk, lambda row: {"description": parse_text(row, "description", 200)}
+        )
+        write_entries(debts=valid, user_id=self.user_id)
+        return len(valid)
+
+    def _import_payments(self, chunk) -> int:
+        closed = last_closed_day()
+
+        def method(row):
+            value = parse_text(row, "method", 20, required=False) or "cash"
+            if value not in PAYMENT_METHODS:
+                raise RowError(f"método inválido: {value}")
+            if closed is not None and parse_date(row) <= closed:
+                raise RowError(f"la caja del {parse_date(row).strftime('%d/%m/%Y')} ya está cerrada")
+            return {"method": value}
+
+        valid = self._entries(chunk, method)
+        write_entries(payments=valid, user_id=self.user_id)
+        return len(valid)
@@ -0,0 +1,349 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, select, update
+from allocation import rebuild_allocations
+from cash_register import rebuild_cash_snapshots
+from importer import Importer, file_extension, read_rows
+from ledger import rebuild_balances
+from models import db, Job
+from reports import csv_lines, iter_movements, ndjson_lines, parse_filters
+from settings import apply_defaults
+
+DEFAULTS = {
+    # threads per process; 0 runs every job inline in the submitting request
+    "JOB_WORKERS": 2,
+    # empty means <app root>/jobs
+    "JOB_DIR": "",
+    # finished jobs and their files older than this are removed by purge_jobs()
+    "JOB_RETENTION_HOURS": 24,
+}
+
+STATUS_LABELS = {
+    "queued": "En cola",
+    "running": "En curso",
+    "done": "Terminado",
+    "failed": "Con error",
+}
+# progress is written at most this often, from its own connection
+PROGRESS_INTERVAL = 0.5
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+class JobError(RuntimeError):
+    pass
+
+
+def init_jobs(app) -> None:
+    apply_defaults(app, DEFAULTS)
+
+
+def job_dir() -> str:
+    path = current_app.config["JOB_DIR"] or os.path.join(current_app.root_path, "jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_path(job) -> str:
+    return os.path.join(job_dir(), job.filename)
+
+
+def save_upload(upload) -> str:
+    """Store an uploaded file for an import job; returns its name inside job_dir()."""
+    name = f"upload_{uuid.uuid4().hex}{file_extension(upload.filename)}"
+    upload.save(os.path.join(job_dir(), name))
+    return name
+
+
+class Progress:
+    """Callable handed to job handlers; writes progress outside the job's transaction.
+
+    On SQLite call it between the handler's write transactions, or it waits
+    for the handler's own lock.
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._written = 0.0
+
+    def __call__(self, done: int, total: int = None, message: str = None, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._written < PROGRESS_INTERVAL:
+            return
+        self._written = now
+        values = {"progress": done}
+        if total is not None:
+            values["total"] = total
+        if message is not None:
+            values["message"] = message[:200]
+        _write(self.job_id, **values)
+
+
+def _write(job_id: int, **values) -> None:
+    with db.engine.begin() as connection:
+        table = Job.__table__
+        connection.execute(update(table).where(table.c.id == job_id).values(**values))
+
+
+# Handlers get the job row, its params and a Progress. They return a
+# JSON-able dict; a "file" key names the download they wrote in job_dir().
+
+
+def _output_name(job, extension: str) -> str:
+    return f"job_{job.id}.{extension}"
+
+
+def _report_export(job, params: dict, progress) -> dict:
+    filters, conditions = parse_filters(
+        params.get("start_date"), params.get("end_date"), params.get("client_id")
+    )
+    export_format = "ndjson" if params.get("format") == "ndjson" else "csv"
+    filename = _output_name(job, export_format)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in iter_movements(filters, conditions):
+            count += 1
+            progress(count)
+            yield row
+
+    lines = ndjson_lines(counted()) if export_format == "ndjson" else csv_lines(counted())
+    with open(os.path.join(job_dir(), filename), "w", encoding="utf-8", newline="") as handle:
+        for line in lines:
+            handle.write(line)
+    progress(count, count, force=True)
+    return {"rows": count, "format": export_format, "file": filename}
+
+
+def _import(job, params: dict, progress) -> dict:
+    path = os.path.join(job_dir(), params["upload"])
+    try:
+        with open(path, "rb") as stream:
+            result = Importer(params["kind"], user_id=job.user_id).run(
+                read_rows(stream, params["filename"]),
+                progress=lambda inserted, errors: progress(
+                    inserted, message=f"{errors} filas con errores"
+                ),
+            )
+    finally:
+        os.remove(path)
+    progress(result["inserted"], message=f"{result['error_count']} filas con errores", force=True)
+    # keep the stored result small; the first errors are enough to fix a file
+    result["errors"] = result["errors"][:100]
+    return result
+
+
+def _rebuild_balances(job, params: dict, progress) -> dict:
+    return {"clients": rebuild_balances()}
+
+
+def _rebuild_allocations(job, params: dict, progress) -> dict:
+    return {"allocations": rebuild_allocations()}
+
+
+def _rebuild_cash_snapshots(job, params: dict, progress) -> dict:
+    return {"days": rebuild_cash_snapshots()}
+
+
+HANDLERS = {
+    "report_export": _report_export,
+    "import": _import,
+    "rebuild_balances": _rebuild_balances,
+    "rebuild_allocations": _rebuild_allocations,
+    "rebuild_cash_snapshots": _rebuild_cash_snapshots,
+}
+KIND_LABELS = {
+    "report_export": "Exportación de movimientos",
+    "import": "Importación",
+    "rebuild_balances": "Recálculo de saldos",
+    "rebuild_allocations": "Recálculo de imputaciones",
+    "rebuild_cash_snapshots": "Recálculo de caja diaria",
+}
+ADMIN_KINDS = {"import", "rebuild_balances", "rebuild_allocations", "rebuild_cash_snapshots"}
+
+
+def _pool():
+    global _executor, _executor_pid
+    with _lock:
+        # a forked worker must not reuse the parent's threads
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config["JOB_WORKERS"], thread_name_prefix="job"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown_jobs(wait: bool = True) -> None:
+    """Stop this process's pool; jobs it had not started stay queued for run_queued()."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        owned = _executor_pid == os.getpid()
+    if executor is not None and owned:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def submit(kind: str, params: dict, user_id=None) -> Job:
+    """Store a queued job and hand it to this process's pool; returns the job."""
+    if kind not in HANDLERS:
+        raise JobError(f"Tipo de trabajo desconocido: {kind}")
+    job = Job(kind=kind, params=json.dumps(params), user_id=user_id, status="queued")
+    db.session.add(job)
+    db.session.commit()
+    if current_app.config["JOB_WORKERS"] > 0:
+        app = current_app._get_current_object()
+        _pool().submit(_run_in_app, app, job.id)
+    else:
+        run_job(job.id)
+    return job
+
+
+def _run_in_app(app, job_id: int) -> None:
+    with app.app_context():
+        run_job(job_id)
+
+
+def _worker_name(pid: int = None) -> str:
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _claim(job_id: int) -> bool:
+    """Move a queued job to running; False if another worker got it first."""
+    with db.engine.begin() as connection:
+        table = Job.__table__
+        result = connection.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.status == "queued")
+            .values(status="running", started_at=datetime.utcnow(), worker=_worker_name())
+        )
+    return result.rowcount == 1
+
+
+def recover_jobs() -> int:
+    """Fail the running jobs whose process on this host is gone; returns how many.
+
+    A worker killed mid-job (timeout, out of memory, a crash) leaves its job
+    running forever. Jobs of processes on other hosts are left alone. They
+    are failed rather than queued again because an import may have
+    committed part of its rows.
+    """
+    host = socket.gethostname()
+    stale = []
+    for job_id, worker in db.session.execute(
+        select(Job.id, Job.worker).where(Job.status == "running")
+    ):
+        # jobs claimed before the worker column existed have no owner
+        name, _, pid = (worker or "").rpartition(":")
+        if worker is None or (name == host and pid.isdigit() and not _alive(int(pid))):
+            stale.append(job_id)
+    db.session.rollback()
+    for job_id in stale:
+        current_app.logger.warning("Trabajo %s interrumpido: su proceso terminó", job_id)
+        _write(
+            job_id,
+            status="failed",
+            message="Interrumpido: el proceso que lo ejecutaba terminó",
+            finished_at=datetime.utcnow(),
+        )
+    return len(stale)
+
+
+def run_job(job_id: int) -> bool:
+    """Run one queued job to completion in the current thread."""
+    if not _claim(job_id):
+        return False
+    job = db.session.get(Job, job_id)
+    try:
+        result = HANDLERS[job.kind](job, json.loads(job.params or "{}"), Progress(job_id))
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.error("Trabajo %s falló:\n%s", job_id, traceback.format_exc())
+        _write(
+            job_id,
+            status="failed",
+            message=str(exc)[:200] or exc.__class__.__name__,
+            finished_at=datetime.utcnow(),
+        )
+    else:
+        db.session.rollback()
+        _write(
+            job_id,
+            status="done",
+            filename=result.pop("file", None),
+            result=json.dumps(result, default=str),
+            finished_at=datetime.utcnow(),
+        )
+    return True
+
+
+def run_queued(limit: int = None) -> int:
+    """Run queued jobs left by processes that stopped; returns how many ran."""
+    recover_jobs()
+    ran = 0
+    while limit is None or ran < limit:
+        job_id = db.session.execute(
+            select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(1)
+        ).scalar()
+        db.session.rollback()
+        if job_id is None:
+            break
+        if run_job(job_id):
+            ran += 1
+    return ran
+
+
+def purge_jobs(now: datetime = None) -> int:
+    """Delete finished jobs past JOB_RETENTION_HOURS together with their files."""
+    limit = (now or datetime.utcnow()) - timedelta(
+        hours=current_app.config["JOB_RETENTION_HOURS"]
+    )
+    old = db.session.execute(
+        select(Job.id, Job.filename).where(
+            Job.status.in_(("done", "failed")), Job.finished_at < limit
+        )
+    ).all()
+    for _, filename in old:
+        if filename and os.path.exists(os.path.join(job_dir(), filename)):
+            os.remove(os.path.join(job_dir(), filename))
+    if old:
+        db.session.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in old])))
+    db.session.commit()
+    return len(old)
+
+
+def job_status(job) -> dict:
+    result = json.loads(job.result) if job.result else None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "message": job.message,
+        "result": result,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download": bool(job.filename) and job.status == "done",
+    }
@@ -0,0 +1,239 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import Date, bindparam, case, func, literal, null, select, union_all, update
+from models import db, Client, Debt, Payment, METHOD_LABELS
+from pagination import keyset_page
+
+
+def _latest(column, day: date):
+    return case(
+        (column.is_(None), day),
+        (column < day, day),
+        else_=column,
+    )
+
+
+def record_debt(client_id: int, amount: Decimal, day: date) -> None:
+    """Add a debt to the stored client balance inside the current transaction."""
+    db.session.execute(
+        update(Client)
+        .where(Client.id == client_id)
+        .values(
+            balance=Client.balance + amount,
+            debt_count=Client.debt_count + 1,
+            last_activity=_latest(Client.last_activity, day),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_payment(client_id: int, amount: Decimal, day: date) -> None:
+    """Subtract a payment from the stored client balance inside the current transaction."""
+    db.session.execute(
+        update(Client)
+        .where(Client.id == client_id)
+        .values(
+            balance=Client.balance - amount,
+            payment_count=Client.payment_count + 1,
+            last_activity=_latest(Client.last_activity, day),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_batch(kind: str, per_client: dict) -> None:
+    """Apply many debts or payments at once.
+
+    ``per_client`` maps client id to ``(amount_total, count, last_day)``; all
+    clients are updated with a single executemany UPDATE.
+    """
+    if not per_client:
+        return
+    table = Client.__table__
+    count_column = table.c.debt_count if kind == "debt" else table.c.payment_count
+    amount = bindparam("b_amount")
+    balance = table.c.balance + amount if kind == "debt" else table.c.balance - amount
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            {
+                table.c.balance: balance,
+                count_column: count_column + bindparam("b_count"),
+                table.c.last_activity: _latest(
+                    table.c.last_activity, bindparam("b_day", type_=Date)
+                ),
+            }
+        ),
+        [
+            {"b_id": client_id, "b_amount": total, "b_count": count, "b_day": day}
+            for client_id, (total, count, day) in per_client.items()
+        ],
+    )
+
+
+def _computed_columns():
+    debt_total = (
+        select(func.coalesce(func.sum(Debt.amount), 0))
+        .where(Debt.client_id == Client.id)
+        .scalar_subquery()
+    )
+    payment_total = (
+        select(func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.client_id == Client.id)
+        .scalar_subquery()
+    )
+    debt_count = select(func.count(Debt.id)).where(Debt.client_id == Client.id).scalar_subquery()
+    payment_count = (
+        select(func.count(Payment.id)).where(Payment.client_id == Client.id).scalar_subquery()
+    )
+    last_debt = select(func.max(Debt.date)).where(Debt.client_id == Client.id).scalar_subquery()
+    last_payment = (
+        select(func.max(Payment.date)).where(Payment.client_id == Client.id).scalar_subquery()
+    )
+    last_activity = case(
+        (last_debt.is_(None), last_payment),
+        (last_payment.is_(None), last_debt),
+        (last_debt > last_payment, last_debt),
+        else_=last_payment,
+    )
+    return {
+        "balance": debt_total - payment_total,
+        "debt_count": debt_count,
+        "payment_count": payment_count,
+        "last_activity": last_activity,
+    }
+
+
+def find_balance_drift() -> list:
+    """Compare stored balances against the raw debt and payment tables.
+
+    Returns one dict per client whose stored aggregates disagree with the
+    recomputed ones.
+    """
+    computed = _computed_columns()
+    rows = db.session.execute(
+        select(
+            Client.id,
+            Client.name,
+            Client.balance,
+            Client.debt_count,
+            Client.payment_count,
+            Client.last_activity,
+            computed["balance"].label("expected_balance"),
+            computed["debt_count"].label("expected_debt_count"),
+            computed["payment_count"].label("expected_payment_count"),
+            computed["last_activity"].label("expected_last_activity"),
+        ).order_by(Client.id)
+    )
+    drift = []
+    for row in rows:
+        expected_last = row.expected_last_activity
+        if isinstance(expected_last, str):
+            expected_last = date.fromisoformat(expected_last)
+        if (
+            (row.balance or 0) != (row.expected_balance or 0)
+            or row.debt_count != row.expected_debt_count
+            or row.payment_count != row.expected_payment_count
+            or row.last_activity != expected_last
+        ):
+            drift.append(
+                {
+                    "client_id": row.id,
+                    "name": row.name,
+                    "balance": row.balance,
+                    "expected_balance": row.expected_balance,
+                    "debt_count": row.debt_count,
+                    "expected_debt_count": row.expected_debt_count,
+                    "payment_count": row.payment_count,
+                    "expected_payment_count": row.expected_payment_count,
+                }
+            )
+    return drift
+
+
+def rebuild_balances() -> int:
+    """Recompute every stored client balance from the raw tables in one statement."""
+    result = db.session.execute(
+        update(Client)
+        .values(**_computed_columns())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _statement_entries(client_id: int):
+    debts = select(
+        Debt.date.label("date"),
+        literal("debt").label("kind"),
+        Debt.id.label("id"),
+        Debt.amount.label("amount"),
+        Debt.description.label("description"),
+        null().label("method"),
+    ).where(Debt.client_id == client_id)
+    payments = select(
+        Payment.date.label("date"),
+        literal("payment").label("kind"),
+        Payment.id.label("id"),
+        Payment.amount.label("amount"),
+        null().label("description"),
+        Payment.method.label("method"),
+    ).where(Payment.client_id == client_id)
+    return union_all(debts, payments).subquery("entry")
+
+
+def balance_until(client, day: date) -> Decimal:
+    """Client balance at the end of ``day``, from the stored balance minus later entries."""
+    later_debts = select(func.coalesce(func.sum(Debt.amount), 0)).where(
+        Debt.client_id == client.id, Debt.date > day
+    )
+    later_payments = select(func.coalesce(func.sum(Payment.amount), 0)).where(
+        Payment.client_id == client.id, Payment.date > day
+    )
+    return (
+        (client.balance or 0)
+        - db.session.execute(later_debts).scalar()
+        + db.session.execute(later_payments).scalar()
+    )
+
+
+def statement_page(client, cursor, limit: int, until: date = None):
+    """One page of the client's debts and payments, newest first, with running balance.
+
+    The cursor carries the sort key of the last entry shown plus the balance
+    before it, so later pages never re-read newer history.
+    """
+    entry = _statement_entries(client.id)
+    columns = [entry.c.date, entry.c.kind, entry.c.id]
+    query = db.session.query(entry)
+    balance = client.balance or 0
+    key = None
+    if cursor is not None and len(cursor) == len(columns) + 1:
+        try:
+            key, balance = cursor[:-1], Decimal(str(cursor[-1]))
+        except (TypeError, ValueError, InvalidOperation):
+            key = None
+    if key is None and until is not None:
+        query = query.filter(entry.c.date <= until)
+        balance = balance_until(client, until)
+    rows, last = keyset_page(query, columns, key, limit, descending=True)
+    entries = []
+    for row in rows:
+        signed = row.amount if row.kind == "debt" else -row.amount
+        entries.append(
+            {
+                "date": row.date,
+                "kind": row.kind,
+                "id": row.id,
+                "amount": row.amount,
+                "description": row.description,
+                "method_label": METHOD_LABELS.get(row.method, row.method),
+                "balance": balance,
+            }
+        )
+        balance -= signed
+    next_cursor = None
+    if last is not None:
+        next_cursor = [last.date, last.kind, last.id, balance]
+    return entries, next_cursor
@@ -0,0 +1,367 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from flask import before_render_template, current_app, g, has_request_context, request
+from flask import template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from settings import apply_defaults
+
+DEFAULTS = {
+    # statements slower than this are logged with their endpoint
+    "SLOW_QUERY_MS": 200.0,
+    # 0 disables the Server-Timing response header
+    "SERVER_TIMING": 1,
+    # requests per endpoint kept for the rolling latency quantiles
+    "METRICS_WINDOW": 1000,
+    # shared by the worker processes of one server; empty keeps the metrics
+    # of each process to itself
+    "METRICS_DIR": "",
+    # how often each worker writes its metrics to METRICS_DIR
+    "METRICS_FLUSH_SECONDS": 5.0,
+}
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "client_debt_"
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram with fixed upper bounds."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        self.sum += value
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def add(self, counts: list, total: float) -> None:
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.sum += total
+
+
+_HISTOGRAMS = ("duration", "db", "render", "queries")
+
+
+class EndpointStats:
+    def __init__(self, window):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db = Histogram(SECONDS_BUCKETS)
+        self.render = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.recent = deque(maxlen=window)
+        self.slow_queries = 0
+        self.slowest = (0.0, None)
+
+    def state(self, recent: bool = True) -> dict:
+        """JSON-able copy, as written to METRICS_DIR."""
+        state = {name: [getattr(self, name).counts, getattr(self, name).sum] for name in _HISTOGRAMS}
+        state.update(
+            recent=list(self.recent) if recent else [],
+            slow_queries=self.slow_queries,
+            slowest=list(self.slowest),
+        )
+        return state
+
+    def add(self, state: dict) -> None:
+        for name in _HISTOGRAMS:
+            getattr(self, name).add(*state[name])
+        self.recent.extend(state["recent"])
+        self.slow_queries += state["slow_queries"]
+        if state["slowest"][0] > self.slowest[0]:
+            self.slowest = tuple(state["slowest"])
+
+
+_lock = threading.Lock()
+_endpoints = {}
+_flusher_pid = None
+# metrics of exited workers; their counters must not go back
+RETIRED_FILE = "metrics_retired.json"
+
+
+def init_metrics(app) -> None:
+    """Read the settings and hook timing into the request cycle of ``app``."""
+    apply_defaults(app, DEFAULTS)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_finish_render, app)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_request_context() or "request_timing" not in g:
+        return
+    timing = g.request_timing
+    timing["queries"] += 1
+    timing["db"] += elapsed
+    if elapsed > timing["slowest"][0]:
+        timing["slowest"] = (elapsed, statement)
+    if elapsed * 1000 >= current_app.config["SLOW_QUERY_MS"]:
+        timing["slow"] += 1
+        current_app.logger.warning(
+            "Consulta lenta (%.1f ms) en %s: %s",
+            elapsed * 1000,
+            request.endpoint,
+            " ".join(statement.split()),
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_query(context):
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+def _start_request():
+    g.request_timing = {
+        "started": time.perf_counter(),
+        "queries": 0,
+        "db": 0.0,
+        "render": 0.0,
+        "slow": 0,
+        "slowest": (0.0, None),
+    }
+
+
+def _start_render(sender, template, context, **extra):
+    if "request_timing" in g:
+        g.request_timing["render_started"] = time.perf_counter()
+
+
+def _finish_render(sender, template, context, **extra):
+    timing = g.get("request_timing")
+    if timing and "render_started" in timing:
+        # templates run the lazy loaders, so this includes their queries
+        timing["render"] += time.perf_counter() - timing.pop("render_started")
+
+
+def _finish_request(response):
+    timing = g.pop("request_timing", None)
+    if timing is None:
+        return response
+    total = time.perf_counter() - timing["started"]
+    if current_app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = (
+            f'db;dur={timing["db"] * 1000:.1f};desc="{timing["queries"]} consultas", '
+            f"render;dur={timing['render'] * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+    if current_app.config["METRICS_DIR"] and _flusher_pid != os.getpid():
+        _start_flusher(current_app._get_current_object())
+    endpoint = request.endpoint or "sin_ruta"
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = EndpointStats(current_app.config["METRICS_WINDOW"])
+        stats.duration.observe(total)
+        stats.db.observe(timing["db"])
+        stats.render.observe(timing["render"])
+        stats.queries.observe(timing["queries"])
+        stats.recent.append(total)
+        stats.slow_queries += timing["slow"]
+        if timing["slowest"][0] > stats.slowest[0]:
+            stats.slowest = timing["slowest"]
+    return response
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _endpoints.clear()
+
+
+def _snapshot(recent: bool = True) -> dict:
+    with _lock:
+        return {name: stats.state(recent) for name, stats in _endpoints.items()}
+
+
+def _write_json(path: str, data) -> None:
+    # readers only ever see a complete file
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    os.replace(partial, path)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def flush_metrics(directory: str) -> None:
+    """Write this process's metrics to ``directory`` for the other workers to read."""
+    _write_json(os.path.join(directory, f"metrics_{os.getpid()}.json"), _snapshot())
+
+
+def _start_flusher(app) -> None:
+    global _flusher_pid
+    with _lock:
+        # a forked worker needs its own thread
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    directory = app.config["METRICS_DIR"]
+    os.makedirs(directory, exist_ok=True)
+
+    def loop():
+        while True:
+            time.sleep(app.config["METRICS_FLUSH_SECONDS"])
+            try:
+                flush_metrics(directory)
+            except OSError as exc:
+                app.logger.warning("No se pudieron guardar las métricas: %s", exc)
+
+    threading.Thread(target=loop, name="metrics", daemon=True).start()
+
+
+def retire_worker(directory: str, pid: int) -> None:
+    """Fold the file of an exited worker into RETIRED_FILE; run by the server's master.
+
+    Counters and histograms keep growing, the latency window is dropped.
+    """
+    path = os.path.join(directory, f"metrics_{pid}.json")
+    states = _read_json(path)
+    if not states:
+        return
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    retired = {}
+    for source in (_read_json(retired_path), states):
+        for name, state in source.items():
+            retired.setdefault(name, EndpointStats(0)).add(state)
+    _write_json(retired_path, {name: stats.state(False) for name, stats in retired.items()})
+    os.remove(path)
+
+
+def _collect() -> dict:
+    """Stats per endpoint of this process and, with METRICS_DIR, of every worker.
+
+    The other workers' values are at most METRICS_FLUSH_SECONDS old.
+    """
+    states = [_snapshot()]
+    directory = current_app.config["METRICS_DIR"]
+    if directory:
+        own = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        states += [
+            _read_json(path)
+            for path in glob.glob(os.path.join(directory, "metrics_*.json"))
+            if path != own
+        ]
+    merged = {}
+    for source in states:
+        for name, state in source.items():
+            merged.setdefault(name, EndpointStats(None)).add(state)
+    return merged
+
+
+def _quantile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def slowest_queries() -> dict:
+    """Slowest statement seen per endpoint as ``{endpoint: (seconds, sql)}``."""
+    return {name: stats.slowest for name, stats in _collect().items() if stats.slowest[1]}
+
+
+def _histogram_lines(name: str, help_text: str, values: dict) -> list:
+    lines = [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} histogram"]
+    for endpoint, histogram in values.items():
+        cumulative = 0
+        for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(
+                f'{PREFIX}{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{PREFIX}{name}_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+        lines.append(f'{PREFIX}{name}_count{{endpoint="{endpoint}"}} {cumulative}')
+    return lines
+
+
+def prometheus_text() -> str:
+    """Every endpoint metric in the Prometheus text exposition format."""
+    endpoints = sorted(_collect().items())
+    lines = _histogram_lines(
+        "request_duration_seconds",
+        "Tiempo total del pedido.",
+        {name: stats.duration for name, stats in endpoints},
+    )
+    lines += _histogram_lines(
+        "db_duration_seconds",
+        "Tiempo en la base de datos por pedido.",
+        {name: stats.db for name, stats in endpoints},
+    )
+    lines += _histogram_lines(
+        "render_duration_seconds",
+        "Tiempo de render de plantillas por pedido.",
+        {name: stats.render for name, stats in endpoints},
+    )
+    lines += _histogram_lines(
+        "queries_per_request",
+        "Consultas SQL por pedido.",
+        {name: stats.queries for name, stats in endpoints},
+    )
+    lines += [
+        f"# HELP {PREFIX}request_latency_seconds Latencia de los últimos pedidos por ruta.",
+        f"# TYPE {PREFIX}request_latency_seconds summary",
+    ]
+    for name, stats in endpoints:
+        ordered = sorted(stats.recent)
+        # endpoints only served by exited workers have no recent window
+        if ordered:
+            for q in QUANTILES:
+                lines.append(
+                    f'{PREFIX}request_latency_seconds{{endpoint="{name}",quantile="{q}"}} '
+                    f"{_quantile(ordered, q):.6f}"
+                )
+        # quantiles cover the window, sum and count the whole server life
+        lines.append(
+            f'{PREFIX}request_latency_seconds_sum{{endpoint="{name}"}} '
+            f"{stats.duration.sum:.6f}"
+        )
+        lines.append(
+            f'{PREFIX}request_latency_seconds_count{{endpoint="{name}"}} '
+            f"{stats.duration.count}"
+        )
+    lines += [
+        f"# HELP {PREFIX}slow_queries_total Consultas por encima de SLOW_QUERY_MS.",
+        f"# TYPE {PREFIX}slow_queries_total counter",
+    ]
+    lines += [
+        f'{PREFIX}slow_queries_total{{endpoint="{name}"}} {stats.slow_queries}'
+        for name, stats in endpoints
+    ]
+    lines += [
+        f"# HELP {PREFIX}slowest_query_seconds Consulta más lenta vista por ruta.",
+        f"# TYPE {PREFIX}slowest_query_seconds gauge",
+    ]
+    lines += [
+        f'{PREFIX}slowest_query_seconds{{endpoint="{name}"}} {stats.slowest[0]:.6f}'
+        for name, stats in endpoints
+    ]
+    return "\n".join(lines) + "\n"
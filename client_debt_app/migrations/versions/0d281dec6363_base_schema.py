@@ -0,0 +1,136 @@
+"""base schema
+
+Creates the original tables on an empty database. Databases created by the
+old import-time ``db.create_all()`` are brought to the same shape: missing
+columns are added and duplicate client documents are merged into the oldest
+client before the unique index is created.
+
+Revision ID: 0d281dec6363
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d281dec6363'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {col["name"] for col in inspector.get_columns(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "user" not in tables:
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("username", sa.String(length=80), nullable=False),
+            sa.Column("password_hash", sa.String(length=128), nullable=False),
+            sa.Column("role", sa.String(length=20), nullable=False, server_default="user"),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("username"),
+        )
+    elif "role" not in _columns(inspector, "user"):
+        op.add_column(
+            "user",
+            sa.Column("role", sa.String(length=20), nullable=False, server_default="user"),
+        )
+
+    if "client" not in tables:
+        op.create_table(
+            "client",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(length=120), nullable=False),
+            sa.Column("document", sa.String(length=50), nullable=False),
+            sa.Column("address", sa.String(length=200), nullable=True),
+            sa.Column("phone", sa.String(length=20), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    else:
+        columns = _columns(inspector, "client")
+        if "address" not in columns:
+            op.add_column("client", sa.Column("address", sa.String(length=200), nullable=True))
+        if "phone" not in columns:
+            op.add_column("client", sa.Column("phone", sa.String(length=20), nullable=True))
+    indexes = {idx["name"] for idx in sa.inspect(op.get_bind()).get_indexes("client")}
+    if "ix_client_document" not in indexes:
+        # move rows of duplicate clients to the oldest client with the same
+        # document, then remove the duplicates before creating the unique index
+        for child in ("debt", "payment", "movement"):
+            if child in tables:
+                op.execute(
+                    f"UPDATE {child} SET client_id = ("
+                    "SELECT MIN(keep.id) FROM client AS dup "
+                    "JOIN client AS keep ON keep.document = dup.document "
+                    f"WHERE dup.id = {child}.client_id"
+                    ") WHERE client_id IS NOT NULL AND client_id IN (SELECT id FROM client)"
+                )
+        op.execute(
+            "DELETE FROM client WHERE id NOT IN "
+            "(SELECT MIN(id) FROM client GROUP BY document)"
+        )
+        op.create_index("ix_client_document", "client", ["document"], unique=True)
+
+    if "debt" not in tables:
+        op.create_table(
+            "debt",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("client_id", sa.Integer(), nullable=False),
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("description", sa.String(length=200), nullable=False),
+            sa.ForeignKeyConstraint(["client_id"], ["client.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    if "payment" not in tables:
+        op.create_table(
+            "payment",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("client_id", sa.Integer(), nullable=False),
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("method", sa.String(length=20), nullable=False, server_default="cash"),
+            sa.ForeignKeyConstraint(["client_id"], ["client.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    elif "method" not in _columns(inspector, "payment"):
+        op.add_column(
+            "payment",
+            sa.Column("method", sa.String(length=20), nullable=False, server_default="cash"),
+        )
+
+    if "movement" not in tables:
+        op.create_table(
+            "movement",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("client_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(length=50), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("description", sa.String(length=200), nullable=True),
+            sa.Column("timestamp", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["client_id"], ["client.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    elif "user_id" not in _columns(inspector, "movement"):
+        op.add_column("movement", sa.Column("user_id", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_table("movement")
+    op.drop_table("payment")
+    op.drop_table("debt")
+    op.drop_index("ix_client_document", table_name="client")
+    op.drop_table("client")
+    op.drop_table("user")
@@ -0,0 +1,37 @@
+"""cash and statement indexes
+
+Revision ID: a2be1c8bb287
+Revises: b8d16576e2c7
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2be1c8bb287'
+down_revision = 'b8d16576e2c7'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ("ix_payment_date_method", "payment", ["date", "method"]),
+    ("ix_payment_client_date", "payment", ["client_id", "date", "id"]),
+    ("ix_debt_client_date", "debt", ["client_id", "date", "id"]),
+    ("ix_movement_action_timestamp", "movement", ["action", "timestamp"]),
+    ("ix_movement_client_timestamp", "movement", ["client_id", "timestamp"]),
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {idx["name"] for idx in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""movement archive registry
+
+Registry of closed months whose movements were moved out of the ``movement``
+table into read-only SQLite files.
+
+Revision ID: a7c4e2b91f60
+Revises: f3a91c5d2e07
+Create Date: 2026-10-18 10:35:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c4e2b91f60'
+down_revision = 'f3a91c5d2e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "movement_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_movement_archive_month", "movement_archive", ["month"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_movement_archive_month", table_name="movement_archive")
+    op.drop_table("movement_archive")
@@ -0,0 +1,40 @@
+"""updated at
+
+Adds ``updated_at`` to client, debt, payment and cash_snapshot, with an
+index per table for the ``updated_since`` filter of /api/v1. Existing rows
+get the time of the upgrade, so the first delta sync after it returns
+everything once.
+
+Revision ID: a9d4f2c7e5b3
+Revises: f7c2a9e4b6d1
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4f2c7e5b3'
+down_revision = 'f7c2a9e4b6d1'
+branch_labels = None
+depends_on = None
+
+TABLES = (("client", "id"), ("debt", "id"), ("payment", "id"), ("cash_snapshot", "day"))
+
+
+def upgrade():
+    for table, key in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("updated_at", existing_type=sa.DateTime(), nullable=False)
+        op.create_index(f"ix_{table}_updated_at", table, ["updated_at", key])
+
+
+def downgrade():
+    for table, _ in reversed(TABLES):
+        op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
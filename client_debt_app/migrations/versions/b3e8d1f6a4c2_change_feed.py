@@ -0,0 +1,58 @@
+"""change feed
+
+Adds ``movement.seq``, the change-feed position of every movement, the
+one-row ``change_counter`` that hands it out and ``feed_checkpoint`` for
+consumers. Existing movements get their id as sequence, which matches their
+commit order.
+
+Revision ID: b3e8d1f6a4c2
+Revises: a9d4f2c7e5b3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d1f6a4c2'
+down_revision = 'a9d4f2c7e5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("movement") as batch_op:
+        batch_op.add_column(sa.Column("seq", sa.BigInteger(), nullable=True))
+    op.execute("UPDATE movement SET seq = id")
+    op.create_index("ix_movement_seq", "movement", ["seq"], unique=True)
+    op.create_index(
+        "ix_movement_unsequenced",
+        "movement",
+        ["id"],
+        sqlite_where=sa.text("seq IS NULL"),
+        postgresql_where=sa.text("seq IS NULL"),
+    )
+    op.create_table(
+        "change_counter",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO change_counter (id, value) SELECT 1, COALESCE(MAX(id), 0) FROM movement")
+    op.create_table(
+        "feed_checkpoint",
+        sa.Column("consumer", sa.String(length=100), nullable=False),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("consumer"),
+    )
+
+
+def downgrade():
+    op.drop_table("feed_checkpoint")
+    op.drop_table("change_counter")
+    op.drop_index("ix_movement_unsequenced", table_name="movement")
+    op.drop_index("ix_movement_seq", table_name="movement")
+    with op.batch_alter_table("movement") as batch_op:
+        batch_op.drop_column("seq")
@@ -0,0 +1,53 @@
+"""money as integer cents
+
+Converts ``client.balance`` and every ``amount`` column from floating point
+to an integer number of cents. Values are rounded to the cent before the
+type changes, because the SQLite table copy casts by truncation.
+
+Revision ID: b4d2e8f1a93c
+Revises: a7c4e2b91f60
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d2e8f1a93c'
+down_revision = 'a7c4e2b91f60'
+branch_labels = None
+depends_on = None
+
+
+MONEY_COLUMNS = (
+    ("client", "balance", False),
+    ("debt", "amount", False),
+    ("payment", "amount", False),
+    ("movement", "amount", True),
+)
+
+
+def upgrade():
+    for table, column, nullable in MONEY_COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = ROUND({column} * 100)")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.Float(),
+                type_=sa.Integer(),
+                existing_nullable=nullable,
+                postgresql_using=f"{column}::integer",
+            )
+
+
+def downgrade():
+    for table, column, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.Integer(),
+                type_=sa.Float(),
+                existing_nullable=nullable,
+            )
+        op.execute(f"UPDATE {table} SET {column} = {column} / 100.0")
@@ -0,0 +1,98 @@
+"""client search index
+
+Revision ID: b8d16576e2c7
+Revises: e5165b43723c
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d16576e2c7'
+down_revision = 'e5165b43723c'
+branch_labels = None
+depends_on = None
+
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+_DIGIT_SEPARATORS = re.compile(r"[\s.\-/()+]+")
+
+
+# Frozen copy of search.normalize / search.client_tokens at this revision.
+def _normalize(value):
+    if not value:
+        return ""
+    folded = unicodedata.normalize("NFKD", str(value))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(_SEPARATORS.split(folded.lower())).strip()
+
+
+def _tokens(name, document, phone):
+    tokens = set(_normalize(name).split())
+    for value in (document, phone):
+        compact = _normalize(_DIGIT_SEPARATORS.sub("", value or "")).replace(" ", "")
+        if compact:
+            tokens.add(compact)
+    return {t[:60] for t in tokens if t}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "search_name" not in {col["name"] for col in inspector.get_columns("client")}:
+        op.add_column("client", sa.Column("search_name", sa.String(length=120), nullable=True))
+    if "client_token" not in inspector.get_table_names():
+        op.create_table(
+            "client_token",
+            sa.Column("client_id", sa.Integer(), nullable=False),
+            sa.Column("token", sa.String(length=60), nullable=False),
+            sa.ForeignKeyConstraint(["client_id"], ["client.id"]),
+            sa.PrimaryKeyConstraint("client_id", "token"),
+        )
+        op.create_index("ix_client_token_token", "client_token", ["token", "client_id"])
+    indexes = {idx["name"] for idx in sa.inspect(bind).get_indexes("client")}
+    if "ix_client_search_name" not in indexes:
+        op.create_index("ix_client_search_name", "client", ["search_name", "id"])
+    if "ix_client_balance" not in indexes:
+        op.create_index("ix_client_balance", "client", ["balance", "id"])
+
+    client = sa.table(
+        "client",
+        sa.column("id", sa.Integer),
+        sa.column("name", sa.String),
+        sa.column("document", sa.String),
+        sa.column("phone", sa.String),
+        sa.column("search_name", sa.String),
+    )
+    token = sa.table("client_token", sa.column("client_id", sa.Integer), sa.column("token", sa.String))
+    bind.execute(token.delete())
+    rows = bind.execute(sa.select(client.c.id, client.c.name, client.c.document, client.c.phone)).all()
+    for start in range(0, len(rows), 1000):
+        batch = rows[start:start + 1000]
+        bind.execute(
+            client.update()
+            .where(client.c.id == sa.bindparam("b_id"))
+            .values(search_name=sa.bindparam("b_search_name")),
+            [{"b_id": r.id, "b_search_name": _normalize(r.name)} for r in batch],
+        )
+        tokens = [
+            {"client_id": r.id, "token": t}
+            for r in batch
+            for t in _tokens(r.name, r.document, r.phone)
+        ]
+        if tokens:
+            bind.execute(token.insert(), tokens)
+
+
+def downgrade():
+    op.drop_index("ix_client_balance", table_name="client")
+    op.drop_index("ix_client_search_name", table_name="client")
+    op.drop_index("ix_client_token_token", table_name="client_token")
+    op.drop_table("client_token")
+    with op.batch_alter_table("client") as batch_op:
+        batch_op.drop_column("search_name")
@@ -0,0 +1,35 @@
+"""data version
+
+Adds the one-row ``data_version`` table. Every commit that writes bumps it
+in the same transaction, so all processes (and ``flask`` commands) share one
+version for the caches and ETags, and it survives restarts.
+
+Revision ID: c5a8e3f1d7b9
+Revises: b3e8d1f6a4c2
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8e3f1d7b9'
+down_revision = 'b3e8d1f6a4c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "data_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO data_version (id, value, changed_at) VALUES (1, 1, CURRENT_TIMESTAMP)")
+
+
+def downgrade():
+    op.drop_table("data_version")
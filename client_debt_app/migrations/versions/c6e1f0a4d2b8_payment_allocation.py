@@ -0,0 +1,126 @@
+"""payment allocation
+
+Adds ``debt.outstanding``, ``payment.unallocated`` and ``payment_allocation``
+and fills them as if every payment had been applied to the client's oldest
+open debts (by date, then id) when it was made. Amounts are integer cents at
+this point, so the running sums are exact. ``ix_debt_date`` also covers
+``outstanding`` so the /deudas summary still reads only the index.
+
+Revision ID: c6e1f0a4d2b8
+Revises: b4d2e8f1a93c
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1f0a4d2b8'
+down_revision = 'b4d2e8f1a93c'
+branch_labels = None
+depends_on = None
+
+
+def _running(table):
+    # each row covers the half-open interval (hi - amount, hi] of the
+    # client's running total
+    return (
+        f"SELECT id, client_id, amount, "
+        f"SUM(amount) OVER (PARTITION BY client_id ORDER BY date, id) AS hi FROM {table}"
+    )
+
+
+def _least(a, b):
+    return f"CASE WHEN {a} < {b} THEN {a} ELSE {b} END"
+
+
+def _greatest(a, b):
+    return f"CASE WHEN {a} > {b} THEN {a} ELSE {b} END"
+
+
+def upgrade():
+    with op.batch_alter_table("debt") as batch_op:
+        batch_op.add_column(
+            sa.Column("outstanding", sa.Integer(), nullable=False, server_default="0")
+        )
+    with op.batch_alter_table("payment") as batch_op:
+        batch_op.add_column(
+            sa.Column("unallocated", sa.Integer(), nullable=False, server_default="0")
+        )
+    op.create_table(
+        "payment_allocation",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("payment_id", sa.Integer(), nullable=False),
+        sa.Column("debt_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["debt_id"], ["debt.id"]),
+        sa.ForeignKeyConstraint(["payment_id"], ["payment.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_payment_allocation_payment_id", "payment_allocation", ["payment_id"])
+    op.create_index("ix_payment_allocation_debt_id", "payment_allocation", ["debt_id"])
+
+    # FIFO over the whole history: a payment pays the part of the debts whose
+    # running-total interval overlaps its own
+    low_d, low_p = "d.hi - d.amount", "p.hi - p.amount"
+    op.execute(
+        f"""
+        INSERT INTO payment_allocation (payment_id, debt_id, amount)
+        SELECT p.id, d.id, {_least("d.hi", "p.hi")} - {_greatest(low_d, low_p)}
+        FROM ({_running("debt")}) AS d
+        JOIN ({_running("payment")}) AS p
+          ON p.client_id = d.client_id AND {low_p} < d.hi AND {low_d} < p.hi
+        """
+    )
+    op.execute(
+        """
+        UPDATE debt SET outstanding = amount - COALESCE(
+            (SELECT SUM(amount) FROM payment_allocation WHERE debt_id = debt.id), 0)
+        """
+    )
+    op.execute(
+        """
+        UPDATE payment SET unallocated = amount - COALESCE(
+            (SELECT SUM(amount) FROM payment_allocation WHERE payment_id = payment.id), 0)
+        """
+    )
+
+    op.drop_index("ix_debt_date", table_name="debt")
+    op.create_index("ix_debt_date", "debt", ["date", "id", "amount", "outstanding"])
+    op.create_index(
+        "ix_debt_open",
+        "debt",
+        ["client_id", "date", "id"],
+        sqlite_where=sa.text("outstanding > 0"),
+        postgresql_where=sa.text("outstanding > 0"),
+    )
+    op.create_index(
+        "ix_debt_open_date",
+        "debt",
+        ["date", "id", "client_id", "outstanding"],
+        sqlite_where=sa.text("outstanding > 0"),
+        postgresql_where=sa.text("outstanding > 0"),
+    )
+    op.create_index(
+        "ix_payment_unallocated",
+        "payment",
+        ["client_id", "date", "id"],
+        sqlite_where=sa.text("unallocated > 0"),
+        postgresql_where=sa.text("unallocated > 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_payment_unallocated", table_name="payment")
+    op.drop_index("ix_debt_open_date", table_name="debt")
+    op.drop_index("ix_debt_open", table_name="debt")
+    op.drop_index("ix_debt_date", table_name="debt")
+    op.create_index("ix_debt_date", "debt", ["date", "id", "amount"])
+    op.drop_index("ix_payment_allocation_debt_id", table_name="payment_allocation")
+    op.drop_index("ix_payment_allocation_payment_id", table_name="payment_allocation")
+    op.drop_table("payment_allocation")
+    with op.batch_alter_table("payment") as batch_op:
+        batch_op.drop_column("unallocated")
+    with op.batch_alter_table("debt") as batch_op:
+        batch_op.drop_column("outstanding")
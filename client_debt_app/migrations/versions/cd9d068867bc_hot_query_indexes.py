@@ -0,0 +1,38 @@
+"""hot query indexes
+
+Date-ordered listings of debts and movements page by keyset on
+``(date, id)`` and ``(timestamp, id)``. Every other hot filter column is the
+leading column of an index created by an earlier revision.
+
+Revision ID: cd9d068867bc
+Revises: a2be1c8bb287
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cd9d068867bc'
+down_revision = 'a2be1c8bb287'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ("ix_debt_date", "debt", ["date", "id"]),
+    ("ix_movement_timestamp", "movement", ["timestamp", "id"]),
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {idx["name"] for idx in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,42 @@
+"""archive last seq
+
+Adds ``movement_archive.last_seq``, the highest change-feed sequence in each
+archive file, so the feed can serve archived months. Files written before
+have no seq column; their movements count with their id, like the live rows
+did when the feed was added. Their last_seq is set to the current end of
+the feed, which only makes the feed open them for consumers behind it.
+
+Revision ID: d2b7f4a9c6e1
+Revises: c5a8e3f1d7b9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7f4a9c6e1'
+down_revision = 'c5a8e3f1d7b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("movement_archive") as batch_op:
+        batch_op.add_column(
+            sa.Column("last_seq", sa.BigInteger(), nullable=False, server_default="0")
+        )
+    op.execute(
+        "UPDATE movement_archive SET last_seq = "
+        "(SELECT value FROM change_counter WHERE id = 1)"
+    )
+    with op.batch_alter_table("movement_archive") as batch_op:
+        batch_op.alter_column("last_seq", server_default=None)
+        batch_op.create_index("ix_movement_archive_last_seq", ["last_seq"])
+
+
+def downgrade():
+    with op.batch_alter_table("movement_archive") as batch_op:
+        batch_op.drop_index("ix_movement_archive_last_seq")
+        batch_op.drop_column("last_seq")
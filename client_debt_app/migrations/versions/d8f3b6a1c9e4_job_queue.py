@@ -0,0 +1,48 @@
+"""job queue
+
+Table of background jobs (exports, imports and rebuilds) run by the
+in-process pool in ``jobs.py``.
+
+Revision ID: d8f3b6a1c9e4
+Revises: c6e1f0a4d2b8
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b6a1c9e4'
+down_revision = 'c6e1f0a4d2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=30), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("params", sa.Text(), nullable=True),
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("message", sa.String(length=200), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_job_status", "job", ["status", "id"])
+    op.create_index("ix_job_user", "job", ["user_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_job_user", table_name="job")
+    op.drop_index("ix_job_status", table_name="job")
+    op.drop_table("job")
@@ -0,0 +1,85 @@
+"""cash snapshot
+
+Adds ``cash_snapshot``, one row per day with payments per method, cash
+incomes and withdrawals and the register's opening and closing balance, and
+fills it from the payment and movement tables. Months already moved to
+archive files are not read here; run ``flask rebuild-cash-snapshots`` after
+upgrading if ``movement_archive`` has rows.
+
+Revision ID: e2a7c5d9f1b3
+Revises: d8f3b6a1c9e4
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c5d9f1b3'
+down_revision = 'd8f3b6a1c9e4'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ("cash", "transfer", "other", "cash_income", "cash_withdrawal")
+
+
+def upgrade():
+    money = [
+        sa.Column(name, sa.Integer(), nullable=False, server_default="0")
+        for name in COLUMNS + ("opening", "closing")
+    ]
+    snapshot = op.create_table(
+        "cash_snapshot",
+        sa.Column("day", sa.Date(), nullable=False),
+        *money,
+        sa.Column("closed_at", sa.DateTime(), nullable=True),
+        sa.Column("closed_by", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["closed_by"], ["user.id"]),
+        sa.PrimaryKeyConstraint("day"),
+    )
+    op.create_index(
+        "ix_cash_snapshot_closed",
+        "cash_snapshot",
+        ["day"],
+        sqlite_where=sa.text("closed_at IS NOT NULL"),
+        postgresql_where=sa.text("closed_at IS NOT NULL"),
+    )
+
+    bind = op.get_bind()
+    movement_day = (
+        "CAST(timestamp AS DATE)" if bind.dialect.name == "postgresql" else "date(timestamp)"
+    )
+    rows = bind.execute(
+        sa.text(
+            f"""
+            SELECT date AS day, method AS key, SUM(amount) FROM payment
+            WHERE method IN ('cash', 'transfer', 'other') GROUP BY date, method
+            UNION ALL
+            SELECT {movement_day}, action, SUM(amount) FROM movement
+            WHERE action IN ('cash_income', 'cash_withdrawal') GROUP BY {movement_day}, action
+            """
+        )
+    )
+    days = {}
+    for day, key, total in rows:
+        if not isinstance(day, date):
+            day = date.fromisoformat(str(day)[:10])
+        days.setdefault(day, dict.fromkeys(COLUMNS, 0))[key] += int(total or 0)
+    balance = 0
+    values = []
+    for day in sorted(days):
+        totals = days[day]
+        opening = balance
+        balance += totals["cash"] + totals["cash_income"] - totals["cash_withdrawal"]
+        values.append(dict(totals, day=day, opening=opening, closing=balance))
+    if values:
+        op.bulk_insert(snapshot, values)
+
+
+def downgrade():
+    op.drop_index("ix_cash_snapshot_closed", table_name="cash_snapshot")
+    op.drop_table("cash_snapshot")
@@ -0,0 +1,29 @@
+"""job worker
+
+Adds ``job.worker``, the ``host:pid`` of the process running a job, so a
+job left running by a process that died can be told apart and failed.
+
+Revision ID: e4c9a2f7b1d3
+Revises: d2b7f4a9c6e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c9a2f7b1d3'
+down_revision = 'd2b7f4a9c6e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("job") as batch_op:
+        batch_op.add_column(sa.Column("worker", sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("job") as batch_op:
+        batch_op.drop_column("worker")
@@ -0,0 +1,54 @@
+"""client balance ledger
+
+Revision ID: e5165b43723c
+Revises: 0d281dec6363
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5165b43723c'
+down_revision = '0d281dec6363'
+branch_labels = None
+depends_on = None
+
+
+LEDGER_COLUMNS = (
+    sa.Column("balance", sa.Float(), nullable=False, server_default="0"),
+    sa.Column("debt_count", sa.Integer(), nullable=False, server_default="0"),
+    sa.Column("payment_count", sa.Integer(), nullable=False, server_default="0"),
+    sa.Column("last_activity", sa.Date(), nullable=True),
+)
+
+
+def upgrade():
+    columns = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("client")}
+    for column in LEDGER_COLUMNS:
+        if column.name not in columns:
+            op.add_column("client", column.copy())
+
+    op.execute(
+        """
+        UPDATE client SET
+            balance = COALESCE((SELECT SUM(amount) FROM debt WHERE debt.client_id = client.id), 0)
+                    - COALESCE((SELECT SUM(amount) FROM payment WHERE payment.client_id = client.id), 0),
+            debt_count = (SELECT COUNT(*) FROM debt WHERE debt.client_id = client.id),
+            payment_count = (SELECT COUNT(*) FROM payment WHERE payment.client_id = client.id),
+            last_activity = (
+                SELECT MAX(day) FROM (
+                    SELECT MAX(date) AS day FROM debt WHERE debt.client_id = client.id
+                    UNION ALL
+                    SELECT MAX(date) AS day FROM payment WHERE payment.client_id = client.id
+                ) AS activity
+            )
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("client") as batch_op:
+        for column in reversed(LEDGER_COLUMNS):
+            batch_op.drop_column(column.name)
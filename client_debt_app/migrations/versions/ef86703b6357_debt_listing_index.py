@@ -0,0 +1,28 @@
+"""debt listing index
+
+Widens ``ix_debt_date`` to ``(date, id, amount)`` so the /deudas summary
+(count and sum, optionally by date or amount range) reads only the index.
+
+Revision ID: ef86703b6357
+Revises: cd9d068867bc
+Create Date: 2026-10-18 10:25:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef86703b6357'
+down_revision = 'cd9d068867bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_debt_date", table_name="debt")
+    op.create_index("ix_debt_date", "debt", ["date", "id", "amount"])
+
+
+def downgrade():
+    op.drop_index("ix_debt_date", table_name="debt")
+    op.create_index("ix_debt_date", "debt", ["date", "id"])
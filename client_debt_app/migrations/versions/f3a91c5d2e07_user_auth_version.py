@@ -0,0 +1,44 @@
+"""user auth version
+
+Adds ``user.auth_version``, which is stored in the session at login and
+bumped when the role changes, and widens ``password_hash`` to fit scrypt
+hashes (about 160 characters).
+
+Revision ID: f3a91c5d2e07
+Revises: ef86703b6357
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a91c5d2e07'
+down_revision = 'ef86703b6357'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user") as batch_op:
+        batch_op.add_column(
+            sa.Column("auth_version", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.alter_column(
+            "password_hash",
+            existing_type=sa.String(length=128),
+            type_=sa.String(length=255),
+            existing_nullable=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("user") as batch_op:
+        batch_op.alter_column(
+            "password_hash",
+            existing_type=sa.String(length=255),
+            type_=sa.String(length=128),
+            existing_nullable=False,
+        )
+        batch_op.drop_column("auth_version")
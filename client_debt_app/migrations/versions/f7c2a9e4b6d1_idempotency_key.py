@@ -0,0 +1,44 @@
+"""idempotency key
+
+Stores the result of each batch posted to /lote under the client's
+``Idempotency-Key`` so a retried request returns it instead of writing the
+entries twice.
+
+Revision ID: f7c2a9e4b6d1
+Revises: e2a7c5d9f1b3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2a9e4b6d1'
+down_revision = 'e2a7c5d9f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_key",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("key", sa.String(length=100), nullable=False),
+        sa.Column("request_hash", sa.String(length=64), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_idempotency_key_user_key", "idempotency_key", ["user_id", "key"], unique=True
+    )
+    op.create_index("ix_idempotency_key_created_at", "idempotency_key", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_idempotency_key_created_at", table_name="idempotency_key")
+    op.drop_index("ix_idempotency_key_user_key", table_name="idempotency_key")
+    op.drop_table("idempotency_key")
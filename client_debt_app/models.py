@@ -1,57 +1,179 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from sqlalchemy import text
+from sqlalchemy.types import Integer, TypeDecorator
 
 
 
 db = SQLAlchemy()
 
 
+class Cents(TypeDecorator):
+    """Money stored as an integer number of cents and exposed as ``Decimal``.
+
+    Sums and balance updates run on integers in the database, so they are
+    exact; floats are accepted on input and rounded to the cent.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
+
+    @property
+    def python_type(self):
+        return Decimal
+
+
+def to_cents(value) -> int:
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(value) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+def _same_amount(context):
+    return context.get_current_parameters()["amount"]
+
+
 class Client(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
-    document = db.Column(db.String(50), nullable=False, unique=True)
+    document = db.Column(db.String(50), nullable=False, unique=True, index=True)
     address = db.Column(db.String(200))
     phone = db.Column(db.String(20))
+    balance = db.Column(Cents, nullable=False, default=0, server_default="0")
+    debt_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    payment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_activity = db.Column(db.Date)
+    search_name = db.Column(db.String(120))
+    # bumped by every insert and update, ORM or Core, for /api/v1 delta syncs
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
     debts = db.relationship("Debt", backref="client", cascade="all, delete-orphan")
     payments = db.relationship("Payment", backref="client", cascade="all, delete-orphan")
     movements = db.relationship("Movement", backref="client", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index("ix_client_search_name", "search_name", "id"),
+        db.Index("ix_client_balance", "balance", "id"),
+        db.Index("ix_client_updated_at", "updated_at", "id"),
+    )
+
     @property
-    def total_debt(self) -> float:
-        debt_total = sum(d.amount for d in self.debts)
-        payment_total = sum(p.amount for p in self.payments)
-        return debt_total - payment_total
+    def total_debt(self) -> Decimal:
+        return self.balance or Decimal(0)
+
+
+class ClientToken(db.Model):
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), primary_key=True)
+    token = db.Column(db.String(60), primary_key=True)
+
+    __table_args__ = (db.Index("ix_client_token_token", "token", "client_id"),)
 
 
 class Debt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     date = db.Column(db.Date, nullable=False, default=date.today)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Cents, nullable=False)
     description = db.Column(db.String(200), nullable=False)
+    # part of the amount no payment covers yet, see allocation.py
+    outstanding = db.Column(Cents, nullable=False, default=_same_amount, server_default="0")
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    __table_args__ = (
+        db.Index("ix_debt_client_date", "client_id", "date", "id"),
+        db.Index("ix_debt_updated_at", "updated_at", "id"),
+        db.Index("ix_debt_date", "date", "id", "amount", "outstanding"),
+        # partial indexes: only open debts, which stay few as payments come in
+        db.Index(
+            "ix_debt_open",
+            "client_id",
+            "date",
+            "id",
+            sqlite_where=text("outstanding > 0"),
+            postgresql_where=text("outstanding > 0"),
+        ),
+        db.Index(
+            "ix_debt_open_date",
+            "date",
+            "id",
+            "client_id",
+            "outstanding",
+            sqlite_where=text("outstanding > 0"),
+            postgresql_where=text("outstanding > 0"),
+        ),
+    )
+
+
+METHOD_LABELS = {
+    "cash": "Efectivo",
+    "transfer": "Transferencia",
+    "other": "Otros",
+}
 
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     date = db.Column(db.Date, nullable=False, default=date.today)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Cents, nullable=False)
     method = db.Column(db.String(20), nullable=False, default="cash")
+    # credit left after covering every open debt of the client
+    unallocated = db.Column(Cents, nullable=False, default=_same_amount, server_default="0")
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    __table_args__ = (
+        db.Index("ix_payment_date_method", "date", "method"),
+        db.Index("ix_payment_client_date", "client_id", "date", "id"),
+        db.Index("ix_payment_updated_at", "updated_at", "id"),
+        db.Index(
+            "ix_payment_unallocated",
+            "client_id",
+            "date",
+            "id",
+            sqlite_where=text("unallocated > 0"),
+            postgresql_where=text("unallocated > 0"),
+        ),
+    )
 
     @property
     def method_label(self) -> str:
-        return {
-            "cash": "Efectivo",
-            "transfer": "Transferencia",
-            "other": "Otros",
-        }.get(self.method, self.method)
+        return METHOD_LABELS.get(self.method, self.method)
+
+
+class PaymentAllocation(db.Model):
+    """The part of a payment applied to one debt, oldest debts first."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey("payment.id"), nullable=False, index=True)
+    debt_id = db.Column(db.Integer, db.ForeignKey("debt.id"), nullable=False, index=True)
+    amount = db.Column(Cents, nullable=False)
 
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False, default="user")
+    # incremented on role changes; sessions issued for an older value are void
+    auth_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     movements = db.relationship("Movement", backref="user")
 
 
@@ -60,7 +182,138 @@ class Movement(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
     action = db.Column(db.String(50), nullable=False)
-    amount = db.Column(db.Float)
+    amount = db.Column(Cents)
     description = db.Column(db.String(200))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # position in the change feed, set by changes.py right before COMMIT
+    seq = db.Column(db.BigInteger)
+
+    __table_args__ = (
+        db.Index("ix_movement_action_timestamp", "action", "timestamp"),
+        db.Index("ix_movement_client_timestamp", "client_id", "timestamp"),
+        db.Index("ix_movement_timestamp", "timestamp", "id"),
+        db.Index("ix_movement_seq", "seq", unique=True),
+        db.Index(
+            "ix_movement_unsequenced",
+            "id",
+            sqlite_where=text("seq IS NULL"),
+            postgresql_where=text("seq IS NULL"),
+        ),
+    )
+
+
+
+class MovementArchive(db.Model):
+    """A closed month of movements moved to its own read-only SQLite file."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False, unique=True, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    # highest change-feed sequence in the file; the feed opens it only for
+    # consumers that are further behind
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CashSnapshot(db.Model):
+    """Cash register totals of one day, kept current by cash_register.record_cash.
+
+    Days up to the last close are frozen (``closed_at`` set) and never change.
+    """
+
+    day = db.Column(db.Date, primary_key=True)
+    cash = db.Column(Cents, nullable=False, default=0, server_default="0")
+    transfer = db.Column(Cents, nullable=False, default=0, server_default="0")
+    other = db.Column(Cents, nullable=False, default=0, server_default="0")
+    cash_income = db.Column(Cents, nullable=False, default=0, server_default="0")
+    cash_withdrawal = db.Column(Cents, nullable=False, default=0, server_default="0")
+    # cash in the register before and after the day
+    opening = db.Column(Cents, nullable=False, default=0, server_default="0")
+    closing = db.Column(Cents, nullable=False, default=0, server_default="0")
+    closed_at = db.Column(db.DateTime)
+    closed_by = db.Column(db.Integer, db.ForeignKey("user.id"))
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_cash_snapshot_closed",
+            "day",
+            sqlite_where=text("closed_at IS NOT NULL"),
+            postgresql_where=text("closed_at IS NOT NULL"),
+        ),
+        db.Index("ix_cash_snapshot_updated_at", "updated_at", "day"),
+    )
+
+
+class Job(db.Model):
+    """Work run outside the request by jobs.py; polled through /trabajos/<id>."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    # JSON
+    params = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(200))
+    # JSON
+    result = db.Column(db.Text)
+    # output file inside JOB_DIR
+    filename = db.Column(db.String(255))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    # "host:pid" of the process running it, see jobs.recover_jobs()
+    worker = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_job_status", "status", "id"),
+        db.Index("ix_job_user", "user_id", "id"),
+    )
+
+
+class IdempotencyKey(db.Model):
+    """Result of a batch posted to /lote, replayed when the same key is retried."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    key = db.Column(db.String(100), nullable=False)
+    # sha256 of the entries, so a reused key with another batch is refused
+    request_hash = db.Column(db.String(64), nullable=False)
+    # JSON
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_idempotency_key_user_key", "user_id", "key", unique=True),
+        db.Index("ix_idempotency_key_created_at", "created_at"),
+    )
+
+
+class ChangeCounter(db.Model):
+    """Single row holding the last sequence number handed to a movement."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    """Single row counting committed writes; cached pages and ETags are keyed on it."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FeedCheckpoint(db.Model):
+    """Last sequence a downstream consumer of the change feed confirmed."""
 
+    consumer = db.Column(db.String(100), primary_key=True)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from sqlalchemy import literal, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return the list of values stored in a cursor, or None if it is invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def page_size(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _coerce(column, value):
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return value
+
+
+def keyset_page(query, columns, cursor, limit: int, descending: bool = False):
+    """Apply keyset ordering and the cursor filter, fetch one page.
+
+    ``columns`` is the ordered sort key and must end with a unique column.
+    Returns ``(rows, last_row)`` where ``last_row`` is the row to build the
+    next cursor from, or None on the last page.
+    """
+    values = None
+    if cursor is not None and len(cursor) == len(columns):
+        try:
+            values = tuple_(
+                *[literal(_coerce(c, v), type_=c.type) for c, v in zip(columns, cursor)]
+            )
+        except ValueError:
+            pass
+    if values is not None:
+        key = tuple_(*columns)
+        query = query.filter(key < values if descending else key > values)
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1]
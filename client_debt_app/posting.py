@@ -0,0 +1,265 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from allocation import allocate
+from cash_register import PAYMENT_METHODS, last_closed_day, record_cash
+from ledger import record_batch
+from models import db, Client, Debt, IdempotencyKey, Movement, Payment, from_cents, to_cents
+
+ENTRY_TYPES = ("debt", "payment")
+MAX_BATCH_ENTRIES = 500
+MAX_KEY_LENGTH = 100
+
+
+class RowError(ValueError):
+    pass
+
+
+class BatchError(ValueError):
+    """The whole batch was rejected; ``errors`` holds ``(index, message)`` pairs."""
+
+    def __init__(self, errors: list):
+        super().__init__(f"{len(errors)} entradas con errores")
+        self.errors = errors
+
+
+class IdempotencyConflict(ValueError):
+    pass
+
+
+def parse_text(row, key, max_length, required=True) -> str:
+    value = row.get(key)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{key} es obligatorio")
+    if len(value) > max_length:
+        raise RowError(f"{key} supera {max_length} caracteres")
+    return value
+
+
+def parse_date(row) -> date:
+    value = row.get("date")
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return date.today()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f"fecha inválida: {value}")
+
+
+def parse_amount(row) -> Decimal:
+    value = row.get("amount")
+    if isinstance(value, str):
+        value = value.replace(",", ".")
+    try:
+        amount = Decimal(str(value))
+        # rounded like the Cents columns store it (half up)
+        amount = from_cents(to_cents(amount)) if amount.is_finite() else None
+    except (TypeError, ValueError, InvalidOperation):
+        amount = None
+    if amount is None:
+        raise RowError(f"monto inválido: {value}")
+    if amount < 0:
+        raise RowError("el monto no puede ser negativo")
+    return amount
+
+
+def write_entries(debts=(), payments=(), user_id=None) -> dict:
+    """Insert debts and payments with their movements, balances, allocations and cash.
+
+    Entries are dicts with ``client_id``, ``date``, ``amount`` and
+    ``description`` (debts) or ``method`` (payments). Every table is written
+    with one executemany statement in the current transaction; the caller
+    commits. Returns the new ids as ``{"debt": [...], "payment": [...]}``.
+    """
+    ids = {}
+    movements = []
+    clients = set()
+    for kind, model, action, entries in (
+        ("debt", Debt, "add_debt", debts),
+        ("payment", Payment, "add_payment", payments),
+    ):
+        ids[kind] = []
+        if not entries:
+            continue
+        ids[kind] = (
+            db.session.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True), list(entries)
+            )
+            .scalars()
+            .all()
+        )
+        per_client = {}
+        for entry in entries:
+            movements.append(
+                {
+                    "user_id": user_id,
+                    "client_id": entry["client_id"],
+                    "action": action,
+                    "amount": entry["amount"],
+                    "description": entry.get("description"),
+                }
+            )
+            total, count, day = per_client.get(entry["client_id"], (0, 0, entry["date"]))
+            per_client[entry["client_id"]] = (
+                total + entry["amount"],
+                count + 1,
+                max(day, entry["date"]),
+            )
+        record_batch(kind, per_client)
+        clients.update(per_client)
+    if movements:
+        db.session.execute(insert(Movement), movements)
+    allocate(clients)
+    per_day = {}
+    for entry in payments:
+        totals = per_day.setdefault(entry["date"], {})
+        totals[entry["method"]] = totals.get(entry["method"], 0) + entry["amount"]
+    record_cash(per_day)
+    return ids
+
+
+def _client_lookup(raw_entries) -> dict:
+    """Map the ids and documents named in the batch to client ids, in one query."""
+    ids, documents = set(), set()
+    for raw in raw_entries:
+        if not isinstance(raw, dict):
+            continue
+        if str(raw.get("client_id")).isdigit():
+            ids.add(int(raw["client_id"]))
+        elif raw.get("document"):
+            documents.add(str(raw["document"]).strip())
+    if not ids and not documents:
+        return {}
+    rows = db.session.execute(
+        select(Client.id, Client.document).where(
+            or_(Client.id.in_(ids), Client.document.in_(documents))
+        )
+    )
+    found = {}
+    for client_id, document in rows:
+        found[("id", client_id)] = client_id
+        found[("document", document)] = client_id
+    return found
+
+
+def prepare_batch(raw_entries) -> tuple:
+    """Validate every entry together; returns ``(debts, payments, order)`` or raises BatchError.
+
+    ``order`` lists ``(type, position)`` per entry so ids can be reported
+    in the order they were sent.
+    """
+    if not isinstance(raw_entries, list) or not raw_entries:
+        raise BatchError([(None, "el lote no tiene entradas")])
+    if len(raw_entries) > MAX_BATCH_ENTRIES:
+        raise BatchError([(None, f"el lote supera {MAX_BATCH_ENTRIES} entradas")])
+    clients = _client_lookup(raw_entries)
+    closed = last_closed_day()
+    debts, payments, order, errors = [], [], [], []
+    for index, raw in enumerate(raw_entries):
+        try:
+            if not isinstance(raw, dict):
+                raise RowError("entrada inválida")
+            kind = raw.get("type")
+            if kind not in ENTRY_TYPES:
+                raise RowError(f"tipo inválido: {kind}")
+            raw_id = raw.get("client_id")
+            if str(raw_id).isdigit():
+                client_id = clients.get(("id", int(raw_id)))
+            elif raw_id not in (None, ""):
+                raise RowError(f"client_id inválido: {raw_id}")
+            else:
+                client_id = clients.get(("document", parse_text(raw, "document", 50)))
+            if client_id is None:
+                raise RowError("cliente inexistente")
+            entry = {"client_id": client_id, "date": parse_date(raw), "amount": parse_amount(raw)}
+            if kind == "debt":
+                entry["description"] = parse_text(raw, "description", 200)
+            else:
+                entry["method"] = parse_text(raw, "method", 20, required=False) or "cash"
+                if entry["method"] not in PAYMENT_METHODS:
+                    raise RowError(f"método inválido: {entry['method']}")
+                if closed is not None and entry["date"] <= closed:
+                    raise RowError(
+                        f"la caja del {entry['date'].strftime('%d/%m/%Y')} ya está cerrada"
+                    )
+        except RowError as exc:
+            errors.append((index, str(exc)))
+            continue
+        target = debts if kind == "debt" else payments
+        order.append((kind, len(target)))
+        target.append(entry)
+    if errors:
+        raise BatchError(errors)
+    return debts, payments, order
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _stored_result(user_id, key: str, request_hash: str):
+    row = db.session.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.response).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        )
+    ).first()
+    if row is None:
+        return None
+    if row.request_hash != request_hash:
+        raise IdempotencyConflict("La clave de idempotencia ya se usó con otro lote")
+    return json.loads(row.response)
+
+
+def post_batch(raw_entries, user_id=None, key: str = None) -> tuple:
+    """Validate and write a batch of debts and payments in a single transaction.
+
+    With an idempotency ``key``, retries of the same batch return the first
+    result instead of writing again. Returns ``(result, replayed)``; raises
+    BatchError or IdempotencyConflict.
+    """
+    request_hash = fingerprint(raw_entries)
+    if key:
+        stored = _stored_result(user_id, key, request_hash)
+        if stored is not None:
+            return stored, True
+    debts, payments, order = prepare_batch(raw_entries)
+    ids = write_entries(debts, payments, user_id=user_id)
+    result = {
+        "debts": len(debts),
+        "payments": len(payments),
+        "entries": [{"type": kind, "id": ids[kind][position]} for kind, position in order],
+    }
+    if key:
+        db.session.add(
+            IdempotencyKey(
+                user_id=user_id, key=key, request_hash=request_hash, response=json.dumps(result)
+            )
+        )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # a concurrent retry with the same key committed first
+        stored = _stored_result(user_id, key, request_hash) if key else None
+        if stored is None:
+            raise
+        return stored, True
+    return result, False
+
+
+def purge_idempotency_keys(hours: int, now: datetime = None) -> int:
+    """Forget keys older than ``hours``; retries after that write again."""
+    limit = (now or datetime.utcnow()) - timedelta(hours=hours)
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < limit))
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,165 @@
+import os
+import re
+import tempfile
+from datetime import date, timedelta
+from flask_migrate import upgrade
+from sqlalchemy import event
+from database import check_scratch
+from models import db, User
+from pagination import encode_cursor
+
+# Requests whose queries must never fall back to a full table scan. Paths
+# use client 1, which the seed step below creates.
+def hot_requests():
+    today = date.today()
+    week_ago = today - timedelta(days=7)
+    return [
+        ("GET", "/", None),
+        ("GET", "/?q=perez", None),
+        ("GET", "/?q=12345", None),
+        ("GET", "/?q=AB-12", None),
+        ("GET", "/?sort=balance&dir=desc", None),
+        ("GET", "/?sort=document", None),
+        ("GET", "/client/1", None),
+        ("GET", f"/client/1?hasta={week_ago}", None),
+        ("GET", "/cash", None),
+        ("GET", f"/cash/cierre?start={week_ago}&end={today}", None),
+        ("GET", "/report", None),
+        ("GET", f"/report?start_date={week_ago}&end_date={today}", None),
+        ("GET", "/report?client_id=1", None),
+        ("GET", "/report/export?format=ndjson", None),
+        ("GET", "/deudas", None),
+        ("GET", f"/deudas?desde={week_ago}&monto_min=5", None),
+        ("GET", "/deudas?cliente=perez&pendientes=1", None),
+        ("GET", "/deudas?client_id=1", None),
+        ("GET", "/deudas/antiguedad", None),
+        ("GET", "/clientes/buscar?q=per", None),
+        ("GET", "/clientes/buscar?q=1234", None),
+        ("GET", "/deudas/nueva", None),
+        (
+            "POST",
+            "/deudas/nueva",
+            {"client_id": "1", "date": str(today), "amount": "3", "description": "plan"},
+        ),
+        # the first unfiltered page reads LIMIT rows in rowid order; later
+        # pages seek from the cursor
+        ("GET", f"/api/v1/clients?cursor={encode_cursor([1])}", None),
+        ("GET", f"/api/v1/clients?updated_since={week_ago}", None),
+        ("GET", "/api/v1/clients/1?fields=id,balance", None),
+        ("GET", f"/api/v1/balances?updated_since={week_ago}", None),
+        ("GET", "/api/v1/debts?client_id=1", None),
+        ("GET", f"/api/v1/debts?updated_since={week_ago}", None),
+        ("GET", f"/api/v1/payments?updated_since={week_ago}&fields=id,amount", None),
+        ("GET", "/api/v1/movements?client_id=1", None),
+        ("GET", f"/api/v1/movements?updated_since={week_ago}", None),
+        ("GET", f"/api/v1/cash?updated_since={week_ago}", None),
+        ("GET", "/api/v1/changes?after=2", None),
+        ("GET", "/api/v1/changes?consumer=plan", None),
+        ("GET", "/graficos/datos?bucket=day", None),
+        ("GET", "/graficos/datos?bucket=month", None),
+        ("POST", "/client/1/debts", {"date": str(today), "amount": "10", "description": "plan"}),
+        ("POST", "/client/1/payments", {"date": str(today), "amount": "5", "method": "cash"}),
+        (
+            "POST",
+            "/cash",
+            {"withdraw-amount": "1", "withdraw-description": "plan", "withdraw-submit": "Retirar"},
+        ),
+        (
+            "POST",
+            "/lote",
+            {
+                "rows-0-type": "debt",
+                "rows-0-client_id": "1",
+                "rows-0-amount": "4",
+                "rows-0-description": "plan",
+                "rows-1-type": "payment",
+                "rows-1-client_id": "2",
+                "rows-1-amount": "2",
+                "rows-1-method": "cash",
+            },
+        ),
+        ("POST", "/cash/cerrar", {"date": str(week_ago)}),
+    ]
+
+
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def _seed(client):
+    client.post("/client/new", data={"name": "José Pérez", "document": "12345678"})
+    client.post("/client/new", data={"name": "Ana Díaz", "document": "87654321"})
+    for day in range(3):
+        when = str(date.today() - timedelta(days=day))
+        client.post("/client/1/debts", data={"date": when, "amount": "100", "description": "seed"})
+        client.post("/client/1/payments", data={"date": when, "amount": "10", "method": "cash"})
+
+
+def check_query_plans(create_app, verbose=None) -> list:
+    """Run the hot requests against a scratch SQLite database.
+
+    Returns ``(method, path, sql, plan_line)`` for every statement whose
+    ``EXPLAIN QUERY PLAN`` contains a bare ``SCAN <table>`` on a real table.
+    """
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    # caching would hide the queries of repeated requests
+    app = create_app(
+        {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + path, "TESTING": True, "CACHE_BACKEND": "none"}
+    )
+    problems = []
+    try:
+        with app.app_context():
+            # the seed step writes rows and closes a cash day
+            check_scratch(db.engine, path)
+            upgrade()
+            admin = User(username="plan", password_hash="-", role="admin")
+            db.session.add(admin)
+            db.session.commit()
+            admin_id = admin.id
+            tables = set(db.metadata.tables)
+            engine = db.engine
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = admin_id
+            session["auth_version"] = 0
+        _seed(client)
+
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany:
+                captured.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            for method, url, data in hot_requests():
+                captured.clear()
+                response = client.open(url, method=method, data=data)
+                response.get_data()
+                statements = list(captured)
+                raw = engine.raw_connection()
+                try:
+                    cursor = raw.cursor()
+                    for statement, parameters in statements:
+                        if statement.lstrip().upper().startswith(("PRAGMA", "BEGIN", "COMMIT")):
+                            continue
+                        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                        details = [row[3] for row in cursor.fetchall()]
+                        if verbose:
+                            verbose(method, url, statement, details)
+                        for detail in details:
+                            match = _FULL_SCAN.match(detail)
+                            if match and match.group(1) in tables:
+                                problems.append((method, url, statement, detail))
+                finally:
+                    raw.close()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return problems
@@ -0,0 +1,287 @@
+import time
+from datetime import date, timedelta
+from sqlalchemy import Integer, bindparam, case, cast, func, literal, select, type_coerce, update
+from archive import archived_totals
+from cash_register import CASH_ACTIONS, PAYMENT_METHODS, SNAPSHOT_COLUMNS, snapshot_range
+from models import db, Client, Debt, Payment, Movement, from_cents
+
+EPOCH = date(1970, 1, 1)
+CHUNK_ROWS = 200_000
+NO_DAY = -1
+
+
+def _numpy():
+    """NumPy if it is installed; without it reconcile() sums in plain Python."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _day_number(column, timestamp: bool = False):
+    """Days since 1970-01-01 as an integer, NULL mapped to ``NO_DAY``."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        day = cast(column, db.Date) if timestamp else column
+        number = type_coerce(day - literal(EPOCH), Integer)
+    else:
+        number = cast(func.julianday(column) - 2440587.5, Integer)
+    return func.coalesce(number, NO_DAY)
+
+
+def _cents(column):
+    return type_coerce(column, Integer)
+
+
+def _code(column, values):
+    return case(*[(column == value, index) for index, value in enumerate(values)], else_=-1)
+
+
+def _queries() -> tuple:
+    """Clients, debts, payments and cash movements, every column an integer."""
+    return (
+        select(
+            Client.id,
+            _cents(Client.balance),
+            Client.debt_count,
+            Client.payment_count,
+            _day_number(Client.last_activity),
+        ).order_by(Client.id),
+        select(Debt.client_id, _cents(Debt.amount), _day_number(Debt.date)),
+        select(
+            Payment.client_id,
+            _cents(Payment.amount),
+            _day_number(Payment.date),
+            _code(Payment.method, PAYMENT_METHODS),
+        ),
+        select(
+            _cents(Movement.amount),
+            _day_number(Movement.timestamp, timestamp=True),
+            _code(Movement.action, CASH_ACTIONS),
+        ).where(Movement.action.in_(CASH_ACTIONS)),
+    )
+
+
+def _chunks(query):
+    """Run ``query`` and yield its rows as lists of plain tuples.
+
+    Rows are read from the DBAPI cursor: building SQLAlchemy rows costs more
+    than the whole aggregation.
+    """
+    sql = str(query.compile(db.session.get_bind(), compile_kwargs={"literal_binds": True}))
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(sql)
+        while True:
+            chunk = cursor.fetchmany(CHUNK_ROWS)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cursor.close()
+
+
+def _arrays(np, query, width: int) -> list:
+    """Run ``query`` in chunks and return one int64 array per selected column."""
+    parts = [np.array(chunk, dtype=np.int64).reshape(-1, width) for chunk in _chunks(query)]
+    block = np.concatenate(parts) if parts else np.empty((0, width), dtype=np.int64)
+    return [block[:, i] for i in range(width)]
+
+
+def _sum_by(np, index, weights, size: int):
+    # float64 bincount is exact while totals stay below 2**53 cents
+    return np.rint(np.bincount(index, weights=weights, minlength=size)).astype(np.int64)
+
+
+def _per_client(np, ids, client_ids, cents, days):
+    index = np.searchsorted(ids, client_ids)
+    total = _sum_by(np, index, cents, len(ids))
+    count = np.bincount(index, minlength=len(ids))
+    last = np.full(len(ids), NO_DAY, dtype=np.int64)
+    np.maximum.at(last, index, days)
+    return total, count, last
+
+
+def _grouped(np, days, codes, cents, labels) -> dict:
+    """Sum ``cents`` per ``(day, code)``; returns ``{day: {label: cents}}``."""
+    valid = codes >= 0
+    keys = days[valid] * len(labels) + codes[valid]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = _sum_by(np, inverse, cents[valid], len(unique))
+    grouped = {}
+    for key, total in zip(unique.tolist(), sums.tolist()):
+        day = EPOCH + timedelta(days=key // len(labels))
+        grouped.setdefault(day, {})[labels[key % len(labels)]] = total
+    return grouped
+
+
+def _totals_numpy(np) -> tuple:
+    """``(ledger, recomputed, wrong, cash, rows)`` aggregated with NumPy arrays.
+
+    ``ledger`` holds the client ids and their stored balance, debt count,
+    payment count and last activity, one column each; ``recomputed`` the
+    same four columns from the raw rows and ``wrong`` the positions where
+    they differ.
+    """
+    clients, debts, payments, movements = _queries()
+    ids, balance, debt_count, payment_count, last_activity = _arrays(np, clients, 5)
+    debt_client, debt_cents, debt_day = _arrays(np, debts, 3)
+    pay_client, pay_cents, pay_day, pay_method = _arrays(np, payments, 4)
+    cash_cents, cash_day, cash_action = _arrays(np, movements, 3)
+
+    debt_total, expected_debts, last_debt = _per_client(np, ids, debt_client, debt_cents, debt_day)
+    pay_total, expected_payments, last_payment = _per_client(np, ids, pay_client, pay_cents, pay_day)
+    expected_balance = debt_total - pay_total
+    expected_last = np.maximum(last_debt, last_payment)
+    wrong = np.flatnonzero(
+        (balance != expected_balance)
+        | (debt_count != expected_debts)
+        | (payment_count != expected_payments)
+        | (last_activity != expected_last)
+    )
+    ledger = (ids, balance, debt_count, payment_count, last_activity)
+    recomputed = (expected_balance, expected_debts, expected_payments, expected_last)
+    cash = _grouped(np, pay_day, pay_method, pay_cents, PAYMENT_METHODS)
+    for day, totals in _grouped(np, cash_day, cash_action, cash_cents, CASH_ACTIONS).items():
+        cash.setdefault(day, {}).update(totals)
+    rows = len(debt_client) + len(pay_client) + len(cash_cents)
+    return ledger, recomputed, wrong, cash, rows
+
+
+def _columns(rows: list, width: int) -> tuple:
+    return tuple(zip(*rows)) if rows else ((),) * width
+
+
+def _totals_python() -> tuple:
+    """Same result as _totals_numpy(), summed row by row with dicts."""
+    clients, debts, payments, movements = _queries()
+    stored = {}
+    for chunk in _chunks(clients):
+        for client_id, *values in chunk:
+            stored[client_id] = values
+    # debt total, debt count, payment total, payment count, last day
+    sums = {client_id: [0, 0, 0, 0, NO_DAY] for client_id in stored}
+    cash = {}
+    rows = 0
+
+    def add_cash(day, label, cents):
+        totals = cash.setdefault(EPOCH + timedelta(days=day), {})
+        totals[label] = totals.get(label, 0) + cents
+
+    for chunk in _chunks(debts):
+        rows += len(chunk)
+        for client_id, cents, day in chunk:
+            item = sums[client_id]
+            item[0] += cents
+            item[1] += 1
+            item[4] = max(item[4], day)
+    for chunk in _chunks(payments):
+        rows += len(chunk)
+        for client_id, cents, day, method in chunk:
+            item = sums[client_id]
+            item[2] += cents
+            item[3] += 1
+            item[4] = max(item[4], day)
+            if method >= 0:
+                add_cash(day, PAYMENT_METHODS[method], cents)
+    for chunk in _chunks(movements):
+        rows += len(chunk)
+        for cents, day, action in chunk:
+            if action >= 0:
+                add_cash(day, CASH_ACTIONS[action], cents)
+
+    ids = list(stored)
+    recomputed = {
+        client_id: [debt_total - pay_total, debt_count, payment_count, last]
+        for client_id, (debt_total, debt_count, pay_total, payment_count, last) in sums.items()
+    }
+    wrong = [i for i, client_id in enumerate(ids) if stored[client_id] != recomputed[client_id]]
+    ledger = (ids, *_columns([stored[i] for i in ids], 4))
+    return ledger, _columns([recomputed[i] for i in ids], 4), wrong, cash, rows
+
+
+def reconcile() -> dict:
+    """Recompute client balances and daily cash totals from the raw rows.
+
+    Debts, payments and cash movements are each read once as integer rows
+    and aggregated with NumPy, or in plain Python when it is not installed.
+    Client results are compared with the stored ledger columns, cash
+    results with the daily cash snapshots.
+    """
+    np = _numpy()
+    started = time.perf_counter()
+    ledger, recomputed, wrong, cash, rows = (
+        _totals_numpy(np) if np is not None else _totals_python()
+    )
+    ids, balance, debt_count, payment_count, _ = ledger
+    expected_balance, expected_debts, expected_payments, expected_last = recomputed
+    drift = [
+        {
+            "client_id": int(ids[i]),
+            "balance": from_cents(balance[i]),
+            "expected_balance": from_cents(expected_balance[i]),
+            "debt_count": int(debt_count[i]),
+            "expected_debt_count": int(expected_debts[i]),
+            "payment_count": int(payment_count[i]),
+            "expected_payment_count": int(expected_payments[i]),
+            "expected_last_activity": (
+                EPOCH + timedelta(days=int(expected_last[i])) if expected_last[i] != NO_DAY else None
+            ),
+        }
+        for i in wrong
+    ]
+
+    for day, action, total in archived_totals(actions=CASH_ACTIONS, by_day=True):
+        totals = cash.setdefault(day, {})
+        totals[action] = totals.get(action, 0) + int(total * 100)
+    # compared against the daily cash snapshots, which the cash views read
+    cash_mismatch = []
+    if cash:
+        stored = {row["day"]: row for row in snapshot_range(min(cash), max(cash))}
+        for day in sorted(cash.keys() | stored.keys()):
+            totals, row = cash.get(day, {}), stored.get(day, {})
+            for key in SNAPSHOT_COLUMNS:
+                expected = from_cents(totals.get(key, 0))
+                if expected != row.get(key, 0):
+                    cash_mismatch.append((day, key, expected, row.get(key, 0)))
+
+    return {
+        "clients": len(ids),
+        "rows": rows,
+        "drift": drift,
+        "days": len(cash),
+        "cash_mismatch": cash_mismatch,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def fix_drift(drift: list) -> int:
+    """Write the recomputed ledger columns of the drifted clients in one executemany."""
+    if not drift:
+        return 0
+    table = Client.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            {
+                table.c.balance: bindparam("b_balance", type_=table.c.balance.type),
+                table.c.debt_count: bindparam("b_debts"),
+                table.c.payment_count: bindparam("b_payments"),
+                table.c.last_activity: bindparam("b_last", type_=db.Date),
+            }
+        ),
+        [
+            {
+                "b_id": item["client_id"],
+                "b_balance": item["expected_balance"],
+                "b_debts": item["expected_debt_count"],
+                "b_payments": item["expected_payment_count"],
+                "b_last": item["expected_last_activity"],
+            }
+            for item in drift
+        ],
+    )
+    db.session.commit()
+    return len(drift)
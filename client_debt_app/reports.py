@@ -0,0 +1,162 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import func, select, tuple_
+from archive import archived_rows, archived_totals
+from models import db, Client, Movement
+from pagination import keyset_page
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "timestamp", "client_id", "client", "action", "amount", "description", "user_id")
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _filter_date(value: str, label: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise FilterError(f"{label} inválida: {value}") from None
+
+
+def parse_filters(start_date_str, end_date_str, client_id_str):
+    """Read the report query string.
+
+    Returns ``(filters, conditions)``: the ``start``/``end``/``client_id``
+    values, also used to pick archived months, and the SQL conditions on
+    Movement. The end date is inclusive: it covers the whole day up to midnight.
+    Raises FilterError for a malformed date or client id.
+    """
+    filters = {"start": None, "end": None, "client_id": None}
+    conditions = []
+    if start_date_str:
+        filters["start"] = _filter_date(start_date_str, "Fecha desde")
+        conditions.append(Movement.timestamp >= filters["start"])
+    if end_date_str:
+        filters["end"] = _filter_date(end_date_str, "Fecha hasta") + timedelta(days=1)
+        conditions.append(Movement.timestamp < filters["end"])
+    if client_id_str:
+        if not str(client_id_str).isdigit():
+            raise FilterError(f"Cliente inválido: {client_id_str}")
+        filters["client_id"] = int(client_id_str)
+        conditions.append(Movement.client_id == filters["client_id"])
+    return filters, conditions
+
+
+REPORT_ACTIONS = ("add_debt", "add_payment")
+
+
+def report_totals(filters, conditions) -> dict:
+    rows = db.session.execute(
+        select(Movement.action, func.coalesce(func.sum(Movement.amount), 0))
+        .where(*conditions, Movement.action.in_(REPORT_ACTIONS))
+        .group_by(Movement.action)
+    )
+    totals = {"add_debt": 0, "add_payment": 0}
+    totals.update({action: total for action, total in rows})
+    for _, action, total in archived_totals(actions=REPORT_ACTIONS, **filters):
+        totals[action] += total
+    return totals
+
+
+def _row_columns():
+    return (
+        Movement.id,
+        Movement.timestamp,
+        Movement.client_id,
+        Client.name.label("client"),
+        Movement.action,
+        Movement.amount,
+        Movement.description,
+        Movement.user_id,
+    )
+
+
+def _cursor_key(cursor):
+    try:
+        return datetime.fromisoformat(cursor[0]), int(cursor[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def movement_page(filters, conditions, cursor, limit: int):
+    """One report page, newest first, over the movement table and then the archives.
+
+    Archived months are always older than the rows still in the table, so
+    the archives are only read once the table has no more rows to give.
+    """
+    query = (
+        db.session.query(*_row_columns())
+        .outerjoin(Client, Movement.client_id == Client.id)
+        .filter(*conditions)
+    )
+    rows, last = keyset_page(query, [Movement.timestamp, Movement.id], cursor, limit, descending=True)
+    if last is not None:
+        return rows, last
+    if rows:
+        before = (rows[-1].timestamp, rows[-1].id)
+    else:
+        before = _cursor_key(cursor) if cursor else None
+    rows += islice(archived_rows(before=before, **filters), limit + 1 - len(rows))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1]
+
+
+def iter_movements(filters, conditions, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield movement rows newest first, fetching one keyset batch at a time.
+
+    Archived months follow once the movement table is exhausted.
+    """
+    base = (
+        select(*_row_columns())
+        .outerjoin(Client, Movement.client_id == Client.id)
+        .where(*conditions)
+        .order_by(Movement.timestamp.desc(), Movement.id.desc())
+        .limit(batch_size)
+    )
+    last = None
+    while True:
+        query = base
+        if last is not None:
+            query = query.where(
+                tuple_(Movement.timestamp, Movement.id) < tuple_(last.timestamp, last.id)
+            )
+        batch = db.session.execute(query).all()
+        yield from batch
+        if len(batch) < batch_size:
+            break
+        last = batch[-1]
+        db.session.expire_all()
+    yield from archived_rows(**filters)
+
+
+def _row_dict(row) -> dict:
+    data = row._asdict()
+    data["timestamp"] = row.timestamp.isoformat(sep=" ", timespec="seconds")
+    return data
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        data = _row_dict(row)
+        writer.writerow([data[column] if data[column] is not None else "" for column in EXPORT_COLUMNS])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        # money as exact decimal strings, like /api/v1
+        yield json.dumps(_row_dict(row), ensure_ascii=False, default=str) + "\n"
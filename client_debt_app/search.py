@@ -0,0 +1,124 @@
+import re
+import unicodedata
+from sqlalchemy import and_, bindparam, delete, insert, or_, select, update
+from models import db, Client, ClientToken
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+_DIGIT_SEPARATORS = re.compile(r"[\s.\-/()+]+")
+MAX_TOKEN_LENGTH = 60
+SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 20
+
+
+def normalize(value) -> str:
+    """Lowercase, fold accents (Pérez -> perez) and collapse punctuation."""
+    if not value:
+        return ""
+    folded = unicodedata.normalize("NFKD", str(value))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(_SEPARATORS.split(folded.lower())).strip()
+
+
+def _compact(value) -> str:
+    """Documents and phones are matched without dots, dashes or spaces."""
+    return normalize(_DIGIT_SEPARATORS.sub("", value or ""))
+
+
+def client_tokens(name, document, phone) -> set:
+    tokens = set(normalize(name).split())
+    for value in (document, phone):
+        compact = _compact(value).replace(" ", "")
+        if compact:
+            tokens.add(compact)
+    return {t[:MAX_TOKEN_LENGTH] for t in tokens if t}
+
+
+def index_client(client) -> None:
+    """Refresh the search name and prefix tokens of a flushed client."""
+    client.search_name = normalize(client.name)
+    db.session.execute(delete(ClientToken).where(ClientToken.client_id == client.id))
+    rows = [
+        {"client_id": client.id, "token": token}
+        for token in client_tokens(client.name, client.document, client.phone)
+    ]
+    if rows:
+        db.session.execute(insert(ClientToken), rows)
+
+
+def reindex_clients(batch_size: int = 1000) -> int:
+    """Rebuild search names and tokens for every client."""
+    db.session.execute(delete(ClientToken))
+    count = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(Client.id, Client.name, Client.document, Client.phone)
+            .where(Client.id > last_id)
+            .order_by(Client.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        tokens = []
+        names = []
+        for row in batch:
+            names.append({"b_id": row.id, "b_search_name": normalize(row.name)})
+            tokens.extend(
+                {"client_id": row.id, "token": token}
+                for token in client_tokens(row.name, row.document, row.phone)
+            )
+        db.session.execute(
+            update(Client.__table__)
+            .where(Client.__table__.c.id == bindparam("b_id"))
+            .values(search_name=bindparam("b_search_name")),
+            names,
+        )
+        if tokens:
+            db.session.execute(insert(ClientToken), tokens)
+        count += len(batch)
+        last_id = batch[-1].id
+    db.session.commit()
+    return count
+
+
+def _prefix(column, prefix: str):
+    # A range instead of LIKE so the (token) index is used on every backend.
+    return and_(column >= prefix, column < prefix + "\uffff")
+
+
+def _token_match(prefix: str):
+    return Client.id.in_(
+        select(ClientToken.client_id).where(_prefix(ClientToken.token, prefix[:MAX_TOKEN_LENGTH]))
+    )
+
+
+def search_condition(q: str):
+    """Condition on Client.id matching every word of ``q`` as a token prefix.
+
+    A query with digits is also tried without punctuation, the way documents
+    and phones are indexed, so ``X-99`` finds ``X-999``.
+    """
+    words = set(normalize(q).split())
+    compact = _compact(q).replace(" ", "")
+    if compact and compact not in words and compact.isdigit():
+        words = {compact}
+    if not words:
+        return None
+    condition = and_(*[_token_match(word) for word in words])
+    if len(words) > 1 and any(ch.isdigit() for ch in compact):
+        condition = or_(condition, _token_match(compact))
+    return condition
+
+
+def suggest_clients(q: str, limit: int = SUGGEST_LIMIT) -> list:
+    """First clients by name whose name or document starts like ``q``, for pickers."""
+    condition = search_condition(q)
+    if condition is None:
+        return []
+    rows = db.session.execute(
+        select(Client.id, Client.name, Client.document)
+        .where(condition)
+        .order_by(Client.search_name, Client.id)
+        .limit(max(1, min(limit, MAX_SUGGEST_LIMIT)))
+    )
+    return [{"id": row.id, "name": row.name, "document": row.document} for row in rows]
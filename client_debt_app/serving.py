@@ -0,0 +1,99 @@
+import threading
+from sqlalchemy import select
+from models import db, User
+from jobs import recover_jobs, shutdown_jobs
+from metrics import flush_metrics, reset_metrics
+from settings import apply_defaults
+
+DEFAULTS = {
+    # 0 skips warm_up() when wsgi.py is loaded
+    "WARM_UP": 1,
+    # GET pages requested once per worker, as the first admin, to fill caches
+    "WARM_UP_PATHS": "/,/cash,/deudas,/report,/graficos/datos?bucket=month,/api/v1/clients",
+}
+
+# set when the process is asked to stop; event streams end at their next poll
+stopping = threading.Event()
+
+
+def init_serving(app) -> None:
+    apply_defaults(app, DEFAULTS)
+
+
+def recover(app) -> int:
+    """Fail the jobs left running by dead processes, see jobs.recover_jobs()."""
+    with app.app_context():
+        try:
+            return recover_jobs()
+        except Exception as exc:
+            app.logger.warning("Trabajos sin revisar, no hay base de datos: %s", exc)
+            return 0
+        finally:
+            db.session.remove()
+
+
+def warm_up(app) -> dict:
+    """Get a fresh worker ready before its first real request.
+
+    Compiles every template, opens DB_POOL_SIZE pooled connections (which
+    runs the SQLite pragmas) and requests WARM_UP_PATHS, filling the caches
+    and SQLAlchemy's statement cache. A database without tables or users
+    only skips the steps that need them. Returns what was done.
+    """
+    done = {"templates": 0, "connections": 0, "pages": 0}
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+        done["templates"] += 1
+    with app.app_context():
+        connections = []
+        try:
+            for _ in range(app.config["DB_POOL_SIZE"]):
+                connection = db.engine.connect()
+                connections.append(connection)
+                connection.exec_driver_sql("SELECT 1")
+            done["connections"] = len(connections)
+            admin = db.session.execute(
+                select(User.id, User.auth_version).where(User.role == "admin").order_by(User.id)
+            ).first()
+        except Exception as exc:
+            app.logger.warning("Precalentamiento sin base de datos: %s", exc)
+            admin = None
+        finally:
+            for connection in connections:
+                connection.close()
+            db.session.remove()
+    if admin is None:
+        return done
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = admin.id
+        session["auth_version"] = admin.auth_version
+    for path in filter(None, (path.strip() for path in app.config["WARM_UP_PATHS"].split(","))):
+        status = client.get(path).status_code
+        if status >= 400:
+            app.logger.warning("Precalentamiento: %s respondió %s", path, status)
+        else:
+            done["pages"] += 1
+    # warm-up requests are not traffic
+    reset_metrics()
+    return done
+
+
+def begin_shutdown() -> None:
+    """Ask open event streams to finish so in-flight requests drain quickly."""
+    stopping.set()
+
+
+def shutdown(app, wait: bool = True) -> None:
+    """Stop this process cleanly after its last request.
+
+    Ends event streams, lets running jobs finish (``wait``) while jobs that
+    had not started stay queued for ``flask run-jobs``, writes the last
+    metrics to METRICS_DIR and closes the pooled connections.
+    """
+    begin_shutdown()
+    shutdown_jobs(wait)
+    if app.config["METRICS_DIR"]:
+        flush_metrics(app.config["METRICS_DIR"])
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,12 @@
+import os
+
+
+def apply_defaults(app, defaults: dict) -> None:
+    """Fill in ``defaults`` without overriding the config passed to create_app().
+
+    An environment variable named like the key replaces the default and is
+    converted to the default's type.
+    """
+    for key, default in defaults.items():
+        value = os.environ.get(key)
+        app.config.setdefault(key, type(default)(value) if value is not None else default)
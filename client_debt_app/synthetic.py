@@ -0,0 +1,194 @@
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import func, insert, select
+from allocation import allocate
+from cash_register import rebuild_cash_snapshots
+from ledger import record_batch
+from models import db, Client, ClientToken, Debt, Payment, Movement, from_cents
+from search import client_tokens, normalize
+
+# Named sizes, as the number of debts. Clients, payments and cash movements
+# are derived from it by scale_sizes().
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+INSERT_CHUNK = 5000
+
+FIRST_NAMES = (
+    "José", "María", "Juan", "Ana", "Luis", "Carmen", "Jorge", "Lucía", "Pedro", "Sofía",
+    "Miguel", "Laura", "Diego", "Valentina", "Carlos", "Martina", "Pablo", "Julieta",
+)
+LAST_NAMES = (
+    "Pérez", "Gómez", "Rodríguez", "Fernández", "López", "Díaz", "Martínez", "Sánchez",
+    "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Acosta", "Benítez",
+)
+DESCRIPTIONS = (
+    "Compra de mercadería", "Préstamo", "Servicio de internet", "Fiado almacén",
+    "Cuota", "Reparación", "Materiales", "Adelanto",
+)
+PAYMENT_METHODS = ("cash", "cash", "cash", "transfer", "transfer", "other")
+
+
+def scale_sizes(debts: int) -> dict:
+    return {
+        "clients": max(10, debts // 20),
+        "debts": debts,
+        "payments": debts // 2,
+        "cash": max(1, debts // 100),
+    }
+
+
+class _Writer:
+    """Buffers rows per model and inserts them with executemany in chunks."""
+
+    def __init__(self):
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, model, row) -> None:
+        rows = self.rows.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= INSERT_CHUNK:
+            self.flush(model)
+
+    def flush(self, model=None) -> None:
+        for current in [model] if model is not None else list(self.rows):
+            rows = self.rows.get(current)
+            if rows:
+                db.session.execute(insert(current), rows)
+                table = current.__tablename__
+                self.counts[table] = self.counts.get(table, 0) + len(rows)
+                rows.clear()
+
+
+def _timestamp(rng, day: date) -> datetime:
+    return datetime.combine(day, time(rng.randrange(8, 21), rng.randrange(60), rng.randrange(60)))
+
+
+def generate(debts: int, seed: int = 0, days: int = 365, user_id=None, today: date = None) -> dict:
+    """Insert a reproducible synthetic data set sized by the number of debts.
+
+    The same ``seed`` always produces the same rows. Client balances are
+    written through :func:`ledger.record_batch`, payments are allocated like
+    in the app and the daily cash snapshots are rebuilt, so the result passes
+    ``flask reconcile``. Returns the inserted row count per table.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    sizes = scale_sizes(debts)
+    writer = _Writer()
+
+    # documents continue after the existing ids so repeated runs do not collide
+    offset = db.session.execute(select(func.coalesce(func.max(Client.id), 0))).scalar()
+    clients = []
+    for n in range(sizes["clients"]):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        clients.append(
+            {
+                "name": name,
+                "document": str(20_000_000 + offset + n),
+                "phone": f"09{rng.randrange(10_000_000):07d}",
+                "search_name": normalize(name),
+            }
+        )
+    client_ids = []
+    for start in range(0, len(clients), INSERT_CHUNK):
+        chunk = clients[start:start + INSERT_CHUNK]
+        created = db.session.execute(
+            insert(Client).returning(Client.id, sort_by_parameter_order=True), chunk
+        ).scalars().all()
+        client_ids.extend(created)
+        for client_id, data in zip(created, chunk):
+            for token in client_tokens(data["name"], data["document"], data["phone"]):
+                writer.add(ClientToken, {"client_id": client_id, "token": token})
+            writer.add(
+                Movement,
+                {
+                    "user_id": user_id,
+                    "client_id": client_id,
+                    "action": "create_client",
+                    "description": f"Cliente {data['name']} creado",
+                    "timestamp": _timestamp(rng, today - timedelta(days=days)),
+                },
+            )
+    writer.counts["client"] = len(client_ids)
+
+    def pick_client():
+        # skewed towards the first clients, like real debtors
+        return client_ids[int(len(client_ids) * rng.random() ** 2)]
+
+    def pick_day():
+        return today - timedelta(days=rng.randrange(days))
+
+    per_debt, per_payment, outstanding = {}, {}, {}
+    for _ in range(sizes["debts"]):
+        client_id, day, cents = pick_client(), pick_day(), rng.randint(100, 50_000)
+        amount, description = from_cents(cents), rng.choice(DESCRIPTIONS)
+        writer.add(
+            Debt,
+            {"client_id": client_id, "date": day, "amount": amount, "description": description},
+        )
+        writer.add(
+            Movement,
+            {
+                "user_id": user_id,
+                "client_id": client_id,
+                "action": "add_debt",
+                "amount": amount,
+                "description": description,
+                "timestamp": _timestamp(rng, day),
+            },
+        )
+        total, count, last = per_debt.get(client_id, (0, 0, day))
+        per_debt[client_id] = (total + cents, count + 1, max(last, day))
+        outstanding[client_id] = outstanding.get(client_id, 0) + cents
+
+    for _ in range(sizes["payments"]):
+        client_id = pick_client()
+        for _ in range(10):
+            if outstanding.get(client_id, 0) >= 100:
+                break
+            client_id = pick_client()
+        cents = max(1, min(rng.randint(100, 30_000), outstanding.get(client_id, 0)))
+        outstanding[client_id] = outstanding.get(client_id, 0) - cents
+        day, method, amount = pick_day(), rng.choice(PAYMENT_METHODS), from_cents(cents)
+        writer.add(
+            Payment, {"client_id": client_id, "date": day, "amount": amount, "method": method}
+        )
+        writer.add(
+            Movement,
+            {
+                "user_id": user_id,
+                "client_id": client_id,
+                "action": "add_payment",
+                "amount": amount,
+                "timestamp": _timestamp(rng, day),
+            },
+        )
+        total, count, last = per_payment.get(client_id, (0, 0, day))
+        per_payment[client_id] = (total + cents, count + 1, max(last, day))
+
+    for _ in range(sizes["cash"]):
+        action = rng.choice(("cash_income", "cash_withdrawal"))
+        writer.add(
+            Movement,
+            {
+                "user_id": user_id,
+                "action": action,
+                "amount": from_cents(rng.randint(500, 20_000)),
+                "description": "Ingreso" if action == "cash_income" else "Retiro",
+                "timestamp": _timestamp(rng, pick_day()),
+            },
+        )
+
+    writer.flush()
+    for kind, per_client in (("debt", per_debt), ("payment", per_payment)):
+        record_batch(
+            kind,
+            {
+                client_id: (from_cents(total), count, last)
+                for client_id, (total, count, last) in per_client.items()
+            },
+        )
+    allocate(client_ids)
+    db.session.commit()
+    rebuild_cash_snapshots()
+    return writer.counts
@@ -0,0 +1,10 @@
+from app import app
+from serving import recover, warm_up
+
+# Entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app
+# Every worker imports this module itself (the app is not preloaded), so
+# each one builds its own pool and caches and warms them up. The worker
+# that replaces a killed one also fails the jobs it left running.
+recover(app)
+if app.config["WARM_UP"]:
+    warm_up(app)
@@ -0,0 +1,70 @@
+import pytest
+from flask import g
+from flask.testing import FlaskClient
+from flask_migrate import upgrade
+from app import create_app
+from database import check_scratch
+from models import db, Client, User
+
+
+class RequestClient(FlaskClient):
+    """Test client whose requests start with an empty ``g``.
+
+    They run inside the test's app context, which would otherwise carry the
+    per-request caches (user, data version) from one request to the next.
+    """
+
+    def open(self, *args, **kwargs):
+        g.__dict__.clear()
+        return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a migrated scratch SQLite database, inside its app context."""
+    path = str(tmp_path / "test.db")
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path,
+            "TESTING": True,
+            # caching would hide writes between the requests of one test
+            "CACHE_BACKEND": "none",
+            "JOB_WORKERS": 0,
+            "JOB_DIR": str(tmp_path / "jobs"),
+            "ARCHIVE_DIR": str(tmp_path / "archive"),
+            "WARM_UP": 0,
+        }
+    )
+    app.test_client_class = RequestClient
+    with app.app_context():
+        check_scratch(db.engine, path)
+        upgrade()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def admin(app):
+    user = User(username="admin", password_hash="-", role="admin")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, admin):
+    """A test client logged in as ``admin``."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = admin.id
+        session["auth_version"] = admin.auth_version
+    return client
+
+
+@pytest.fixture
+def customer(app):
+    customer = Client(name="Ana Pérez", document="12345678")
+    db.session.add(customer)
+    db.session.commit()
+    return customer
@@ -0,0 +1,69 @@
+from decimal import Decimal
+from allocation import find_allocation_drift, rebuild_allocations
+from models import db, Client, Debt, Payment, PaymentAllocation
+from posting import post_batch
+
+
+def _post(customer, *entries):
+    result, _ = post_batch([dict(entry, client_id=customer.id) for entry in entries])
+    return [entry["id"] for entry in result["entries"]]
+
+
+def _debt(day, amount):
+    return {"type": "debt", "date": day, "amount": amount, "description": "Fiado"}
+
+
+def _payment(day, amount):
+    return {"type": "payment", "date": day, "amount": amount}
+
+
+def _state():
+    debts = db.session.execute(db.select(Debt.id, Debt.outstanding).order_by(Debt.id)).all()
+    payments = db.session.execute(
+        db.select(Payment.id, Payment.unallocated).order_by(Payment.id)
+    ).all()
+    return [tuple(row) for row in debts], [tuple(row) for row in payments]
+
+
+def test_payments_settle_the_oldest_debts_first(customer):
+    newer, older = _post(customer, _debt("2026-03-02", "50"), _debt("2026-03-01", "100"))
+    (first,) = _post(customer, _payment("2026-03-05", "120"))
+    debts, payments = _state()
+    assert dict(debts) == {older: Decimal("0.00"), newer: Decimal("30.00")}
+    assert payments == [(first, Decimal("0.00"))]
+
+    (second,) = _post(customer, _payment("2026-03-06", "40"))
+    debts, payments = _state()
+    assert dict(debts) == {older: Decimal("0.00"), newer: Decimal("0.00")}
+    assert dict(payments) == {first: Decimal("0.00"), second: Decimal("10.00")}
+    assert db.session.get(Client, customer.id).balance == Decimal("-10.00")
+    assert find_allocation_drift() == []
+
+
+def test_credit_goes_to_a_debt_added_later(customer):
+    (payment,) = _post(customer, _payment("2026-03-01", "30"))
+    (debt,) = _post(customer, _debt("2026-03-02", "45.50"))
+    assert _state() == ([(debt, Decimal("15.50"))], [(payment, Decimal("0.00"))])
+    allocations = db.session.execute(
+        db.select(PaymentAllocation.payment_id, PaymentAllocation.debt_id, PaymentAllocation.amount)
+    ).all()
+    assert [tuple(row) for row in allocations] == [(payment, debt, Decimal("30.00"))]
+
+
+def test_rebuild_replays_the_same_allocation(customer):
+    debt, payment, later_debt, later_payment = _post(
+        customer,
+        _debt("2026-03-01", "100"),
+        _payment("2026-03-02", "30"),
+        _debt("2026-03-03", "20"),
+        _payment("2026-03-04", "80.25"),
+    )
+    before = _state()
+    assert before == (
+        [(debt, Decimal("0.00")), (later_debt, Decimal("9.75"))],
+        [(payment, Decimal("0.00")), (later_payment, Decimal("0.00"))],
+    )
+    assert rebuild_allocations() == 3
+    assert _state() == before
+    assert db.session.get(Client, customer.id).balance == Decimal("9.75")
+    assert find_allocation_drift() == []
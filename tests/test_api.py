@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from models import db, Client
+
+
+def _clients(count):
+    rows = [Client(name=f"Cliente {index}", document=str(1000 + index)) for index in range(count)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def test_fields_selects_the_columns(client, app):
+    _clients(1)
+    response = client.get("/api/v1/clients?fields=id,name")
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [{"id": 1, "name": "Cliente 0"}]
+
+
+def test_unknown_field_is_a_400(client):
+    response = client.get("/api/v1/clients?fields=id,secreto")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Campos desconocidos: secreto"}
+
+
+def test_cursor_walks_every_row_once(client, app):
+    _clients(5)
+    seen, cursor = [], None
+    while True:
+        url = "/api/v1/clients?fields=id&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).get_json()
+        seen += [row["id"] for row in page["data"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [1, 2, 3, 4, 5]
+
+
+def test_updated_since_includes_the_overlap(client, app):
+    old, recent, new = _clients(3)
+    now = datetime.utcnow()
+    old.updated_at = now - timedelta(hours=1)
+    recent.updated_at = now - timedelta(seconds=30)
+    new.updated_at = now
+    db.session.commit()
+
+    since = (now - timedelta(seconds=10)).isoformat() + "Z"
+    page = client.get(f"/api/v1/clients?fields=id&updated_since={since}").get_json()
+    assert [row["id"] for row in page["data"]] == [recent.id, new.id]
+
+    app.config["SYNC_OVERLAP_SECONDS"] = 0
+    page = client.get(f"/api/v1/clients?fields=id&updated_since={since}").get_json()
+    assert [row["id"] for row in page["data"]] == [new.id]
+
+
+def test_bad_updated_since_is_a_400(client):
+    assert client.get("/api/v1/clients?updated_since=ayer").status_code == 400
+
+
+def test_money_is_an_exact_decimal_string(client, customer):
+    customer.balance = Decimal("1234.10")
+    db.session.commit()
+    page = client.get("/api/v1/balances").get_json()
+    assert page["data"][0]["balance"] == "1234.10"
+
+
+def test_requires_login(app):
+    response = app.test_client().get("/api/v1/clients")
+    assert response.status_code == 401
@@ -0,0 +1,87 @@
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+import auth
+from auth import hash_password, verify_password
+from cache import bump_version
+from models import db, User
+
+
+def _user(role="admin", password="secreta"):
+    user = User(username="caja", password_hash=hash_password(password), role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _signed_in(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user.id
+        session["auth_version"] = user.auth_version
+    return client
+
+
+def test_role_change_ends_open_sessions(app):
+    user = _user()
+    client = _signed_in(app, user)
+    assert client.get("/admin/cache").status_code == 200
+    user.role = "user"
+    db.session.commit()
+    assert user.auth_version == 1
+    response = client.get("/admin/cache")
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+
+
+def test_a_cached_user_is_reread_once_the_data_version_moves(app):
+    user = _user()
+    client = _signed_in(app, user)
+    assert client.get("/admin/cache").status_code == 200
+    # another worker demotes the user: this process's cache still says admin
+    db.session.execute(
+        db.update(User).where(User.id == user.id).values(role="user", auth_version=5)
+    )
+    version, cached = auth._users[user.id]
+    assert cached.role == "admin"
+    bump_version()
+    db.session.commit()
+    assert client.get("/admin/cache").status_code == 302
+    assert auth._users[user.id][0] > version
+
+
+def test_unchanged_data_reuses_the_cached_user(app):
+    user = _user()
+    client = _signed_in(app, user)
+    assert client.get("/admin/cache").status_code == 200
+    queries = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    assert client.get("/admin/cache").status_code == 200
+    assert not any("FROM user" in statement for statement in queries)
+
+
+def test_password_is_rehashed_when_the_method_changes(app):
+    user = _user()
+    user.password_hash = generate_password_hash("secreta", method="pbkdf2:sha256:1000")
+    db.session.commit()
+    assert not verify_password(user, "otra")
+    assert user.password_hash.startswith("pbkdf2:")
+    assert verify_password(user, "secreta")
+    assert user.password_hash.startswith("scrypt:")
+    db.session.commit()
+    assert verify_password(db.session.get(User, user.id), "secreta")
+
+
+def test_login_rehashes_and_logout_clears_the_session(app):
+    user = _user(password="clave123")
+    user.password_hash = generate_password_hash("clave123", method="pbkdf2:sha256:1000")
+    db.session.commit()
+    client = app.test_client()
+    response = client.post("/login", data={"username": "caja", "password": "clave123"})
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password_hash.startswith("scrypt:")
+    with client.session_transaction() as session:
+        assert session["user_id"] == user.id
+    client.get("/logout")
+    with client.session_transaction() as session:
+        assert "user_id" not in session
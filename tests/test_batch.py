@@ -0,0 +1,56 @@
+from models import db, Debt, IdempotencyKey, Payment
+
+
+def _entries(customer, amount="10"):
+    return [
+        {"type": "debt", "client_id": customer.id, "amount": amount, "description": "Pedido"},
+        {"type": "payment", "document": customer.document, "amount": "4", "method": "cash"},
+    ]
+
+
+def _count(model):
+    return db.session.execute(db.select(db.func.count()).select_from(model)).scalar()
+
+
+def test_retry_with_the_same_key_replays_the_first_result(client, customer):
+    headers = {"Idempotency-Key": "lote-1"}
+    first = client.post("/lote", json={"entries": _entries(customer)}, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("/lote", json={"entries": _entries(customer)}, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_json() == first.get_json()
+    assert (_count(Debt), _count(Payment), _count(IdempotencyKey)) == (1, 1, 1)
+
+
+def test_same_key_with_another_batch_is_a_conflict(client, customer):
+    headers = {"Idempotency-Key": "lote-1"}
+    first = client.post("/lote", json={"entries": _entries(customer)}, headers=headers)
+    assert first.status_code == 201
+    conflict = client.post(
+        "/lote", json={"entries": _entries(customer, amount="11")}, headers=headers
+    )
+    assert conflict.status_code == 409
+    assert "otro lote" in conflict.get_json()["error"]
+    assert (_count(Debt), _count(Payment)) == (1, 1)
+
+
+def test_without_a_key_every_post_writes(client, customer):
+    for _ in range(2):
+        assert client.post("/lote", json={"entries": _entries(customer)}).status_code == 201
+    assert (_count(Debt), _count(Payment), _count(IdempotencyKey)) == (2, 2, 0)
+
+
+def test_a_rejected_batch_writes_nothing_and_keeps_the_key_free(client, customer):
+    headers = {"Idempotency-Key": "lote-1"}
+    entries = _entries(customer) + [
+        {"type": "debt", "client_id": "abc", "amount": "1", "description": "x"}
+    ]
+    rejected = client.post("/lote", json={"entries": entries}, headers=headers)
+    assert rejected.status_code == 422
+    assert rejected.get_json() == {"errors": [{"index": 2, "message": "client_id inválido: abc"}]}
+    assert (_count(Debt), _count(Payment), _count(IdempotencyKey)) == (0, 0, 0)
+    fixed = client.post("/lote", json={"entries": _entries(customer)}, headers=headers)
+    assert fixed.status_code == 201
@@ -0,0 +1,14 @@
+import pytest
+from app import create_app
+from bench import run_benchmark
+
+
+def test_benchmark_never_generates_into_another_database(tmp_path):
+    real = tmp_path / "real.db"
+
+    def misconfigured(config):
+        return create_app({**config, "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(real)})
+
+    with pytest.raises(RuntimeError, match="base temporal"):
+        run_benchmark(misconfigured, debts=100, repeat=2)
+    assert not real.exists() or real.stat().st_size == 0
@@ -0,0 +1,71 @@
+from app import create_app
+from cache import cached, data_version
+from models import db, Client
+
+
+def _write(document="999"):
+    db.session.add(Client(name="Nuevo", document=document))
+    db.session.commit()
+
+
+def test_unchanged_page_answers_304(client):
+    first = client.get("/cash/cierre")
+    assert first.status_code == 200
+    tag = first.headers["ETag"]
+    again = client.get("/cash/cierre", headers={"If-None-Match": tag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == tag
+
+
+def test_a_write_changes_the_etag(client):
+    tag = client.get("/cash/cierre").headers["ETag"]
+    version = data_version()
+    _write()
+    assert data_version() == version + 1
+    response = client.get("/cash/cierre", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+
+
+def test_the_version_is_shared_through_the_database(app, client):
+    tag = client.get("/cash/cierre").headers["ETag"]
+    version = data_version()
+    # a second process on the same database: a restart keeps the ETag...
+    other = create_app(
+        {"SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"], "CACHE_BACKEND": "none"}
+    )
+    with other.app_context():
+        assert data_version() == version
+        # ...and its writes reach this one
+        _write()
+        db.engine.dispose()
+    response = client.get("/cash/cierre", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+
+
+def test_flash_messages_are_never_answered_with_304(client):
+    tag = client.get("/cash/cierre").headers["ETag"]
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Aviso")]
+    response = client.get("/cash/cierre", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_cached_values_expire_with_any_write(app):
+    memory = create_app(
+        {"SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"], "CACHE_BACKEND": "memory"}
+    )
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    with memory.app_context():
+        assert cached("test", "key", compute) == 1
+        assert cached("test", "key", compute) == 1
+        _write()
+        assert cached("test", "key", compute) == 2
+        assert cached("test", "other", compute) == 3
+        db.engine.dispose()
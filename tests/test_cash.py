@@ -0,0 +1,23 @@
+from datetime import date
+import pytest
+
+
+@pytest.mark.parametrize("query", ["start=bad", "end=2024-13-01", "start=2024-01-01&end=x"])
+def test_cash_close_falls_back_on_malformed_dates(client, query):
+    response = client.get("/cash/cierre?" + query)
+    assert response.status_code == 200
+    assert "Fecha inválida" in response.get_data(as_text=True)
+
+
+def test_cash_close_keeps_a_valid_range(client):
+    response = client.get("/cash/cierre?start=2026-01-01&end=2026-01-03")
+    assert response.status_code == 200
+    assert "Fecha inválida" not in response.get_data(as_text=True)
+
+
+def test_cash_day_falls_back_to_today(client):
+    response = client.get("/cash?date=ayer")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "Fecha inválida" in page
+    assert date.today().strftime("%Y-%m-%d") in page or date.today().strftime("%d/%m/%Y") in page
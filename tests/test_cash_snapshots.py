@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from cash_register import (
+    CashClosedError,
+    close_cash,
+    day_snapshot,
+    find_cash_drift,
+    rebuild_cash_snapshots,
+)
+from models import db, CashSnapshot
+from posting import write_entries
+
+MONDAY, TUESDAY, WEDNESDAY = date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 4)
+
+
+def _pay(customer, day, amount, method="cash"):
+    write_entries(
+        payments=[
+            {"client_id": customer.id, "date": day, "amount": Decimal(amount), "method": method}
+        ]
+    )
+    db.session.commit()
+
+
+def test_payments_update_the_day_and_the_later_balances(app, customer):
+    _pay(customer, TUESDAY, "5")
+    _pay(customer, MONDAY, "10")
+    _pay(customer, MONDAY, "3", method="transfer")
+
+    monday, tuesday = day_snapshot(MONDAY), day_snapshot(TUESDAY)
+    assert (monday["cash"], monday["transfer"]) == (10, 3)
+    assert (monday["opening"], monday["closing"]) == (0, 10)
+    assert (tuesday["opening"], tuesday["closing"]) == (10, 15)
+    assert day_snapshot(WEDNESDAY)["opening"] == 15
+    assert find_cash_drift() == []
+
+
+def test_close_freezes_the_day_and_every_earlier_one(app, customer):
+    _pay(customer, MONDAY, "10")
+    _pay(customer, WEDNESDAY, "2")
+    assert close_cash(TUESDAY) == 2
+
+    assert day_snapshot(MONDAY)["closed"] and day_snapshot(TUESDAY)["closed"]
+    assert not day_snapshot(WEDNESDAY)["closed"]
+    assert day_snapshot(WEDNESDAY)["opening"] == 10
+    with pytest.raises(CashClosedError):
+        _pay(customer, MONDAY, "1")
+    db.session.rollback()
+    with pytest.raises(CashClosedError):
+        close_cash(MONDAY)
+    assert day_snapshot(MONDAY)["closing"] == 10
+
+
+def test_a_batch_for_a_closed_day_is_rejected(client, customer):
+    close_cash(MONDAY)
+    entry = {
+        "type": "payment",
+        "document": customer.document,
+        "amount": "4",
+        "method": "cash",
+        "date": MONDAY.isoformat(),
+    }
+    response = client.post("/lote", json={"entries": [entry]})
+    assert response.status_code == 422
+    assert "ya está cerrada" in response.get_json()["errors"][0]["message"]
+
+
+def test_rebuild_fixes_drift_and_keeps_closed_days(app, customer):
+    _pay(customer, MONDAY, "10")
+    _pay(customer, TUESDAY, "5")
+    close_cash(MONDAY)
+    db.session.get(CashSnapshot, TUESDAY).cash = 99
+    db.session.commit()
+    assert (TUESDAY, "cash", 99, 5) in find_cash_drift()
+
+    assert rebuild_cash_snapshots() == 2
+    assert find_cash_drift() == []
+    assert day_snapshot(MONDAY)["closed"]
+    assert day_snapshot(TUESDAY)["closing"] == 15
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+from archive import archive_closed_months
+from changes import changes_after, last_sequence
+from models import db, Movement
+
+
+def _movements(customer, count, timestamp=None):
+    for n in range(count):
+        db.session.add(
+            Movement(
+                client_id=customer.id,
+                action="add_debt",
+                amount=n + 1,
+                description=f"Deuda {n}",
+                timestamp=timestamp or datetime.utcnow(),
+            )
+        )
+    db.session.commit()
+
+
+def _read_all(after=0, limit=3):
+    seqs = []
+    while True:
+        rows = changes_after(after, limit)
+        if not rows:
+            return seqs
+        seqs += [row["seq"] for row in rows]
+        after = rows[-1]["seq"]
+
+
+def test_sequence_follows_commits(customer):
+    _movements(customer, 3)
+    _movements(customer, 2)
+    rows = changes_after(0, 100)
+    assert [row["seq"] for row in rows] == list(range(1, 6))
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert last_sequence() == 5
+    assert changes_after(5, 100) == []
+
+
+def test_paging_returns_every_movement_once_in_order(customer):
+    _movements(customer, 7)
+    assert _read_all(limit=3) == list(range(1, 8))
+    assert [row["seq"] for row in changes_after(4, 2)] == [5, 6]
+
+
+def test_archived_months_stay_in_the_feed(customer):
+    _movements(customer, 4, timestamp=datetime(2025, 1, 15, 12))
+    _movements(customer, 2, timestamp=datetime(2025, 2, 10, 12))
+    _movements(customer, 3)
+    before = changes_after(0, 100)
+    archived = {month: rows for month, rows in archive_closed_months() if rows}
+    assert archived == {date(2025, 1, 1): 4, date(2025, 2, 1): 2}
+    assert db.session.execute(db.select(db.func.count()).select_from(Movement)).scalar() == 3
+    assert changes_after(0, 100) == before
+    assert _read_all(limit=4) == list(range(1, 10))
+    assert [row["seq"] for row in changes_after(3, 2)] == [4, 5]
+
+
+def test_http_feed_reports_where_to_continue(client, customer):
+    _movements(customer, 5)
+    response = client.get("/api/v1/changes?after=1&limit=3")
+    lines = response.get_data(as_text=True).splitlines()
+    assert [line.split(",")[0] for line in lines] == ['{"seq":2', '{"seq":3', '{"seq":4']
+    assert response.headers["Feed-Next-After"] == "4"
+    assert response.headers["Feed-More"] == "1"
+    last = client.get("/api/v1/changes?after=4&limit=3")
+    assert last.headers["Feed-Next-After"] == "5"
+    assert last.headers["Feed-More"] == "0"
@@ -0,0 +1,12 @@
+def test_malformed_cutoff_shows_the_whole_statement(client, customer):
+    response = client.get(f"/client/{customer.id}?hasta=xx")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "Fecha inválida: xx" in page
+    assert 'name="hasta" value=""' in page
+
+
+def test_valid_cutoff_is_kept_in_the_form(client, customer):
+    response = client.get(f"/client/{customer.id}?hasta=2026-01-31")
+    assert response.status_code == 200
+    assert 'name="hasta" value="2026-01-31"' in response.get_data(as_text=True)
@@ -0,0 +1,37 @@
+import pytest
+from app import create_app
+from database import check_scratch, normalize_url
+from models import db
+
+
+def test_database_url_does_not_replace_an_explicit_uri(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///" + str(tmp_path / "real.db"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(tmp_path / "scratch.db")})
+    assert app.config["SQLALCHEMY_DATABASE_URI"].endswith("scratch.db")
+
+
+def test_database_url_applies_without_an_explicit_uri(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///" + str(tmp_path / "real.db"))
+    app = create_app()
+    assert app.config["SQLALCHEMY_DATABASE_URI"].endswith("real.db")
+
+
+def test_heroku_urls_use_the_postgresql_scheme():
+    assert normalize_url("postgres://user:secret@db/deudas") == "postgresql://user:secret@db/deudas"
+
+
+def test_default_is_the_local_sqlite_file(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    app = create_app()
+    assert app.config["SQLALCHEMY_DATABASE_URI"].endswith("/clients.db")
+
+
+def test_check_scratch_stops_on_another_database(tmp_path):
+    scratch = str(tmp_path / "scratch.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(tmp_path / "real.db")})
+    with app.app_context():
+        with pytest.raises(RuntimeError, match="base temporal"):
+            check_scratch(db.engine, scratch)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + scratch})
+    with app.app_context():
+        check_scratch(db.engine, scratch)
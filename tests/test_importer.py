@@ -0,0 +1,47 @@
+import io
+from openpyxl import Workbook
+from importer import Importer, read_rows
+from models import db, Client, Debt
+
+
+def _clients(*documents):
+    return [{"name": f"Cliente {doc}", "document": doc} for doc in documents]
+
+
+def test_only_the_row_that_clashes_in_the_database_is_rejected(app):
+    importer = Importer("clients", chunk_size=10)
+    # registered after the importer loaded the known documents
+    db.session.add(Client(name="Otro", document="222"))
+    db.session.commit()
+    result = importer.run(_clients("111", "222", "333"))
+    assert result["inserted"] == 2
+    assert [line for line, _ in result["errors"]] == [3]
+    assert result["errors"][0][1] == "documento ya registrado: 222"
+    documents = db.session.execute(db.select(Client.document).order_by(Client.document))
+    assert documents.scalars().all() == ["111", "222", "333"]
+
+
+def test_row_errors_are_reported_once_when_a_chunk_is_retried(app):
+    importer = Importer("clients", chunk_size=10)
+    db.session.add(Client(name="Otro", document="222"))
+    db.session.commit()
+    rows = _clients("111", "222") + [{"name": "", "document": "444"}]
+    result = importer.run(rows)
+    assert result["inserted"] == 1
+    assert result["error_count"] == 2
+    assert [line for line, _ in result["errors"]] == [3, 4]
+
+
+def test_xlsx_rows_are_imported(app, customer):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Document", "Date", "Amount", "Description"])
+    sheet.append([customer.document, "2026-03-01", 12.5, "Fiado"])
+    sheet.append(["999", "2026-03-01", 3, "Sin cliente"])
+    stream = io.BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+    result = Importer("debts").run(read_rows(stream, "deudas.xlsx"))
+    assert result["inserted"] == 1
+    assert result["errors"] == [(3, "documento inexistente: 999")]
+    assert db.session.execute(db.select(Debt.amount)).scalar() == 12.5
@@ -0,0 +1,54 @@
+import os
+import socket
+from models import db, Job
+import jobs
+
+
+def _running(worker):
+    job = Job(kind="rebuild_balances", status="running", worker=worker)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_recover_fails_only_jobs_of_dead_local_processes(app, monkeypatch):
+    host = socket.gethostname()
+    monkeypatch.setattr(jobs, "_alive", lambda pid: pid != 4242)
+    dead = _running(f"{host}:4242")
+    alive = _running(f"{host}:{os.getpid()}")
+    elsewhere = _running("otra-maquina:4242")
+    unowned = _running(None)
+
+    assert jobs.recover_jobs() == 2
+    db.session.expire_all()
+    statuses = {job.id: job.status for job in Job.query}
+    assert statuses == {dead: "failed", alive: "running", elsewhere: "running", unowned: "failed"}
+    assert db.session.get(Job, dead).message.startswith("Interrumpido")
+
+
+def test_submit_runs_inline_without_workers(app, customer):
+    job = jobs.submit("rebuild_balances", {})
+    db.session.expire_all()
+    job = db.session.get(Job, job.id)
+    assert job.status == "done"
+    assert job.worker == f"{socket.gethostname()}:{os.getpid()}"
+    assert jobs.job_status(job)["result"] == {"clients": 1}
+
+
+def test_a_failing_handler_marks_the_job_failed(app, monkeypatch):
+    def broken(job, params, progress):
+        raise ValueError("archivo roto")
+
+    monkeypatch.setitem(jobs.HANDLERS, "rebuild_balances", broken)
+    job = jobs.submit("rebuild_balances", {})
+    db.session.expire_all()
+    job = db.session.get(Job, job.id)
+    assert job.status == "failed"
+    assert job.message == "archivo roto"
+    assert job.finished_at is not None
+
+
+def test_a_job_runs_once(app):
+    job = jobs.submit("rebuild_balances", {})
+    assert not jobs.run_job(job.id)
+    assert jobs.run_queued() == 0
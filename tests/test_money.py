@@ -0,0 +1,52 @@
+from decimal import Decimal
+import pytest
+from models import db, Debt, from_cents, to_cents
+from posting import RowError, parse_amount
+
+
+@pytest.mark.parametrize(
+    "value, cents",
+    [
+        ("0.005", 1),
+        ("0.004", 0),
+        ("2.675", 268),
+        (2.675, 268),
+        (1.005, 101),
+        ("-0.005", -1),
+        (Decimal("10.125"), 1013),
+        (100, 10000),
+    ],
+)
+def test_to_cents_rounds_half_up(value, cents):
+    assert to_cents(value) == cents
+
+
+def test_from_cents_keeps_two_decimals():
+    assert from_cents(12345) == Decimal("123.45")
+    assert str(from_cents(100)) == "1.00"
+
+
+def test_cents_column_stores_rounded_amounts(customer):
+    debt = Debt(client_id=customer.id, amount=0.1, description="a")
+    db.session.add_all(
+        [debt]
+        + [Debt(client_id=customer.id, amount=0.1, description="b") for _ in range(2)]
+        + [Debt(client_id=customer.id, amount="10.005", description="c")]
+    )
+    db.session.commit()
+    amounts = db.session.execute(db.select(Debt.amount).order_by(Debt.id)).scalars().all()
+    assert amounts == [Decimal("0.10")] * 3 + [Decimal("10.01")]
+    assert sum(amounts[:3]) == Decimal("0.30")
+    # summed as integer cents in the database
+    assert db.session.execute(db.select(db.func.sum(Debt.amount))).scalar() == Decimal("10.31")
+
+
+@pytest.mark.parametrize("value", ["0.005", "0,005", 0.005])
+def test_batch_amounts_round_like_the_columns(value):
+    assert parse_amount({"amount": value}) == Decimal("0.01")
+
+
+@pytest.mark.parametrize("value", ["abc", "NaN", "inf", None, "1e400"])
+def test_batch_rejects_invalid_amounts(value):
+    with pytest.raises(RowError, match="monto inválido"):
+        parse_amount({"amount": value})
@@ -0,0 +1,22 @@
+import pytest
+from app import create_app
+from queryplan import check_query_plans
+
+
+def test_hot_requests_never_scan_a_whole_table():
+    problems = check_query_plans(create_app)
+    assert problems == [], "\n".join(
+        f"{method} {url}: {detail}\n  {' '.join(sql.split())}"
+        for method, url, sql, detail in problems
+    )
+
+
+def test_refuses_to_run_on_a_database_other_than_its_scratch_file(tmp_path):
+    real = tmp_path / "real.db"
+
+    def misconfigured(config):
+        return create_app({**config, "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(real)})
+
+    with pytest.raises(RuntimeError, match="base temporal"):
+        check_query_plans(misconfigured)
+    assert not real.exists() or real.stat().st_size == 0
@@ -0,0 +1,62 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from models import db, CashSnapshot, Client
+from posting import write_entries
+import reconcile
+
+DAY = date(2026, 3, 2)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def engine(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(reconcile, "_numpy", lambda: None)
+    return request.param
+
+
+@pytest.fixture
+def ledger(app, customer):
+    other = Client(name="Beto Ruiz", document="222")
+    db.session.add(other)
+    db.session.flush()
+    write_entries(
+        debts=[
+            {"client_id": customer.id, "date": DAY, "amount": Decimal("10.05"), "description": "a"},
+            {"client_id": other.id, "date": DAY, "amount": Decimal("7"), "description": "b"},
+        ],
+        payments=[
+            {"client_id": customer.id, "date": DAY, "amount": Decimal("4.02"), "method": "cash"},
+            {"client_id": other.id, "date": DAY, "amount": Decimal("1"), "method": "transfer"},
+        ],
+    )
+    db.session.commit()
+    return customer, other
+
+
+def test_a_consistent_ledger_has_no_drift(engine, ledger):
+    result = reconcile.reconcile()
+    assert (result["clients"], result["days"]) == (2, 1)
+    assert result["drift"] == []
+    assert result["cash_mismatch"] == []
+
+
+def test_drift_is_found_and_fixed(engine, ledger):
+    customer, _ = ledger
+    customer.balance = Decimal("99")
+    customer.payment_count = 5
+    db.session.get(CashSnapshot, DAY).cash = Decimal("1")
+    db.session.commit()
+
+    result = reconcile.reconcile()
+    [item] = result["drift"]
+    assert item["client_id"] == customer.id
+    assert (item["balance"], item["expected_balance"]) == (Decimal("99"), Decimal("6.03"))
+    assert (item["payment_count"], item["expected_payment_count"]) == (5, 1)
+    assert item["expected_last_activity"] == DAY
+    assert result["cash_mismatch"] == [(DAY, "cash", Decimal("4.02"), Decimal("1"))]
+
+    assert reconcile.fix_drift(result["drift"]) == 1
+    assert reconcile.reconcile()["drift"] == []
@@ -0,0 +1,14 @@
+import json
+from models import db, Movement
+
+
+def test_ndjson_export_writes_money_as_decimal_strings(client, customer):
+    for amount in ("0.10", "0.20"):
+        db.session.add(
+            Movement(client_id=customer.id, action="add_debt", amount=amount, description="x")
+        )
+    db.session.commit()
+    response = client.get("/report/export?format=ndjson")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(row["amount"] for row in rows if row["action"] == "add_debt") == ["0.10", "0.20"]
@@ -0,0 +1,46 @@
+import pytest
+from models import db, Client
+from search import reindex_clients, suggest_clients
+
+
+@pytest.fixture
+def clients(app):
+    db.session.add_all(
+        [
+            Client(name="Ana Pérez", document="12345678", phone="11 4444-5555"),
+            Client(name="Bruno Díaz", document="X-999"),
+            Client(name="Carla Gómez", document="87654321"),
+        ]
+    )
+    db.session.commit()
+    reindex_clients()
+
+
+def _names(q):
+    return [row["name"] for row in suggest_clients(q)]
+
+
+@pytest.mark.parametrize(
+    "q, expected",
+    [
+        ("12.345", ["Ana Pérez"]),
+        ("12 345", ["Ana Pérez"]),
+        ("11 4444-5", ["Ana Pérez"]),
+        ("X-99", ["Bruno Díaz"]),
+        ("x99", ["Bruno Díaz"]),
+        ("8765", ["Carla Gómez"]),
+    ],
+)
+def test_documents_and_phones_match_with_or_without_punctuation(clients, q, expected):
+    assert _names(q) == expected
+
+
+def test_names_match_every_word_without_accents(clients):
+    assert _names("perez an") == ["Ana Pérez"]
+    assert _names("gomez ana") == []
+
+
+def test_index_follows_a_client_created_through_the_form(client):
+    response = client.post("/client/new", data={"name": "Dora Ruiz", "document": "30.111.222"})
+    assert response.status_code in (200, 302)
+    assert _names("30.111") == ["Dora Ruiz"]